@@ -0,0 +1,5 @@
+# -*- encoding: utf-8 -*-
+"""
+sally.app.cli.commands.db module
+
+"""
@@ -0,0 +1,25 @@
+# -*- encoding: utf-8 -*-
+"""
+sally.app.cli.commands.db.compact module
+
+"""
+import argparse
+
+from sally.core import basing
+
+parser = argparse.ArgumentParser(description='Compact the Sally escrow database to reclaim the space of removed '
+                                             'entries.  Sally must not be running.')
+parser.set_defaults(handler=lambda args: handler(args))
+parser.add_argument('--name', '-n', help='keystore name of the Sally instance.  Defaults to sally', required=False,
+                    default="sally")
+
+
+def handler(args):
+    cdb = basing.CueBaser(name=args.name, reopen=True)
+    try:
+        before = cdb.usage()
+        reclaimed = cdb.compact()
+        print(f"Compacted {cdb.path} from {before['size']} to {cdb.usage()['size']} bytes, "
+              f"reclaimed {reclaimed} bytes")
+    finally:
+        cdb.close()
@@ -0,0 +1,52 @@
+# -*- encoding: utf-8 -*-
+"""
+sally.app.cli.commands.import module
+
+"""
+import argparse
+
+from keri.app.cli.common import existing
+from keri.vdr import viring
+
+from sally.core import importing
+
+parser = argparse.ArgumentParser(description='Import archived CESR streams of KELs, TELs and grants from a file or '
+                                             'directory at disk speed.  Imported grants are verified the next time '
+                                             'Sally runs.')
+parser.set_defaults(handler=lambda args: handler(args))
+parser.add_argument('path', help='CESR file or directory of CESR files to import')
+parser.add_argument('--name', '-n', help='keystore name of the Sally instance.  Defaults to sally', required=False,
+                    default="sally")
+parser.add_argument('--base', '-b', help='additional optional prefix to file location of KERI keystore',
+                    required=False, default="")
+parser.add_argument('--alias', '-a', help='human readable alias of the identifier of the Sally instance',
+                    required=True)
+parser.add_argument('--passcode', '-p', help='21 character encryption passcode for keystore (is not saved)',
+                    dest="bran", default=None)
+parser.add_argument("--chunk-size", dest="chunk", default=importing.Importer.ChunkSize, type=int, action="store",
+                    help="bytes of whole messages parsed at a time.  Defaults to 1 MiB")
+
+
+def handler(args):
+    hby = existing.setupHby(name=args.name, base=args.base, bran=args.bran)
+    try:
+        hab = hby.habByName(name=args.alias)
+        if hab is None:
+            raise ValueError(f"no identifier with alias {args.alias}")
+
+        reger = viring.Reger(name=hab.name, db=hab.db, temp=False)
+        try:
+            importer = importing.Importer(hby=hby, reger=reger, chunk=args.chunk, report=report)
+            progress = importer.importAll(args.path)
+            print(f"Queued {progress['grants']} grants for verification, {progress['truncated']} files ended in a "
+                  f"truncated message")
+        finally:
+            reger.close()
+    finally:
+        hby.close()
+
+
+def report(progress):
+    rate = progress["bytes"] / progress["seconds"] if progress["seconds"] else 0.0
+    print(f"Imported {progress['messages']} messages, {progress['bytes']} bytes of {progress['files']} files in "
+          f"{progress['seconds']:.1f}s ({rate / 1024 / 1024:.1f} MiB/s)")
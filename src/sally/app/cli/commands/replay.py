@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+"""
+sally.app.cli.commands.replay module
+
+"""
+import argparse
+import os
+import tempfile
+
+from keri.app import habbing, keeping, notifying
+from keri.app.cli.common import existing
+from keri.db import basing as kbasing
+from keri.vdr import viring
+
+from sally.core import capturing, importing
+
+parser = argparse.ArgumentParser(description='Replay a capture of inbound CESR streams into an offline Sally and '
+                                             'report the throughput and latency of the parser.  The replay runs '
+                                             'against a copy of the databases of the Sally instance unless '
+                                             '--in-place is given.')
+parser.set_defaults(handler=lambda args: handler(args))
+parser.add_argument('path', help='capture file written with sally server start --capture-file')
+parser.add_argument('--name', '-n', help='keystore name of the Sally instance.  Defaults to sally', required=False,
+                    default="sally")
+parser.add_argument('--base', '-b', help='additional optional prefix to file location of KERI keystore',
+                    required=False, default="")
+parser.add_argument('--alias', '-a', help='human readable alias of the identifier of the Sally instance',
+                    required=True)
+parser.add_argument('--passcode', '-p', help='21 character encryption passcode for keystore (is not saved)',
+                    dest="bran", default=None)
+parser.add_argument("--speed", default=1.0, type=float, action="store",
+                    help="replay speed relative to the capture, 0 replays as fast as possible.  Defaults to 1")
+parser.add_argument("--in-place", dest="inPlace", action="store_true", default=False,
+                    help="replay into the databases of the Sally instance instead of a copy, Sally must not be "
+                         "running")
+
+
+def handler(args):
+    if args.inPlace:
+        replay(args, existing.setupHby(name=args.name, base=args.base, bran=args.bran))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="sally_replay_") as head:
+        copy(args, head)
+        bran = args.bran.replace("-", "") if args.bran else None
+        replay(args, habbing.Habery(name=args.name, base=args.base, bran=bran, headDirPath=head, free=True),
+               headDirPath=head, noter=notifying.Noter(name=args.name, headDirPath=head))
+
+
+def copy(args, head):
+    """ Copy the keystore, KEL and credential databases of the Sally instance below head without modifying them """
+    dbs = [keeping.Keeper(name=args.name, base=args.base, readonly=True, reopen=True),
+           kbasing.Baser(name=args.name, base=args.base, readonly=True, reopen=True),
+           viring.Reger(name=args.alias, readonly=True, reopen=True)]
+    try:
+        if dbs[0].gbls.get("aeid") is None:
+            raise ValueError(f"no keystore {args.name}")
+
+        for db in dbs:
+            path = os.path.join(head, db.TailDirPath, db.base, db.name)
+            os.makedirs(path)
+            db.env.copy(path)  # consistent snapshot of the environment
+    finally:
+        for db in dbs:
+            db.close()
+
+
+def replay(args, hby, headDirPath=None, noter=None):
+    try:
+        hab = lookup(hby, args.alias)
+        reger = viring.Reger(name=hab.name, db=hab.db, temp=False, headDirPath=headDirPath)
+        try:
+            importer = importing.Importer(hby=hby, reger=reger, noter=noter)
+            replayer = capturing.Replayer(parser=importer.parser, escrows=importer.processEscrows)
+            report = replayer.replay(args.path, speed=args.speed)
+            print(f"Replayed {report['records']} records, {report['bytes']} bytes in {report['seconds']:.1f}s: "
+                  f"{report['rate']:.1f} records/s, {report['throughput'] / 1024 / 1024:.2f} MiB/s, latency "
+                  f"p50 {report['p50'] * 1000:.1f}ms p99 {report['p99'] * 1000:.1f}ms max {report['max'] * 1000:.1f}ms")
+        finally:
+            reger.close()
+    finally:
+        hby.close()
+        if noter is not None:
+            noter.close()
+
+
+def lookup(hby, alias):
+    hab = hby.habByName(name=alias)
+    if hab is None:
+        raise ValueError(f"no identifier with alias {alias}")
+    return hab
@@ -12,7 +12,7 @@ from keri.app import keeping, habbing, directing, configing, oobiing
 from keri.app.cli.common import existing
 
 import sally
-from sally.core import serving
+from sally.core import retaining, serving, scheming, sinking
 
 parser = argparse.ArgumentParser(description='Launch Sally vLEI credential presentation receiver service.')
 parser.set_defaults(handler=lambda args: launch(args),
@@ -49,17 +49,135 @@ parser.add_argument(
     '--passcode', dest="bran", default=None,
     help='21 character encryption passcode for keystore (is not saved)')
 parser.add_argument(
-    '-w', '--web-hook', action='store', required=True, default=None,
-    help='Webhook address for outbound notifications of credential issuance or revocation')
+    '-w', '--web-hook', action='append', required=False, default=None,
+    help='Webhook address for outbound notifications of credential issuance or revocation. '
+         'Use unix:///path for a Unix domain socket or file:///path for a JSONL spool file. '
+         'May be repeated to deliver to several web hooks')
+parser.add_argument(
+    "--subscriber-file", dest="subscriberFile", action="store", default=None,
+    help="JSON file of named subscribers with their own web hook URL and schema or action filters")
+parser.add_argument(
+    "--tenant-file", dest="tenantFile", action="store", default=None,
+    help="JSON file of further identifiers to host in this process with their own auth and web hooks")
 parser.add_argument(
     '--auth', action="store", required=True,
     help='AID or alias of authority for OOBIs and QVI credential issuer')
 parser.add_argument(
     "-r", "--retry-delay", default=10, type=int, action="store",
-    help="retry delay (in seconds) for failed web hook attempts")
+    help="retry delay (in seconds) before probing a web hook after repeated failed attempts")
 parser.add_argument(
     "-e", "--escrow-timeout", default=10, type=int, action="store",
     help="timeout (in minutes) for escrowed events that have not been delivered to the web hook.  Defaults to 10")
+parser.add_argument(
+    "--connect-timeout", dest="connectTimeout", default=10.0, type=float, action="store",
+    help="timeout (in seconds) for connecting to a web hook.  Defaults to 10")
+parser.add_argument(
+    "--read-timeout", dest="readTimeout", default=30.0, type=float, action="store",
+    help="timeout (in seconds) for a web hook to answer a request.  Defaults to 30")
+parser.add_argument(
+    "--max-clients", dest="maxClients", default=32, type=int, action="store",
+    help="maximum number of open connections to each web hook.  Defaults to 32")
+parser.add_argument(
+    "--encoding", default="json", choices=["json", "cbor", "msgpack"], action="store",
+    help="body encoding of web hook calls, SAIDs and AIDs are sent as qb2 bytes in cbor and msgpack.  "
+         "Defaults to json")
+parser.add_argument(
+    "--ca-file", dest="caFile", default=None, action="store",
+    help="CA certificates to verify https web hooks with.  Defaults to the system CAs")
+parser.add_argument(
+    "--cert-file", dest="certFile", default=None, action="store",
+    help="client certificate for https web hooks that require client authentication")
+parser.add_argument(
+    "--key-file", dest="keyFile", default=None, action="store",
+    help="private key of the client certificate for https web hooks")
+parser.add_argument(
+    "--breaker-threshold", dest="breakerThreshold", default=5, type=int, action="store",
+    help="consecutive failed deliveries that stop deliveries to a web hook until it recovers.  Defaults to 5")
+parser.add_argument(
+    "--revocation-weight", dest="revocationWeight", default=4, type=int, action="store",
+    help="revocations delivered for each round of issuance deliveries.  Defaults to 4")
+parser.add_argument(
+    "--issuance-weight", dest="issuanceWeight", default=1, type=int, action="store",
+    help="issuances delivered for each round of revocation deliveries.  Defaults to 1")
+parser.add_argument(
+    "--revocation-concurrency", dest="revocationConcurrency", default=None, type=int, action="store",
+    help="maximum revocation deliveries in flight to each web hook.  Defaults to no limit")
+parser.add_argument(
+    "--issuance-concurrency", dest="issuanceConcurrency", default=None, type=int, action="store",
+    help="maximum issuance deliveries in flight to each web hook.  Defaults to no limit")
+parser.add_argument(
+    "--revocation-target", dest="revocationTarget", default=5.0, type=float, action="store",
+    help="latency target (in seconds) for revocations, issuances are paused while revocations are behind it.  "
+         "Defaults to 5")
+parser.add_argument(
+    "--delivery-interval", dest="deliveryInterval", default=1.0, type=float, action="store",
+    help="seconds between passes of the delivery pipeline, independent of --retry-delay and shorter than "
+         "--revocation-target.  Defaults to 1")
+parser.add_argument(
+    "--starvation-timeout", dest="starvation", default=60.0, type=float, action="store",
+    help="seconds waiting issuances or revocations may go without a delivery before they are served first.  "
+         "Defaults to 60")
+parser.add_argument(
+    "--ordering", default="credential", choices=["credential", "holder"], action="store",
+    help="deliver the events of each credential or of each credential holder in order.  Defaults to credential")
+parser.add_argument(
+    "--notice-attempts", dest="attempts", default=3, type=int, action="store",
+    help="processing attempts of a presentation notice before it is quarantined.  Defaults to 3")
+parser.add_argument(
+    "--notice-budget", dest="budget", default=25, type=int, action="store",
+    help="presentation notices processed per pass before yielding to other tasks.  Defaults to 25")
+parser.add_argument(
+    "--durability", default="full", choices=["full", "checkpoint", "none"], action="store",
+    help="sync every escrow database commit to disk (full), every --checkpoint-interval seconds (checkpoint) or "
+         "never (none, for benchmarking only).  Defaults to full")
+parser.add_argument(
+    "--checkpoint-interval", dest="checkpoint", default=1.0, type=float, action="store",
+    help="seconds between escrow database syncs with checkpoint durability.  Defaults to 1.0")
+parser.add_argument(
+    "--retention-days", dest="retention", default=30.0, type=float, action="store",
+    help="days the event log and quarantined notices are kept.  Defaults to 30")
+parser.add_argument(
+    "--capture-file", dest="captureFile", action="store", default=None,
+    help="record inbound CESR streams with their receive time to this rotating file for sally replay.  "
+         "Defaults to no capture")
+parser.add_argument(
+    "--capture-size", dest="captureSize", default=64, type=int, action="store",
+    help="MiB written to the capture file before it is rotated.  Defaults to 64")
+parser.add_argument(
+    "--capture-count", dest="captureCount", default=5, type=int, action="store",
+    help="rotated capture files kept.  Defaults to 5")
+parser.add_argument(
+    "--no-oobi-preload", dest="preload", action="store_false", default=True,
+    help="fetch every configured OOBI again at startup even if its schema or KEL is already in the keystore")
+parser.add_argument(
+    "--admin-port", dest="adminPort", default=None, type=int, action="store",
+    help="port to serve the memory profiling admin endpoint /admin/memory on, bound to 127.0.0.1 only.  Disabled by "
+         "default")
+parser.add_argument(
+    "--schema-file", dest="schemaFile", action="store", default=None,
+    help="JSON file mapping supported schema SAIDs to credential chain kinds.  Defaults to the vLEI schemas")
+parser.add_argument(
+    "--admission", action="store_true", default=False,
+    help="Enable per sender rate limits and escrow depth load shedding of presentations")
+parser.add_argument(
+    "--sender-rate", dest="senderRate", default=1.0, type=float, action="store",
+    help="presentations per second allowed for each sender when admission is enabled.  Defaults to 1.0")
+parser.add_argument(
+    "--sender-burst", dest="senderBurst", default=10, type=int, action="store",
+    help="presentations a sender may send at once before being rate limited.  Defaults to 10")
+parser.add_argument(
+    "--escrow-high-water", dest="escrowHighWater", default=1000, type=int, action="store",
+    help="escrow depth at which new presentations are shed or deferred.  Defaults to 1000")
+parser.add_argument(
+    "--escrow-low-water", dest="escrowLowWater", default=None, type=int, action="store",
+    help="escrow depth below which presentations are admitted again.  Defaults to half the high water mark")
+parser.add_argument(
+    "--admission-policy", dest="admissionPolicy", default="defer", choices=["shed", "defer"],
+    help="shed (drop) or defer (leave queued) presentations above the high water mark.  Defaults to defer")
+parser.add_argument(
+    "--rate-limit-policy", dest="rateLimitPolicy", default="limit", choices=["limit", "reject"],
+    help="limit (leave queued and retry later) or reject (drop) presentations of senders over their rate limit.  "
+         "Defaults to limit")
 parser.add_argument(
     "-l", "--loglevel", action="store", required=False, default=os.getenv("SALLY_LOG_LEVEL", "INFO"),
     help="Set log level to DEBUG | INFO | WARNING | ERROR | CRITICAL. Default is CRITICAL")
@@ -77,7 +195,7 @@ def launch(args, expire=0.0):
     logger.setLevel(help.ogler.level)
     help.ogler.reopen(name="sally", temp=True, clear=True)
 
-    hook = args.web_hook
+    hook = args.web_hook or []
     name = args.name
     salt = args.salt
     base = args.base
@@ -96,6 +214,45 @@ def launch(args, expire=0.0):
     config_file = args.configFile
     config_dir = args.configDir
 
+    schemas = None
+    if args.schemaFile is not None:
+        schema_file = args.schemaFile if config_dir is None else os.path.join(config_dir, args.schemaFile)
+        schemas = scheming.loadSchemas(schema_file)
+
+    subscriptions = None
+    if args.subscriberFile is not None:
+        subscriber_file = args.subscriberFile if config_dir is None else os.path.join(config_dir, args.subscriberFile)
+        subscriptions = sinking.loadSubscribers(subscriber_file)
+
+    tenants = None
+    if args.tenantFile is not None:
+        tenant_file = args.tenantFile if config_dir is None else os.path.join(config_dir, args.tenantFile)
+        tenants = serving.loadTenants(tenant_file)
+
+    if not hook and not subscriptions:
+        raise ValueError("at least one --web-hook or a --subscriber-file is required")
+
+    retention = dict(retaining.DEFAULT_RETENTION,
+                     evts=dict(age=args.retention * retaining.DAY, count=None),
+                     quar=dict(age=args.retention * retaining.DAY))
+
+    capture = None
+    if args.captureFile is not None:
+        capture = dict(path=args.captureFile, size=args.captureSize * 1024 * 1024, count=args.captureCount)
+
+    delivery = dict(connectTimeout=args.connectTimeout, readTimeout=args.readTimeout, maxClients=args.maxClients,
+                    threshold=args.breakerThreshold, cafile=args.caFile, certfile=args.certFile,
+                    keyfile=args.keyFile, encoding=args.encoding)
+
+    lanes = dict(
+        rev=dict(weight=args.revocationWeight, concurrency=args.revocationConcurrency, target=args.revocationTarget),
+        iss=dict(weight=args.issuanceWeight, concurrency=args.issuanceConcurrency, target=None))
+
+    admission = None
+    if args.admission:
+        admission = dict(rate=args.senderRate, burst=args.senderBurst, high=args.escrowHighWater,
+                         low=args.escrowLowWater, policy=args.admissionPolicy, limiting=args.rateLimitPolicy)
+
     # Inception configuration for when Sally bootstraps itself
     incept_file = args.inceptFile
     incept_args = {
@@ -123,7 +280,13 @@ def launch(args, expire=0.0):
 
     doers = [hbyDoer, *obl.doers]
     doers += serving.setup(hby, alias=alias, httpPort=http_port, hook=hook, auth=auth,
-                           timeout=timeout, retry=retry, direct=direct, incept_args=incept_args)
+                           timeout=timeout, retry=retry, direct=direct, incept_args=incept_args,
+                           schemas=schemas, admission=admission, subscriptions=subscriptions,
+                           delivery=delivery, lanes=lanes, starvation=args.starvation, interval=args.deliveryInterval,
+                           ordering=args.ordering, attempts=args.attempts,
+                           budget=args.budget, durability=args.durability, checkpoint=args.checkpoint,
+                           retention=retention, capture=capture, tenants=tenants, preload=args.preload,
+                           adminPort=args.adminPort)
 
     logger.info(f"Sally Server v{sally.__version__} listening on {http_port} with DB version {hby.db.version}")
     directing.runController(doers=doers, expire=expire)
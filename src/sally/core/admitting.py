@@ -0,0 +1,155 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.admitting module
+
+Admission control for incoming IPEX Grant presentations
+"""
+import time
+
+from keri import help
+
+logger = help.ogler.getLogger()
+
+
+class Decisions:
+    """ Admission decisions for a presentation """
+    admit = "admit"  # process the presentation now
+    limit = "limit"  # sender exceeded its rate limit, presentation is left queued and retried on a later pass
+    reject = "reject"  # sender exceeded its rate limit, presentation is dropped
+    shed = "shed"  # escrows are over the high watermark, presentation is dropped
+    defer = "defer"  # escrows are over the high watermark, presentation is left queued for later
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Holds up to burst tokens refilled at rate tokens per second.
+    """
+
+    def __init__(self, rate, burst, now=None):
+        """
+        Parameters:
+            rate (float): tokens added per second
+            burst (int): maximum number of tokens in the bucket
+            now (float): current monotonic time in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = now if now is not None else time.monotonic()
+
+    def refill(self, now):
+        """ Add the tokens accrued since the last refill """
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def take(self, now=None):
+        """ Returns True if a token was available and removed from the bucket """
+        self.refill(now if now is not None else time.monotonic())
+        if self.tokens < 1.0:
+            return False
+
+        self.tokens -= 1.0
+        return True
+
+    @property
+    def full(self):
+        return self.tokens >= self.burst
+
+
+class Admitter:
+    """
+    Decides whether a presentation is admitted for processing based on a per sender token bucket and on the
+    depth of the presentation escrows. Once the iss and recv escrows of all tenants together reach the high watermark
+    new presentations are shed or deferred until the escrows drain below the low watermark. Presentations of a sender
+    over its rate limit are limited, left queued for a later pass, or rejected.
+    """
+
+    MaxBuckets = 10000  # idle full buckets are pruned beyond this many senders
+
+    def __init__(self, cdb, metrics=None, rate=1.0, burst=10, high=1000, low=None, policy=Decisions.defer,
+                 tenants=None, limiting=Decisions.limit):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment
+            metrics (Metrics): metrics registry to record admission decisions in
+            rate (float): presentations per second allowed for each sender
+            burst (int): presentations a sender may send at once before being rate limited
+            high (int): escrow depth at which new presentations are no longer admitted
+            low (int): escrow depth below which presentations are admitted again, defaults to half of high
+            policy (str): shed or defer presentations while over the high watermark
+            tenants (list): CueBasers of the other tenants, their escrows count towards the depth as well
+            limiting (str): limit or reject presentations of senders over their rate limit
+        """
+        if policy not in (Decisions.shed, Decisions.defer):
+            raise ValueError(f"invalid admission policy {policy}")
+        if limiting not in (Decisions.limit, Decisions.reject):
+            raise ValueError(f"invalid rate limit policy {limiting}")
+
+        self.cdb = cdb
+        self.tenants = tenants if tenants is not None else []
+        self.metrics = metrics
+        self.rate = rate
+        self.burst = burst
+        self.high = high
+        self.low = low if low is not None else high // 2
+        self.policy = policy
+        self.limiting = limiting
+        self.buckets = dict()
+        self.shedding = False
+
+    def depth(self):
+        """ Returns number of presentations waiting in the iss and recv escrows of all tenants
+
+        recv holds a copy of each presentation for every subscriber, so it counts as the deepest recv queue of any
+        one subscriber rather than all of its entries.
+        """
+        return sum(cdb.depth(cdb.iss) + cdb.deepest(cdb.recv) for cdb in [self.cdb] + self.tenants)
+
+    def admit(self, sender, now=None):
+        """ Returns the admission decision for a presentation from sender
+
+        Parameters:
+            sender (str): qb64 AID of the sender of the presentation
+            now (float): current monotonic time in seconds
+        """
+        now = now if now is not None else time.monotonic()
+
+        depth = self.depth()
+        if self.shedding and depth < self.low:
+            logger.info(f"escrow depth {depth} below low watermark {self.low}, admitting presentations")
+            self.shedding = False
+        elif not self.shedding and depth >= self.high:
+            logger.warning(f"escrow depth {depth} reached high watermark {self.high}, {self.policy} presentations")
+            self.shedding = True
+
+        if self.metrics is not None:
+            self.metrics.set("sally_admission_escrow_depth", depth)
+            self.metrics.set("sally_admission_shedding", int(self.shedding))
+
+        if self.shedding:
+            return self.record(self.policy)
+
+        bucket = self.buckets.get(sender)
+        if bucket is None:
+            if len(self.buckets) >= self.MaxBuckets:
+                self.prune(now)
+            bucket = self.buckets[sender] = TokenBucket(rate=self.rate, burst=self.burst, now=now)
+
+        if not bucket.take(now):
+            logger.warning(f"sender {sender} exceeded rate limit of {self.rate}/s")
+            return self.record(self.limiting)
+
+        return self.record(Decisions.admit)
+
+    def prune(self, now):
+        """ Remove buckets of senders that have been idle long enough to refill completely """
+        for sender, bucket in list(self.buckets.items()):
+            bucket.refill(now)
+            if bucket.full:
+                del self.buckets[sender]
+
+    def record(self, decision):
+        if self.metrics is not None:
+            self.metrics.inc("sally_admission_total", decision=decision)
+        return decision
@@ -5,12 +5,120 @@ sally.core.basing module
 
 Database support
 """
+import json
+import os
+import shutil
+from contextlib import contextmanager
+
+import lmdb
+from hio.base import doing
 from keri import help
 from keri.core import coring, serdering
 from keri.db import dbing, subing
+from keri.help import helping
 
 logger = help.ogler.getLogger()
 
+
+# Fields of the presentation history with a secondary index
+IndexedFields = ("lei", "holder", "issuer", "schema")
+
+
+class Durability:
+    """
+    Durability tiers of CueBaser writes
+
+    full: every commit is synced to disk before it returns, nothing committed is lost.
+    checkpoint: commits are written to the file without syncing and the CueBaser is synced every checkpoint interval
+        by the CheckpointDoer. A crash of Sally loses nothing, a crash of the host loses at most the commits of the
+        last interval. The database is never corrupted.
+    none: the CueBaser is opened the same way as with checkpoint, without syncing on commit, but no CheckpointDoer
+        syncs it, neither periodically nor on exit. Commits are only written to disk when the operating system
+        flushes them. For benchmarking only, a crash of the host may lose any commit the operating system has not
+        written yet.
+    """
+    full = "full"
+    checkpoint = "checkpoint"
+    none = "none"
+
+
+class Joined:
+    """
+    Transaction on a sub database joined to the open batch transaction of a CueBaser. Entering and leaving it neither
+    commits nor aborts, the batch transaction commits when the batch ends.
+    """
+
+    def __init__(self, txn, db):
+        self.txn = txn
+        self.db = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def put(self, key, value, db=None, **kwa):
+        return self.txn.put(key, value, db=db if db is not None else self.db, **kwa)
+
+    def get(self, key, default=None, db=None):
+        return self.txn.get(key, default, db=db if db is not None else self.db)
+
+    def delete(self, key, value=b"", db=None):
+        return self.txn.delete(key, value, db=db if db is not None else self.db)
+
+    def pop(self, key, db=None):
+        return self.txn.pop(key, db=db if db is not None else self.db)
+
+    def replace(self, key, value, db=None):
+        return self.txn.replace(key, value, db=db if db is not None else self.db)
+
+    def cursor(self, db=None):
+        return self.txn.cursor(db=db if db is not None else self.db)
+
+    def stat(self, db):
+        return self.txn.stat(db)
+
+
+class Batched:
+    """ Environment of a CueBaser while a batch is open, every transaction it begins joins the batch transaction """
+
+    def __init__(self, env, txn):
+        self._env = env
+        self.txn = txn
+
+    def begin(self, db=None, write=False, buffers=False, **kwa):
+        return Joined(self.txn, db)
+
+    def __getattr__(self, name):
+        return getattr(self._env, name)
+
+
+def getItemIterAfter(sub, after=None):
+    """
+    Generates (keys, raw) of the items of the sub database sub in key order, starting after the item with the joined
+    keys after. The cursor is positioned on after directly instead of scanning the items before it.
+
+    Parameters:
+        sub (Suber): sub database to iterate over
+        after (str): keys of the last item visited joined with the separator of sub, None to start at the first item
+
+    Returns:
+        Iterator: (keys, raw) with keys the tuple of str keys and raw the serialized value as bytes
+    """
+    start = after.encode("utf-8") if after is not None else b""
+    with sub.db.env.begin(db=sub.sdb, write=False, buffers=False) as txn:
+        cursor = txn.cursor(db=sub.sdb)
+        if not cursor.set_range(start):
+            return
+
+        for key, val in cursor.iternext(keys=True, values=True):
+            key = bytes(key)
+            if after is not None and key == start:
+                continue
+            yield tuple(key.decode("utf-8").split(sub.sep)), bytes(val)
+
+
 class CueBaser(dbing.LMDBer):
     """
     Noter stores Notifications generated by the agent that are
@@ -20,16 +128,25 @@ class CueBaser(dbing.LMDBer):
     TailDirPath = "sally/db"
     AltTailDirPath = ".sally/db"
     TempPrefix = "sally_db_"
+    DefaultSubscriber = "hook0"  # subscriber of the single --web-hook, the one of the queues written before subscribers
 
-    def __init__(self, name="cb", headDirPath=None, reopen=True, **kwa):
+    def __init__(self, name="cb", headDirPath=None, reopen=True, durability=Durability.full, **kwa):
         """
 
         Parameters:
             headDirPath:
             perm:
             reopen:
+            durability (str): durability tier of commits [full|checkpoint|none], see Durability
             kwa:
         """
+        if durability not in (Durability.full, Durability.checkpoint, Durability.none):
+            raise ValueError(f"invalid durability {durability}")
+
+        self.durability = durability
+        self._env = None
+        self.txn = None  # write transaction of the open batch
+
         self.snd = None
 
         self.iss = None
@@ -40,6 +157,24 @@ class CueBaser(dbing.LMDBer):
 
         self.ack = None
 
+        self.seqs = None
+        self.ordr = None
+
+        self.evts = None
+        self.lastEvent = 0
+
+        self.tries = None
+        self.quar = None
+        self.crsr = None
+        self.meta = None
+
+        self.pres = None
+        self.pidx = None
+
+        self.vrdt = None
+
+        self.qcnt = None
+
         super(CueBaser, self).__init__(name=name, headDirPath=headDirPath, reopen=reopen, **kwa)
 
     def reopen(self, **kwa):
@@ -49,6 +184,12 @@ class CueBaser(dbing.LMDBer):
         :return:
         """
         super(CueBaser, self).reopen(**kwa)
+        if self.durability != Durability.full and not self.readonly:
+            # reopen without syncing on commit, the map size and other settings are kept
+            mapsize = self._env.info()["map_size"]
+            self._env.close()
+            self._env = lmdb.open(self.path, max_dbs=self.MaxNamedDBs, map_size=mapsize, mode=self.perm,
+                                  readonly=self.readonly, sync=False)
 
         # Database of senders of the presentation or revocation messages
         self.snd = subing.CesrSuber(db=self, subkey='snd.', klas=coring.Prefixer)
@@ -58,16 +199,174 @@ class CueBaser(dbing.LMDBer):
         # revocations that are waiting for the TEL event to be received and processed
         self.rev = subing.CesrSuber(db=self, subkey='rev.', klas=coring.Dater)
 
-        # presentations with resolved credentials that need to be sent to the hook
+        # presentations with resolved credentials that need to be sent to each subscriber, keyed by
+        # (subscriber, said, dater)
         self.recv = subing.SerderSuber(db=self, subkey="recv", klas=serdering.SerderACDC)
-        # revocations whose TEL rev event has been resolved that need to be sent to the hook
+        # revocations whose TEL rev event has been resolved that need to be sent to each subscriber, keyed by
+        # (subscriber, said, dater)
         self.revk = subing.SerderSuber(db=self, subkey="revk", klas=serdering.SerderACDC)
 
-        # presentations that have been sent to the hook that need to be ack'ed
+        # presentations that have been sent to a subscriber that need to be ack'ed, keyed by (subscriber, said)
         self.ack = subing.SerderSuber(db=self, subkey="ack", klas=serdering.SerderACDC)
 
+        # last sequence number assigned to the events of an ordering key, keyed by (subscriber, key)
+        self.seqs = subing.Suber(db=self, subkey="seqs.")
+        # events queued for a subscriber in sequence order for each ordering key, keyed by
+        # (subscriber, key, sn as fixed width hex) with "said.dater.event" values, event the number of the event in
+        # the event log as hex
+        self.ordr = subing.Suber(db=self, subkey="ordr.")
+
+        # append only log of the verified presentations and revocations queued for delivery, keyed by
+        # sequence number as fixed width hex with JSON event values
+        self.evts = subing.Suber(db=self, subkey="evts.")
+        self.lastEvent = self.lastEventNumber()
+
+        # failed processing attempts of notices that are still queued, keyed by notice rid
+        self.tries = subing.Suber(db=self, subkey="tries.")
+        # notices that failed processing too often, keyed by notice rid with JSON values of the notice and error
+        self.quar = subing.Suber(db=self, subkey="quar.")
+        # key of the last item visited by processing loops that resume where their previous pass stopped
+        self.crsr = subing.Suber(db=self, subkey="crsr.")
+        # JSON records about the database itself, such as the result of the last compaction
+        self.meta = subing.Suber(db=self, subkey="meta.")
+
+        # history of delivered presentations keyed by (received datetime, said) with JSON values, the date index
+        self.pres = subing.Suber(db=self, subkey="pres.", sep="/")
+        # secondary indexes of the presentation history keyed by (field, value, received datetime, said)
+        self.pidx = subing.Suber(db=self, subkey="pidx.", sep="/")
+
+        # verdict of the last verification of each presented credential, keyed by said with JSON values
+        self.vrdt = subing.Suber(db=self, subkey="vrdt.")
+
+        # number of events in each delivery queue of a subscriber, keyed by (subscriber, queue [recv|revk|ack])
+        self.qcnt = subing.Suber(db=self, subkey="qcnt.")
+        if not self.readonly and self.depth(self.qcnt) == 0 and any(self.depth(sub) for sub in self.queues.values()):
+            self.rekey()  # database written before the queues were keyed by subscriber
+            self.recount()  # database written before the queues were counted
+
         return self.env
 
+    @property
+    def queues(self):
+        """ Delivery queues of the subscribers by name, keyed by subscriber first """
+        return dict(recv=self.recv, revk=self.revk, ack=self.ack)
+
+    @property
+    def env(self):
+        """ LMDB environment, while a batch is open its transactions all join the batch transaction """
+        if self.txn is not None:
+            return Batched(self._env, self.txn)
+        return self._env
+
+    @env.setter
+    def env(self, env):
+        self._env = env
+
+    @contextmanager
+    def batch(self):
+        """
+        Context in which all reads and writes of the CueBaser share one write transaction that commits when the
+        context ends, or aborts if it raises. Nested batches join the outermost one.
+        """
+        if self.txn is not None:
+            yield self.txn
+            return
+
+        try:
+            with self._env.begin(write=True) as txn:
+                self.txn = txn
+                yield txn
+        except Exception:
+            self.txn = None
+            self.lastEvent = self.lastEventNumber()  # event numbers taken by the aborted batch are reused
+            raise
+        finally:
+            self.txn = None
+
+    @contextmanager
+    def savepoint(self):
+        """
+        Context within the open batch whose writes are undone if it raises while the other writes of the batch are
+        kept, so a single failing item does not abort the batch of a whole pass. Opens a batch of its own when no
+        batch is open.
+        """
+        if self.txn is None:
+            with self.batch() as txn:
+                yield txn
+            return
+
+        parent = self.txn
+        child = self._env.begin(write=True, parent=parent)
+        self.txn = child
+        try:
+            yield child
+        except Exception:
+            child.abort()
+            self.txn = parent
+            self.lastEvent = self.lastEventNumber()  # event numbers taken by the undone writes are reused
+            raise
+        else:
+            child.commit()
+        finally:
+            self.txn = parent
+
+    def checkpoint(self):
+        """ Sync the commits of the CueBaser to disk """
+        self._env.sync(True)
+
+    def usage(self):
+        """
+        Returns the bytes of the environment in use by pages and the bytes of free pages that compaction would
+        reclaim. Free pages are left behind when entries are removed and are only reused by later writes.
+
+        Returns:
+            dict: size (bytes up to the last page written) and free (bytes of pages not used by any sub database)
+        """
+        with self._env.begin() as txn:
+            psize = txn.stat(self._env.open_db(txn=txn))["psize"]
+            pages = 2  # meta pages
+            for sub in (self.snd, self.iss, self.rev, self.recv, self.revk, self.ack, self.seqs, self.ordr,
+                        self.evts, self.tries, self.quar, self.crsr, self.meta, self.pres, self.pidx, self.vrdt,
+                        self.qcnt):
+                stat = txn.stat(sub.sdb)
+                pages += stat["branch_pages"] + stat["leaf_pages"] + stat["overflow_pages"]
+            main = txn.stat(self._env.open_db(txn=txn))
+            pages += main["branch_pages"] + main["leaf_pages"] + main["overflow_pages"]
+
+        size = (self._env.info()["last_pgno"] + 1) * psize
+        return dict(size=size, free=max(0, size - pages * psize))
+
+    def compact(self):
+        """
+        Rewrite the environment without its free pages and record the bytes reclaimed in meta. Must not be used
+        while another process has the environment open.
+
+        Returns:
+            int: bytes reclaimed
+        """
+        before = self.usage()["size"]
+        path = self.path
+        compacted = f"{path}.compact"
+        shutil.rmtree(compacted, ignore_errors=True)
+        os.makedirs(compacted)
+        self._env.copy(compacted, compact=True)
+
+        self._env.close()
+        os.replace(os.path.join(compacted, "data.mdb"), os.path.join(path, "data.mdb"))
+        shutil.rmtree(compacted)
+        self.reopen(reuse=True)
+
+        reclaimed = max(0, before - self.usage()["size"])
+        self.meta.pin(keys=("compaction",), val=json.dumps(dict(reclaimed=reclaimed, dt=helping.nowIso8601())))
+        logger.info(f"Compacted {path}, reclaimed {reclaimed} bytes")
+        return reclaimed
+
+    def lastEventNumber(self):
+        """ Returns the sequence number of the last event of the event log, 0 if it is empty """
+        with self.env.begin(db=self.evts.sdb, write=False) as txn:
+            cursor = txn.cursor()
+            return int(bytes(cursor.key()).decode("utf-8"), 16) if cursor.last() else 0
+
     def clearEscrows(self):
         """
         Clear all credential escrows. Useful in testing to avoid many unneeded log messages or force reprocessing of presentations.
@@ -77,24 +376,365 @@ class CueBaser(dbing.LMDBer):
         self.recv.trim()
         self.revk.trim()
         self.ack.trim()
+        self.ordr.trim()
+        self.qcnt.trim()
         logger.info("Cleared iss and rev escrows")
 
+    def pinAll(self, items):
+        """
+        Pin (overwrite) each (sub, keys, val) of items in a single write transaction
+
+        Parameters:
+            items (Iterable): (sub, keys, val) with sub a Suber of this database
+        """
+        with self.batch():
+            for sub, keys, val in items:
+                sub.pin(keys=keys, val=val)
+
+    def depth(self, sub):
+        """
+        Get the number of entries in the sub database sub without iterating over its items
+        """
+        with self.env.begin(db=sub.sdb, write=False) as txn:
+            return txn.stat(sub.sdb)["entries"]
+
     def getCounts(self):
         """
         Get counts of each database for metrics monitoring
         """
-        snd  = len([said for (said,), prefixer in self.snd.getItemIter()])
-        iss  = len([said for (said,), dater in self.iss.getItemIter()])
-        rev  = len([said for (said,), dater in self.rev.getItemIter()])
+        snd  = self.depth(self.snd)
+        iss  = self.depth(self.iss)
+        rev  = self.depth(self.rev)
 
-        recv = len([said for (said, dater_qb64), creder in self.recv.getItemIter()])
-        revk = len([said for (said, dater_qb64), creder in self.revk.getItemIter()])
-        ack  = len([said for (said,), creder in self.ack.getItemIter()])
+        recv = self.depth(self.recv)
+        revk = self.depth(self.revk)
+        ack  = self.depth(self.ack)
+        quar = self.depth(self.quar)
         return {
             'senders': snd,
             'iss': iss,
             'rev': rev,
             'recv': recv,
             'revk': revk,
-            'ack': ack
-        }
\ No newline at end of file
+            'ack': ack,
+            'quarantine': quar
+        }
+
+    def getSubscriberCounts(self, name):
+        """
+        Get counts of the delivery queues of the subscriber name for metrics monitoring from their counters
+        """
+        return {queue: int(self.qcnt.get(keys=(name, queue)) or 0) for queue in self.queues}
+
+    def deepest(self, sub):
+        """ Returns the number of events in the delivery queue sub [recv|revk|ack] of the subscriber with the most """
+        queue = next(queue for queue, db in self.queues.items() if db is sub)
+        return max((int(count) for (_, counted), count in self.qcnt.getItemIter() if counted == queue), default=0)
+
+    def enqueue(self, sub, keys, val):
+        """
+        Pin val at keys in the delivery queue sub [recv|revk|ack] and count it if it was not queued yet
+
+        Parameters:
+            sub (SerderSuber): delivery queue
+            keys (tuple): keys of the event, the name of the subscriber first
+            val (SerderACDC): credential of the event
+        """
+        if sub.get(keys=keys) is None:
+            self.tally(sub, keys[0], 1)
+        sub.pin(keys=keys, val=val)
+
+    def unqueue(self, sub, keys):
+        """
+        Remove the event at keys from the delivery queue sub [recv|revk|ack] and count it if it was queued
+
+        Returns:
+            bool: True if the event was queued
+        """
+        if removed := sub.rem(keys=keys):
+            self.tally(sub, keys[0], -1)
+        return removed
+
+    def tally(self, sub, name, delta):
+        """ Add delta to the counter of the delivery queue sub of subscriber name """
+        queue = next(queue for queue, db in self.queues.items() if db is sub)
+        count = int(self.qcnt.get(keys=(name, queue)) or 0) + delta
+        if count > 0:
+            self.qcnt.pin(keys=(name, queue), val=str(count))
+        else:
+            self.qcnt.rem(keys=(name, queue))
+
+    def rekey(self):
+        """ Move the events of the delivery queues keyed without a subscriber to the queues of DefaultSubscriber
+
+        Returns:
+            int: number of events moved
+        """
+        parts = dict(recv=3, revk=3, ack=2)  # keys of an event including the subscriber
+        moved = 0
+        with self.batch():
+            for queue, sub in self.queues.items():
+                for keys, val in list(sub.getItemIter()):
+                    if len(keys) == parts[queue] - 1:
+                        sub.rem(keys=keys)
+                        sub.pin(keys=(self.DefaultSubscriber,) + tuple(keys), val=val)
+                        moved += 1
+
+        if moved:
+            logger.info(f"Moved {moved} queued events to subscriber {self.DefaultSubscriber}")
+        return moved
+
+    def recount(self):
+        """ Rebuild the counters of the delivery queues with one scan of each queue """
+        with self.batch():
+            self.qcnt.trim()
+            counts = dict()
+            for queue, sub in self.queues.items():
+                for keys, _ in sub.getItemIter():
+                    counts[(keys[0], queue)] = counts.get((keys[0], queue), 0) + 1
+            for keys, count in counts.items():
+                self.qcnt.pin(keys=keys, val=str(count))
+
+    def sequence(self, name, key, said, dates, event=None):
+        """
+        Assign the next sequence number of the ordering key to the event for said queued for subscriber name
+
+        Parameters:
+            name (str): name of the subscriber
+            key (str): ordering key, the SAID of the credential or the AID of its holder
+            said (str): qb64 SAID of the credential
+            dates (str): qb64 Dater of the event
+            event (int): number of the event in the event log
+
+        Returns:
+            int: sequence number of the event, starting at 1 for each key
+        """
+        last = self.seqs.get(keys=(name, key))
+        sn = int(last, 16) + 1 if last is not None else 1
+        self.seqs.pin(keys=(name, key), val=f"{sn:x}")
+        val = f"{said}.{dates}" if event is None else f"{said}.{dates}.{event:x}"
+        self.ordr.pin(keys=(name, key, f"{sn:032x}"), val=val)
+        return sn
+
+    def head(self, name, key):
+        """
+        Get the first event still queued for subscriber name with the ordering key
+
+        Returns:
+            tuple: (sn, said, dates, event) of the event or None if no event is queued for the key, event is its
+                number in the event log or None if it was queued without one
+        """
+        for (_, _, sn), val in self.ordr.getItemIter(keys=(name, key, "")):
+            said, dates, *event = val.split(".")
+            return int(sn, 16), said, dates, int(event[0], 16) if event else None
+        return None
+
+    def dequeue(self, name, key, sn):
+        """
+        Remove the event with sequence number sn of the ordering key once it is delivered or dropped
+        """
+        self.ordr.rem(keys=(name, key, f"{sn:032x}"))
+
+    def failed(self, rid):
+        """
+        Record a failed processing attempt of the notice rid
+
+        Returns:
+            int: number of failed attempts of the notice so far
+        """
+        attempts = int(self.tries.get(keys=(rid,)) or 0) + 1
+        self.tries.pin(keys=(rid,), val=str(attempts))
+        return attempts
+
+    def quarantine(self, rid, pad, error, attempts):
+        """
+        Move the notice rid to quarantine with the error of its last processing attempt
+
+        Parameters:
+            rid (str): random identifier of the notice
+            pad (dict): the notice
+            error (str): error of the last processing attempt
+            attempts (int): number of failed processing attempts
+        """
+        self.quar.pin(keys=(rid,), val=json.dumps(dict(notice=pad, error=error, attempts=attempts,
+                                                       dt=helping.nowIso8601())))
+        self.tries.rem(keys=(rid,))
+
+    def recordVerdict(self, said, valid, reason=None):
+        """
+        Record the verdict of the last verification of the presented credential said
+
+        Parameters:
+            said (str): qb64 SAID of the credential
+            valid (bool): True if the credential passed verification
+            reason (str): why the credential failed verification
+        """
+        self.vrdt.pin(keys=(said,), val=json.dumps(dict(valid=valid, reason=reason, dt=helping.nowIso8601())))
+
+    def indexPresentation(self, record):
+        """
+        Add a delivered presentation to the presentation history and its indexes. Indexing the same presentation
+        again, such as when it is delivered to another subscriber, leaves the history unchanged.
+
+        Parameters:
+            record (dict): presentation with said, dt (received ISO8601 datetime) and the indexed fields
+        """
+        dt, said = record["dt"], record["said"]
+        if not self.pres.put(keys=(dt, said), val=json.dumps(record)):
+            return
+
+        for field in IndexedFields:
+            if (value := record.get(field)) is not None:
+                self.pidx.put(keys=(field, value, dt, said), val=said)
+
+    def getPresentationIter(self, field=None, value=None, since=None, until=None, after=None):
+        """
+        Iterate over the presentation history in received order, over the index of field when given. Only the
+        entries in the range are read so a lookup costs log n plus the entries returned.
+
+        Parameters:
+            field (str): indexed field [lei|holder|issuer|schema], None for all presentations
+            value (str): value of the indexed field
+            since (str): ISO8601 datetime of the first presentation, inclusive
+            until (str): ISO8601 datetime of the last presentation, inclusive
+            after (str): key of the last entry of the previous page
+
+        Returns:
+            Iterator: (key, record) of each presentation with key the position to resume after
+        """
+        if field is not None and field not in IndexedFields:
+            raise ValueError(f"no index for {field}")
+
+        sub, prefix = (self.pres, "") if field is None else (self.pidx, f"{field}/{value}/")
+        start = after if after is not None else f"{prefix}{since or ''}"
+        with self.env.begin(db=sub.sdb, write=False) as txn:
+            cursor = txn.cursor()
+            if not cursor.set_range(start.encode("utf-8")):
+                return
+
+            for key, val in cursor.iternext():
+                key = bytes(key).decode("utf-8")
+                if not key.startswith(prefix):
+                    break
+                if key == after:
+                    continue
+
+                dt, said = key[len(prefix):].split("/")
+                if until is not None and dt > until:
+                    break
+
+                raw = val if field is None else txn.get(self.pres.sep.join((dt, said)).encode("utf-8"), db=self.pres.sdb)
+                yield key, json.loads(bytes(raw).decode("utf-8"))
+
+    def getPresentationMatchIter(self, filters=None, since=None, until=None, after=None):
+        """
+        Iterate over the presentations matching all filters in received order. A single filter reads its index like
+        getPresentationIter, several filters intersect their indexes by leapfrogging: each index is positioned at the
+        first entry at or after the latest entry of the others until they all agree. A lookup costs log n per seek
+        with the seeks proportional to the entries of the most selective index, whatever the order of the filters.
+
+        Parameters:
+            filters (dict): indexed field [lei|holder|issuer|schema] to value, None or empty for all presentations
+            since (str): ISO8601 datetime of the first presentation, inclusive
+            until (str): ISO8601 datetime of the last presentation, inclusive
+            after (str): key of the last entry of the previous page
+
+        Returns:
+            Iterator: (key, record) of each presentation with key the position to resume after
+        """
+        filters = filters if filters is not None else dict()
+        if len(filters) <= 1:
+            field, value = next(iter(filters.items()), (None, None))
+            yield from self.getPresentationIter(field=field, value=value, since=since, until=until, after=after)
+            return
+
+        for field in filters:
+            if field not in IndexedFields:
+                raise ValueError(f"no index for {field}")
+
+        prefixes = [f"{field}/{value}/" for field, value in filters.items()]
+        target = f"{after}\x00" if after is not None else (since or "")  # the first (dt, said) to look for
+        with self.env.begin(write=False) as txn:
+            cursors = [txn.cursor(db=self.pidx.sdb) for _ in prefixes]
+            agreed = idx = 0
+            while True:
+                prefix = prefixes[idx]
+                if not cursors[idx].set_range(f"{prefix}{target}".encode("utf-8")):
+                    return
+                key = bytes(cursors[idx].key()).decode("utf-8")
+                if not key.startswith(prefix):
+                    return
+
+                position = key[len(prefix):]
+                if until is not None and position.split("/")[0] > until:
+                    return
+
+                if position != target:
+                    target, agreed = position, 1
+                elif (agreed := agreed + 1) >= len(cursors):
+                    raw = txn.get(target.encode("utf-8"), db=self.pres.sdb)
+                    if raw is not None:
+                        yield target, json.loads(bytes(raw).decode("utf-8"))
+                    target, agreed = f"{target}\x00", 0  # the entries strictly after the match
+
+                idx = (idx + 1) % len(cursors)
+
+    def appendEvent(self, event):
+        """
+        Append the event to the event log
+
+        Parameters:
+            event (dict): serializable event
+
+        Returns:
+            int: sequence number of the event in the log, starting at 1
+        """
+        sn = self.lastEvent + 1
+        self.evts.put(keys=(f"{sn:032x}",), val=json.dumps(event))
+        self.lastEvent = sn
+        return sn
+
+    def getEvent(self, sn):
+        """
+        Returns the event with sequence number sn of the event log as a dict, None if it is not in the log
+        """
+        raw = self.evts.get(keys=(f"{sn:032x}",))
+        return json.loads(raw) if raw is not None else None
+
+    def getEventIter(self, sn=1):
+        """
+        Iterate over the events of the event log starting at sequence number sn
+
+        Returns:
+            Iterator: (sn, raw) of each event with raw its JSON serialization
+        """
+        with self.env.begin(db=self.evts.sdb, write=False) as txn:
+            cursor = txn.cursor()
+            if not cursor.set_range(f"{sn:032x}".encode("utf-8")):
+                return
+            for key, val in cursor.iternext():
+                yield int(bytes(key).decode("utf-8"), 16), bytes(val).decode("utf-8")
+
+
+class CheckpointDoer(doing.Doer):
+    """
+    Periodically syncs a CueBaser with checkpoint durability to disk, and once more when exiting
+    """
+
+    def __init__(self, cdb, interval=1.0, **kwa):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment to sync
+            interval (float): seconds between checkpoints
+        """
+        self.cdb = cdb
+        super(CheckpointDoer, self).__init__(tock=interval, **kwa)
+
+    def recur(self, tyme):
+        if self.cdb.durability == Durability.checkpoint:
+            self.cdb.checkpoint()
+        return False
+
+    def exit(self):
+        if self.cdb.opened and self.cdb.durability == Durability.checkpoint:
+            self.cdb.checkpoint()
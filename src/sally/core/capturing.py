@@ -0,0 +1,210 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.capturing module
+
+Capture of inbound CESR traffic and its replay into an offline Sally for performance regression testing
+"""
+import os
+import statistics
+import struct
+import time
+
+from hio.base import doing
+from keri import help
+
+from sally.core import importing
+
+logger = help.ogler.getLogger()
+
+# Record header of a capture file, the receive time (seconds since the epoch) and the size of the bytes received
+Header = struct.Struct(">dI")
+
+
+class Capture:
+    """
+    Rotating capture file of the CESR bytes received by Sally. Each record is the receive time and size followed by
+    the bytes as received. Once the file exceeds size bytes it is renamed to path.1, path.1 to path.2 and so on,
+    keeping at most count rotated files.
+    """
+
+    def __init__(self, path, size=64 * 1024 * 1024, count=5):
+        """
+        Parameters:
+            path (str): path of the current capture file
+            size (int): bytes written to a capture file before it is rotated
+            count (int): rotated capture files kept
+        """
+        self.path = path
+        self.size = size
+        self.count = count
+        self.file = open(self.path, "ab")
+
+    def write(self, data, ts=None):
+        """ Append a record of data received at ts, defaults to now """
+        self.file.write(Header.pack(ts if ts is not None else time.time(), len(data)))
+        self.file.write(data)
+        if self.file.tell() >= self.size:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.file = open(self.path, "ab")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Tap(bytearray):
+    """
+    Inbound byte stream of a parser that records everything extended onto it in a Capture. Used as the rxbs of
+    HttpEnd and the ims of MailboxDirector, the parser consumes it like any other bytearray.
+    """
+
+    def __init__(self, capture):
+        super(Tap, self).__init__()
+        self.capture = capture
+
+    def extend(self, data):
+        self.capture.write(bytes(data))
+        super(Tap, self).extend(data)
+
+
+class CaptureDoer(doing.Doer):
+    """ Flushes the capture file every tock seconds and closes it on exit """
+
+    def __init__(self, capture, tock=1.0, **kwa):
+        self.capture = capture
+        super(CaptureDoer, self).__init__(tock=tock, **kwa)
+
+    def recur(self, tyme):
+        self.capture.flush()
+        return False
+
+    def exit(self):
+        self.capture.close()
+
+
+def paths(path):
+    """ Returns the files of the capture at path, oldest first """
+    rotated = []
+    i = 1
+    while os.path.exists(f"{path}.{i}"):
+        rotated.append(f"{path}.{i}")
+        i += 1
+
+    return list(reversed(rotated)) + ([path] if os.path.exists(path) else [])
+
+
+def records(path):
+    """ Generates (ts, data) of every record of the capture at path, oldest first """
+    for name in paths(path):
+        with open(name, "rb") as f:
+            while header := f.read(Header.size):
+                if len(header) < Header.size:
+                    logger.error(f"dropping truncated record header at the end of {name}")
+                    break
+
+                ts, size = Header.unpack(header)
+                data = f.read(size)
+                if len(data) < size:
+                    logger.error(f"dropping truncated record at the end of {name}")
+                    break
+
+                yield ts, data
+
+
+class Replayer:
+    """
+    Feeds the records of a capture to a parser at the speed they were received, speed times faster or as fast as
+    possible, and reports the throughput and the latency of the parser over the capture. Records hold the bytes as
+    they were received so a message may be split across records, the parser is only given whole messages.
+    """
+
+    def __init__(self, parser, escrows=None):
+        """
+        Parameters:
+            parser (Parser): parser of an offline Sally, such as the one of importing.Importer
+            escrows (Callable): processes the escrows after each record
+        """
+        self.parser = parser
+        self.escrows = escrows
+
+    def replay(self, path, speed=1.0):
+        """ Replay the capture at path and returns its report
+
+        Parameters:
+            path (str): path of the current capture file
+            speed (float): replay speed relative to the capture, None or 0 for as fast as possible
+
+        Returns:
+            dict: records, bytes, seconds, records and bytes per second and the p50, p99 and max latency of a record
+        """
+        ims = bytearray()
+        latencies = []
+        size = 0
+        start = time.perf_counter()
+        first = None
+        for ts, data in records(path):
+            if speed:
+                first = first if first is not None else ts
+                delay = (ts - first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            received = time.perf_counter()
+            ims.extend(data)
+            self.feed(ims)
+            if self.escrows is not None:
+                self.escrows()
+
+            latencies.append(time.perf_counter() - received)
+            size += len(data)
+
+        self.feed(ims, eof=True)
+        if self.escrows is not None:
+            self.escrows()
+        if ims:
+            logger.error(f"dropping {len(ims)} bytes of a truncated message at the end of the capture")
+
+        seconds = time.perf_counter() - start
+        report = dict(records=len(latencies), bytes=size, seconds=seconds,
+                      rate=len(latencies) / seconds if seconds else 0.0,
+                      throughput=size / seconds if seconds else 0.0,
+                      p50=0.0, p99=0.0, max=0.0)
+        if latencies:
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else None
+            report.update(p50=statistics.median(latencies),
+                          p99=quantiles[98] if quantiles is not None else latencies[0],
+                          max=max(latencies))
+
+        return report
+
+    def feed(self, ims, eof=False):
+        """ Parse the whole messages at the start of ims and remove them, the rest waits for the next record
+
+        Parameters:
+            ims (bytearray): bytes received and not parsed yet
+            eof (bool): True if no more records follow
+        """
+        end = 0
+        try:
+            while end < len(ims) and (stop := importing.frame(ims, end, eof=eof)) is not None:
+                end = stop
+        except ValueError as ex:
+            logger.error(f"dropping {len(ims) - end} bytes of the capture: {ex}")
+            del ims[end:]
+
+        if end:
+            self.parser.parse(ims=ims[:end])
+            del ims[:end]
@@ -1,3 +1,8 @@
+import hashlib
+import json
+from collections import OrderedDict
+
+import falcon
 from hio.base import doing
 from hio.help import decking
 from keri.core import coring
@@ -11,22 +16,30 @@ class TeveryCuery(doing.Doer):
     Processes credential revocation cues and records when a given credential was revoked in the local cue database (CueBaser).
     """
 
-    def __init__(self, cdb, reger, cues=None, **kwa):
+    def __init__(self, cdb, reger, cues=None, batch=100, cache=None, tenants=None, **kwa):
         """
         Parameters:
             cdb (CueBaser): instance of CueBaser database
             reger (Reger): Stores ACDC / TEL events
             cues (Deck): collection of events (cue) to process
+            batch (int): maximum number of cues processed per cycle in a single write transaction
+            cache (StatusCache): credential status cache to invalidate for revoked credentials
+            tenants (list): CueBasers of the other tenants. A revocation is recorded in the tenants that verified
+                the credential and in this CueBaser unless only tenants verified it
         """
         self.cdb = cdb
         self.reger = reger
         self.cues = cues if cues is not None else decking.Deck()
+        self.batch = batch
+        self.cache = cache
+        self.tenants = tenants if tenants is not None else []
 
         super(TeveryCuery, self).__init__(**kwa)
 
     def do(self, tymth, *, tock=0.0, **opts):
         """
-        Iterates over the cues Deck and processes each ACDC revocation cue to save the ACDC sender and revocation time in the cue database.
+        Iterates over the cues Deck and processes the ACDC revocation cues in batches to save the ACDC sender and
+        revocation time in the cue database.
 
         Inherited Parameters:
             tymth (function): closure for read only injection of cycle time in seconds
@@ -38,21 +51,136 @@ class TeveryCuery(doing.Doer):
 
         while True:
             while self.cues:
-                cue = self.cues.popleft()
-                if cue['kin'] == "revoked":
-                    serder = cue["serder"]
-                    said = serder.ked["i"]
-                    creder = self.reger.creds.get(said)
-                    if creder is None:
-                        logger.error(f"revocation received for unknown credential {said}")
+                self.processCues()
+                yield self.tock
 
-                    prefixer = coring.Prefixer(qb64=creder.issuer)
-                    saider = coring.Saider(qb64=said)
-                    now = coring.Dater()
+            yield self.tock
 
-                    self.cdb.snd.pin(keys=(saider.qb64,), val=prefixer)
-                    self.cdb.rev.pin(keys=(saider.qb64,), val=now)
+    def processCues(self):
+        """
+        Process up to batch cues, looking up the revoked credentials first and then recording the senders and
+        revocation times of all of them in one write transaction.
 
-                yield self.tock
+        Returns:
+            int: number of revocations recorded
+        """
+        items = []
+        hosted = {id(cdb): [] for cdb in self.tenants}
+        count = 0
+        now = coring.Dater()
+        while self.cues and count < self.batch:
+            cue = self.cues.popleft()
+            count += 1
+            if cue['kin'] != "revoked":
+                continue
 
-            yield self.tock
+            serder = cue["serder"]
+            said = serder.ked["i"]
+            if self.cache is not None:
+                self.cache.invalidate(said)
+
+            creder = self.reger.creds.get(said)
+            if creder is None:
+                logger.error(f"revocation received for unknown credential {said}")
+                continue
+
+            prefixer = coring.Prefixer(qb64=creder.issuer)
+            claimed = [cdb for cdb in self.tenants if cdb.vrdt.get(keys=(said,)) is not None]
+            for cdb in claimed:
+                hosted[id(cdb)].extend([(cdb.snd, (said,), prefixer), (cdb.rev, (said,), now)])
+            if not claimed or self.cdb.vrdt.get(keys=(said,)) is not None:
+                items.extend([(self.cdb.snd, (said,), prefixer), (self.cdb.rev, (said,), now)])
+
+        for cdb in self.tenants:
+            if hosted[id(cdb)]:
+                cdb.pinAll(hosted[id(cdb)])
+
+        if items:
+            self.cdb.pinAll(items)
+
+        recorded = (len(items) + sum(len(pinned) for pinned in hosted.values())) // 2
+        if recorded:
+            logger.info(f"Recorded {recorded} revocations of {count} cues")
+
+        return recorded
+
+
+class StatusCache:
+    """
+    In memory cache of the TEL state of credentials so repeated status lookups do not resolve the TEL again.
+    Only credentials with a TEL state are cached, TeveryCuery invalidates the entries of revoked credentials.
+    The least recently used entries are evicted beyond size entries.
+    """
+
+    def __init__(self, reger, size=10000):
+        """
+        Parameters:
+            reger (Reger): credential registry to resolve the TEL state from
+            size (int): maximum number of cached credentials
+        """
+        self.reger = reger
+        self.size = size
+        self.states = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def state(self, said):
+        """ Returns the TEL state of the credential said as a dict, None if the credential or its TEL is unknown """
+        if said in self.states:
+            self.hits += 1
+            self.states.move_to_end(said)
+            return self.states[said]
+
+        self.misses += 1
+        creder = self.reger.creds.get(keys=(said,))
+        if creder is None or (tever := self.reger.tevers.get(creder.regi)) is None:
+            return None
+
+        if (vcstate := tever.vcState(said)) is None:
+            return None
+
+        state = dict(et=vcstate.et, s=vcstate.s, d=vcstate.d, dt=vcstate.dt, ri=creder.regi)
+        self.states[said] = state
+        if len(self.states) > self.size:
+            self.states.popitem(last=False)
+        return state
+
+    def invalidate(self, said):
+        self.states.pop(said, None)
+
+
+class CredentialStatusEnd:
+    """
+    Status of a credential Sally verified: the verdict of its last verification and the state of its TEL.
+    Responses carry an ETag so pollers get a 304 Not Modified until the status changes.
+    """
+
+    def __init__(self, cdb, cache):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment with the verification verdicts
+            cache (StatusCache): cache of the TEL state of credentials
+        """
+        self.cdb = cdb
+        self.cache = cache
+
+    def on_get(self, req, rep, said):
+        """ Returns the verdict and TEL state of the credential said """
+        verdict = self.cdb.vrdt.get(keys=(said,))
+        state = self.cache.state(said)
+        if verdict is None and state is None:
+            raise falcon.HTTPNotFound(description=f"unknown credential {said}")
+
+        body = dict(said=said, verdict=json.loads(verdict) if verdict is not None else None, status=state,
+                    revoked=state is not None and state["et"] in ("rev", "brv"))
+        raw = json.dumps(body, sort_keys=True).encode("utf-8")
+        etag = hashlib.sha256(raw).hexdigest()[:32]
+        rep.etag = etag
+        rep.cache_control = ["no-cache"]
+        if req.if_none_match and any(tag in (etag, "*") for tag in req.if_none_match):
+            rep.status = falcon.HTTP_304
+            return
+
+        rep.status = falcon.HTTP_200
+        rep.content_type = falcon.MEDIA_JSON
+        rep.data = raw
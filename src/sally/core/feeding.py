@@ -0,0 +1,95 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.feeding module
+
+Server-Sent Events feed of the event log of verified presentations and revocations
+"""
+import json
+import time
+from itertools import islice
+
+import falcon
+from keri import help
+
+logger = help.ogler.getLogger()
+
+
+class EventIterable:
+    """
+    Iterable streaming the events of the event log as Server-Sent Events, starting after the last event ID the
+    consumer has seen. Each call to next returns the events appended since the previous call, at most batch at a
+    time, and an empty chunk if there are none. The stream ends once no event was sent for timeout seconds so the
+    consumer reconnects with its Last-Event-ID.
+    """
+
+    TimeoutEvents = 300  # seconds without an event before the stream is closed
+
+    def __init__(self, cdb, sn=1, retry=5000, batch=100, timeout=None):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment with the event log
+            sn (int): sequence number of the first event to stream
+            retry (int): milliseconds the consumer waits before reconnecting
+            batch (int): maximum number of events returned by one call to next
+            timeout (float): seconds without an event before the stream is closed, defaults to TimeoutEvents
+        """
+        self.cdb = cdb
+        self.sn = sn
+        self.retry = retry
+        self.batch = batch
+        self.timeout = timeout if timeout is not None else self.TimeoutEvents
+        self.start = None  # perf counter time the last event was sent
+        self.retried = False
+
+    def __iter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __next__(self):
+        if not self.retried:
+            self.retried = True
+            return f"retry: {self.retry}\n\n".encode("utf-8")
+
+        data = bytearray()
+        for sn, raw in islice(self.cdb.getEventIter(sn=self.sn), self.batch):
+            action = json.loads(raw).get("action", "message")
+            data.extend(f"id: {sn}\nevent: {action}\ndata: {raw}\n\n".encode("utf-8"))
+            self.sn = sn + 1
+            self.start = time.perf_counter()
+
+        if not data and time.perf_counter() - self.start >= self.timeout:
+            raise StopIteration
+
+        return bytes(data)
+
+
+class EventsEnd:
+    """
+    Server-Sent Events endpoint streaming the verified presentations and revocations from the event log.
+    Consumers resume where they left off with the Last-Event-ID header.
+    """
+
+    def __init__(self, cdb, retry=5000, timeout=None):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment with the event log
+            retry (int): milliseconds consumers wait before reconnecting
+            timeout (float): seconds without an event before a stream is closed
+        """
+        self.cdb = cdb
+        self.retry = retry
+        self.timeout = timeout
+
+    def on_get(self, req, rep):
+        """ Stream the events after Last-Event-ID, or all events when it is not given """
+        last = req.get_header("Last-Event-ID")
+        try:
+            sn = max(1, int(last) + 1) if last is not None else 1
+        except ValueError:
+            raise falcon.HTTPBadRequest(description=f"invalid Last-Event-ID {last}")
+
+        rep.status = falcon.HTTP_200
+        rep.content_type = "text/event-stream"
+        rep.set_header("Cache-Control", "no-cache")
+        rep.stream = EventIterable(cdb=self.cdb, sn=sn, retry=self.retry, timeout=self.timeout)
@@ -7,38 +7,22 @@ EXN Message handling
 """
 import datetime
 import json
-from base64 import urlsafe_b64encode as encodeB64
+import time
 from typing import List
-from urllib import parse
 
 from hio.base import doing, Doer
-from hio.core import http
-from hio.help import Hict
 from keri import help, kering
 from keri.core import coring
+from keri.db import dbing
 from keri.peer import exchanging
-from keri.end import ending
 from keri.help import helping
-from sally.core import httping
+from sally.core import admitting, basing, scheduling, scheming, sinking
 
 logger = help.ogler.getLogger()
 
-# vLEI ACDC schema SAIDs
-QVI_SCHEMA = "EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao"
-LE_SCHEMA = "ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY"
-OOR_AUTH_SCHEMA = "EKA57bKBKxr_kN7iN5i7lMUxpMG-s19dRcmov1iDxz-E"
-OOR_SCHEMA = "EBNaNu-M9P5cgrnfl2Fvymy4E_jvxxyjb70PRtiANlJy"
 
-# makes log messages nicer
-type_to_name = {
-    QVI_SCHEMA: "QVI",
-    LE_SCHEMA: "LE",
-    OOR_AUTH_SCHEMA: "OOR Auth",
-    OOR_SCHEMA: "OOR"
-}
-
-
-def loadHandlers(cdb, hby, notifier, parser) -> List[Doer]:
+def loadHandlers(cdb, hby, notifier, parser, reger=None, admitter=None, screener=None, attempts=3, budget=25,
+                 duration=0.05, tenants=None) -> List[Doer]:
     """
     Returns an array of Doers that are handlers for the peer-to-peer exchange messages.
     Sally only uses the notification handler for ACDC presentations.
@@ -48,22 +32,44 @@ def loadHandlers(cdb, hby, notifier, parser) -> List[Doer]:
         hby (Habery): identifier database environment (master keystore)
         notifier (Notifier): Notifications
         parser (Parser): to parse and process each message referred to in an EXN message
+        reger (Reger): credential registry to skip parsing TEL events and credentials already known, None to parse all
+        admitter (Admitter): admission control for presentations, None to admit all presentations
+        screener (Screener): schema and edge check of presented credentials before parsing, None to parse all
+        attempts (int): processing attempts of a notice before it is quarantined
+        budget (int): notices processed per pass before yielding to the other Doers
+        duration (float): seconds spent processing notices per pass before yielding to the other Doers
+        tenants (dict): recipient AID to the CueBaser of the tenant hosting it, grants to other recipients go to cdb
     """
-    return [PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser)]
+    return [PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser, reger=reger,
+                                     admitter=admitter, screener=screener, attempts=attempts, budget=budget,
+                                     duration=duration, tenants=tenants)]
 
 
 class PresentationProofHandler(doing.Doer):
     """
     Processor for responding to peer-to-peer (exn) notification messages of IPEX Grant presentation proofs.
 
+    Each pass processes at most budget notices within duration seconds so a large backlog of notices does not starve
+    the other Doers. The next pass resumes after the last notice visited from a cursor persisted in the CueBaser.
     """
 
-    def __init__(self, cdb, hby, notifier, parser, **kwa):
+    CursorNotes = "notes"  # key of the notice cursor in the CueBaser
+
+    def __init__(self, cdb, hby, notifier, parser, reger=None, admitter=None, screener=None, attempts=3, budget=25,
+                 duration=0.05, tenants=None, **kwa):
         """ Initialize instance
 
         Parameters:
             cdb (CueBaser): communication escrow database environment
             notifier(Notifier): to read notifications to processes exns
+            reger (Reger): credential registry to skip parsing TEL events and credentials already known
+            admitter (Admitter): admission control for presentations, None to admit all presentations
+            screener (Screener): schema and edge check of presented credentials before parsing, None to parse all
+            attempts (int): processing attempts of a notice before it is moved to quarantine
+            budget (int): notices processed per pass
+            duration (float): seconds spent processing notices per pass, at least one notice is always processed
+            tenants (dict): recipient AID to the CueBaser of the tenant hosting it, grants to other recipients
+                are escrowed in cdb
             **kwa (dict): keyword arguments passes to super Doer
 
         """
@@ -71,6 +77,13 @@ class PresentationProofHandler(doing.Doer):
         self.hby = hby
         self.notifier = notifier
         self.parser = parser
+        self.reger = reger
+        self.admitter = admitter
+        self.screener = screener
+        self.attempts = attempts
+        self.budget = budget
+        self.duration = duration
+        self.tenants = tenants if tenants is not None else dict()
         super(PresentationProofHandler, self).__init__()
 
     def processNotes(self):
@@ -133,7 +146,16 @@ class PresentationProofHandler(doing.Doer):
             }
         }
         """
-        for keys, notice in self.notifier.noter.notes.getItemIter():
+        start = time.perf_counter()
+        stored = cursor = self.cdb.crsr.get(keys=(self.CursorNotes,))
+        processed = 0
+        for keys, notice in self.notices(after=cursor):
+            if processed and (processed >= self.budget or time.perf_counter() - start >= self.duration):
+                logger.debug(f"Yielding after {processed} notices, resuming after {cursor}")
+                break
+
+            processed += 1
+            previous, cursor = cursor, self.notifier.noter.notes.sep.join(keys)
             logger.info(f"Processing notice {notice.pretty()}")
             attrs = notice.attrs
             route = attrs['r']
@@ -141,28 +163,144 @@ class PresentationProofHandler(doing.Doer):
             if route == '/exn/ipex/grant':
                 # said of grant message
                 said = attrs['d']
-                exn, pathed = exchanging.cloneMessage(self.hby, said=said)
-                embeds = exn.ked['e']
+                decision = self.admit(said)
+                if decision == admitting.Decisions.defer:
+                    # leave this and all later notices queued until the escrows drain
+                    cursor = previous
+                    break
+
+                if decision == admitting.Decisions.limit:
+                    # leave this notice queued for a later pass, the notices of other senders go ahead
+                    logger.info(f"Leaving grant {said} queued, its sender is over its rate limit")
+                    continue
+
+                if decision != admitting.Decisions.admit:
+                    logger.warning(f"Dropping grant {said}, admission decision {decision}")
+                    self.notifier.noter.notes.rem(keys=keys)
+                    continue
+
+                if (reason := self.screen(said)) is not None:
+                    logger.warning(f"Dropping grant {said}, presented credential has an invalid {reason}")
+                    self.notifier.noter.notes.rem(keys=keys)
+                    continue
 
-                for label in ("anc", "iss", "acdc"):
-                    ked = embeds[label]
-                    sadder = coring.Sadder(ked=ked)
-                    ims = bytearray(sadder.raw) + pathed[label]
-                    self.parser.parseOne(ims=ims)
+                try:
+                    self.processGrant(said)
+                except Exception as ex:
+                    attempts = self.cdb.failed(notice.rid)
+                    if attempts < self.attempts:
+                        logger.error(f"Processing grant {said} failed (attempt {attempts} of {self.attempts}): {ex}")
+                        continue  # retry on the next pass without holding up the notices behind it
+
+                    logger.error(f"Quarantined grant {said} after {attempts} failed attempts: {ex}")
+                    logger.debug("Last processing failure", exc_info=True)
+                    self.cdb.quarantine(notice.rid, notice.pad, error=f"{type(ex).__name__}: {ex}",
+                                        attempts=attempts)
+                else:
+                    self.cdb.tries.rem(keys=(notice.rid,))
 
-                acdc = embeds["acdc"]
-                said = acdc['d']
+            # deleting wether its a grant or not, since we only process grant
+            self.notifier.noter.notes.rem(keys=keys)
+        else:
+            cursor = None  # reached the last notice, start over from the first
+
+        # the cursor is written once per slice and only when it moved
+        if cursor != stored:
+            if cursor is None:
+                self.cdb.crsr.rem(keys=(self.CursorNotes,))
+            else:
+                self.cdb.crsr.pin(keys=(self.CursorNotes,), val=cursor)
+        return False
 
-                sender = acdc['i']
-                prefixer = coring.Prefixer(qb64=sender)
+    def notices(self, after=None):
+        """ Generates (keys, notice) of the queued notices in order, starting after the notice with key after """
+        notes = self.notifier.noter.notes
+        for keys, raw in basing.getItemIterAfter(notes, after=after):
+            yield keys, notes.klas(raw=raw)
+
+    def processGrant(self, said):
+        """ Parse the events embedded in the grant exn with SAID said and escrow the presented credential """
+        exn, pathed = exchanging.cloneMessage(self.hby, said=said)
+        if exn is None:
+            raise kering.ValidationError(f"grant {said} not found")
+
+        embeds = exn.ked['e']
+
+        ims = bytearray()  # reused for each embed, parseOne consumes the message it parses from the buffer
+        for label in ("anc", "iss", "acdc"):
+            ked = embeds[label]
+            if self.known(label, ked):
+                logger.debug(f"Skipping {label} {ked['d']} of grant {said}, already known")
+                continue
 
-                self.cdb.snd.pin(keys=(said,), val=prefixer)
-                self.cdb.iss.pin(keys=(said,), val=coring.Dater())
+            ims.clear()
+            ims.extend(coring.Sadder(ked=ked).raw)
+            ims.extend(pathed[label])
+            self.parser.parseOne(ims=ims)
 
-            # deleting wether its a grant or not, since we only process grant
-            self.notifier.noter.notes.rem(keys=keys)
+        acdc = embeds["acdc"]
+        said = acdc['d']
 
-        return False
+        sender = acdc['i']
+        prefixer = coring.Prefixer(qb64=sender)
+
+        cdb = self.route(exn)
+        cdb.snd.pin(keys=(said,), val=prefixer)
+        cdb.iss.pin(keys=(said,), val=coring.Dater())
+
+    def route(self, exn):
+        """ Returns the CueBaser of the tenant the grant exn is addressed to """
+        attrs = exn.ked.get('a')
+        recipient = attrs.get('i') if isinstance(attrs, dict) else None
+        return self.tenants.get(recipient, self.cdb)
+
+    def known(self, label, ked):
+        """ Returns True if the embedded event or credential of a grant was already accepted
+
+        Parameters:
+            label (str): embed label [anc|iss|acdc]
+            ked (dict): the embedded key event, TEL event or credential
+        """
+        if label == "anc":  # accepted into the KEL of the issuer
+            return self.hby.db.fons.get(keys=(ked['i'], ked['d'])) is not None
+
+        if self.reger is None:
+            return False
+
+        if label == "iss":  # accepted into the TEL of the credential
+            dig = self.reger.getTel(dbing.snKey(ked['i'], int(ked['s'], 16)))
+            return dig is not None and bytes(dig) == ked['d'].encode("utf-8")
+
+        return self.reger.saved.get(keys=(ked['d'],)) is not None
+
+    def admit(self, said):
+        """ Returns the admission decision for the grant exn with SAID said based on the grant sender
+
+        The grant is read from the Exchanger database without its attachments so the check is cheap
+        compared to parsing the embedded events.
+        """
+        if self.admitter is None:
+            return admitting.Decisions.admit
+
+        exn = self.hby.db.exns.get(keys=(said,))
+        if exn is None:
+            return admitting.Decisions.admit  # let processing report the missing grant
+
+        return self.admitter.admit(exn.pre)
+
+    def screen(self, said):
+        """ Returns the reason to reject the credential presented by the grant exn with SAID said, None to process it
+
+        Like admission the grant is read without its attachments so rejected grants are never parsed or stored.
+        """
+        if self.screener is None:
+            return None
+
+        exn = self.hby.db.exns.get(keys=(said,))
+        if exn is None or not isinstance(exn.ked.get('e'), dict) or not isinstance(exn.ked['e'].get("acdc"), dict):
+            return None  # let processing report the missing or malformed grant
+
+        return self.screener.screen(exn.ked['e']["acdc"])
 
     def recur(self, tyme):
         """
@@ -179,7 +317,8 @@ class Communicator(doing.DoDoer):
     an HTTP API call to the configured webhook URL.
     """
 
-    def __init__(self, hby, hab, cdb, reger, auth, hook, timeout=10, retry=3.0):
+    def __init__(self, hby, hab, cdb, reger, auth, hook=None, timeout=10, retry=3.0, schemas=None,
+                 subscribers=None, lanes=None, starvation=60.0, metrics=None, ordering="credential", interval=1.0):
         """
         Create a communicator capable of persistent processing of messages and performing
         web hook calls.
@@ -190,10 +329,26 @@ class Communicator(doing.DoDoer):
             cdb (CueBaser): communication escrow database environment
             reger (Reger): credential registry and database
             auth (str): AID of external authority for contacts and credentials
-            hook (str): web hook to call in response to presentations and revocations
+            hook (str): URL of the web hook or sink to deliver presentations and revocations to when no
+                subscribers are provided
             timeout (int): escrow timeout (in minutes) for events not delivered to upstream web hook
             retry (float): retry delay (in seconds) for failed web hook attempts
+            schemas (dict): schema SAID to schema configuration, defaults to the vLEI schemas
+            subscribers (list): Subscribers that each receive the verified presentations and revocations
+            lanes (dict): action [iss|rev] to delivery lane configuration, defaults to scheduling.DEFAULT_LANES
+            starvation (float): seconds a backlogged lane may go without a delivery before it is served first
+            metrics (Metrics): metrics registry to record delivery lane latencies in
+            ordering (str): deliver events in order per credential SAID (credential) or per holder AID (holder)
+            interval (float): seconds between passes of the delivery pipeline, must be shorter than the latency
+                target of every lane since an event waits up to one interval before it is sent
         """
+        if ordering not in ("credential", "holder"):
+            raise ValueError(f"invalid delivery ordering {ordering}")
+        for action, lane in (lanes if lanes is not None else scheduling.DEFAULT_LANES).items():
+            if lane.get("target") is not None and lane["target"] <= interval:
+                raise ValueError(f"latency target {lane['target']}s of the {action} lane must be longer than the "
+                                 f"delivery interval {interval}s")
+
         self.hby = hby
         self.hab = hab
         self.cdb = cdb
@@ -202,9 +357,33 @@ class Communicator(doing.DoDoer):
         self.auth = auth
         self.timeout = timeout
         self.retry = retry
-        self.clients = dict()
-
-        super(Communicator, self).__init__(doers=[doing.doify(self.escrowDo)])
+        self.interval = interval
+        self.ordering = ordering
+        self.subscribers = (subscribers if subscribers is not None
+                            else sinking.openSubscribers(hab, hooks=[hook], retry=retry))
+        self.schedulers = {subscriber.name: scheduling.Scheduler(name=subscriber.name, lanes=lanes,
+                                                                 starvation=starvation, metrics=metrics)
+                           for subscriber in self.subscribers}
+
+        self.schemas = scheming.SchemaRegistry()
+        self.schemas.configure(
+            schemas if schemas is not None else scheming.DEFAULT_SCHEMAS,
+            validators={
+                "qvi": self.validateQualifiedvLEIIssuer,
+                "le": self.validateLegalEntity,
+                "oor-auth": self.validateOfficialRoleAuth,
+                "oor": self.validateOfficialRole
+            },
+            payloads={
+                "qvi": self.qviPayload,
+                "le": self.entityPayload,
+                "oor": self.roleCredentialPayload
+            })
+
+        doers = [doing.doify(self.escrowDo)]
+        doers.extend([subscriber.sink for subscriber in self.subscribers if isinstance(subscriber.sink, doing.Doer)])
+
+        super(Communicator, self).__init__(doers=doers)
 
     def processPresentations(self):
         """
@@ -212,118 +391,257 @@ class Communicator(doing.DoDoer):
         validates and the credential is not revoked. Otherwise, remove the presentation from the escrow.
         """
 
-        for (said,), dater in self.cdb.iss.getItemIter():
-            # cancel presentations that have been around longer than timeout
-            now = helping.nowUTC()
-            logger.info(f"looking for credential {said}")
-            if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
-                self.cdb.iss.rem(keys=(said,))
-                continue
-
-            if self.reger.saved.get(keys=(said,)) is not None:
-                creder = self.reger.creds.get(keys=(said,))
-                try:
-                    regk = creder.regi
-                    state = self.reger.tevers[regk].vcState(creder.said)
-                    if state is None or state.et not in (kering.Ilks.iss, kering.Ilks.bis):
-                        raise kering.ValidationError(f"revoked credential {creder.said} being presented")
-                    if creder.schema == QVI_SCHEMA:
-                        self.validateQualifiedvLEIIssuer(creder)
-                    elif creder.schema == LE_SCHEMA:
-                        self.validateLegalEntity(creder)
-                    elif creder.schema == OOR_SCHEMA:
-                        self.validateOfficialRole(creder)
-                    else:
-                        raise kering.ValidationError(f"credential {creder.said} is of unsupported schema"
-                                                     f" {creder.schema} from issuer {creder.issuer}")
-                except kering.ValidationError as ex:
-                    logger.error(f"credential {creder.said} from issuer {creder.issuer} failed validation: {ex}")
-                else:
-                    self.cdb.recv.pin(keys=(said, dater.qb64), val=creder)
-                finally:
-                    self.cdb.iss.rem(keys=(said,))
+        for (said,), dater in list(self.cdb.iss.getItemIter()):
+            try:
+                with self.cdb.savepoint():
+                    self.processPresentation(said, dater)
+            except Exception as ex:
+                # left in escrow to be retried on the next pass until it times out
+                logger.error(f"Processing presentation of {said} failed: {ex}")
+                logger.debug("Presentation processing failure", exc_info=True)
+
+    def processPresentation(self, said, dater):
+        """ Validate the presentation of credential said received at dater and remove it from the escrow """
+        # cancel presentations that have been around longer than timeout
+        now = helping.nowUTC()
+        logger.info(f"looking for credential {said}")
+        if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
+            self.cdb.iss.rem(keys=(said,))
+            return
+
+        if self.reger.saved.get(keys=(said,)) is not None:
+            creder = self.reger.creds.get(keys=(said,))
+            try:
+                # reject unsupported schemas before reading any of the TEL or credential chain
+                schemage = self.schemas.lookup(creder.schema)
+                regk = creder.regi
+                state = self.reger.tevers[regk].vcState(creder.said)
+                if state is None or state.et not in (kering.Ilks.iss, kering.Ilks.bis):
+                    raise kering.ValidationError(f"revoked credential {creder.said} being presented")
+                schemage.validator(creder)
+            except kering.ValidationError as ex:
+                logger.error(f"credential {creder.said} from issuer {creder.issuer} failed validation: {ex}")
+                self.cdb.recordVerdict(said, valid=False, reason=str(ex))
+            else:
+                self.cdb.recordVerdict(said, valid=True)
+                self.dispatch(db=self.cdb.recv, action="iss", said=said, dater=dater, creder=creder)
+            self.cdb.iss.rem(keys=(said,))
 
     def processRevocations(self):
         """
         Ensure revocation CESR data is fully received before moving it to the "revoked to be processed" key/value area.
         """
 
-        for (said,), dater in self.cdb.rev.getItemIter():
+        for (said,), dater in list(self.cdb.rev.getItemIter()):
+            try:
+                with self.cdb.savepoint():
+                    self.processRevocation(said, dater)
+            except Exception as ex:
+                # left in escrow to be retried on the next pass until it times out
+                logger.error(f"Processing revocation of {said} failed: {ex}")
+                logger.debug("Revocation processing failure", exc_info=True)
+
+    def processRevocation(self, said, dater):
+        """ Move the revocation of credential said received at dater to delivery once its TEL rev event is known """
+        # cancel revocations that have been around longer than timeout
+        now = helping.nowUTC()
+        if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
+            self.cdb.rev.rem(keys=(said,))
+            return
+
+        creder = self.reger.creds.get(keys=(said,))
+        if creder is None:  # received revocation before credential.  probably an error but let it timeout
+            return
 
-            # cancel revocations that have been around longer than timeout
-            now = helping.nowUTC()
-            if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
-                self.cdb.rev.rem(keys=(said,))
-                continue
+        regk = creder.regi
+        state = self.reger.tevers[regk].vcState(creder.said)
+        if state is None:  # received revocation before status.  probably an error but let it timeout
+            return
 
-            creder = self.reger.creds.get(keys=(said,))
-            if creder is None:  # received revocation before credential.  probably an error but let it timeout
-                continue
+        elif state.et in (kering.Ilks.iss, kering.Ilks.bis):  # haven't received revocation event yet
+            return
 
-            regk = creder.regi
-            state = self.reger.tevers[regk].vcState(creder.said)
-            if state is None:  # received revocation before status.  probably an error but let it timeout
-                continue
+        elif state.et in (kering.Ilks.rev, kering.Ilks.brv):  # revoked
+            self.cdb.rev.rem(keys=(said,))
+            self.dispatch(db=self.cdb.revk, action="rev", said=said, dater=dater, creder=creder)
 
-            elif state.et in (kering.Ilks.iss, kering.Ilks.bis):  # haven't received revocation event yet
+    def dispatch(self, db, action, said, dater, creder):
+        """
+        Append a verified presentation or revocation to the event log and fan it out to the delivery queue of each
+        subscriber that accepts it. Verification has already happened once so subscribers only differ in what and
+        when they deliver.
+
+        Parameters:
+            db (SerderSuber): delivery queue, recv for presentations and revk for revocations
+            action (str): the action performed on the credential [iss|rev]
+            said (str): qb64 SAID of credential
+            dater (Dater): time the presentation or revocation was received
+            creder (SerderACDC): the verified credential
+        """
+        event = sinking.envelope(said, creder.schema, action, creder.issuer, self.payload(action, creder))
+        number = self.cdb.appendEvent(event)
+        logger.info(f"Logged {action} of {said} as event {number}")
+
+        name = self.schemas.name(creder.schema)
+        subscribers = [subscriber for subscriber in self.subscribers if subscriber.accepts(creder.schema, action, name)]
+        if not subscribers:
+            logger.info(f"No subscriber for {action} of {name} with SAID {said}")
+            return
+
+        for subscriber in subscribers:
+            sn = self.cdb.sequence(subscriber.name, self.orderKey(creder), said, dater.qb64, event=number)
+            self.cdb.enqueue(db, keys=(subscriber.name, said, dater.qb64), val=creder)
+            logger.debug(f"Queued {action} of {said} for {subscriber.name} with sequence number {sn}")
+
+    def payload(self, action, creder):
+        """ Returns the event data for the presentation (iss) or revocation (rev) of the credential """
+        if action == "iss":  # presentation of issued credential
+            return self.schemas.lookup(creder.schema).payload(creder)
+        return self.revokePayload(creder)  # revocation of credential
+
+    def orderKey(self, creder):
+        """ Returns the key events are delivered in order for, the credential SAID or the AID of its holder """
+        if self.ordering == "holder":
+            return creder.attrib.get("i", creder.said) if isinstance(creder.attrib, dict) else creder.said
+        return creder.said
+
+    def processReceived(self):
+        """
+        Prepare the appropriate payload for issuances or revocations based on schema type and send
+        the payload in a request to each subscriber.
+        """
+        for subscriber in self.subscribers:
+            try:
+                self.processSubscriber(subscriber)
+            except Exception as ex:
+                logger.error(f"Processing deliveries to {subscriber.name} failed: {ex}")
+                logger.debug("Delivery processing failure", exc_info=True)
+
+    def processSubscriber(self, subscriber):
+        """
+        Collect the delivery results of a single subscriber then deliver the events waiting in its revocation and
+        issuance lanes in the order given by its scheduler. New deliveries are only started as far as the circuit
+        breaker of the subscriber and the concurrency budgets of the lanes allow, the other events are held in
+        the escrow.
+
+        The results collected are committed before any delivery is started. Deliveries cannot be undone so they are
+        sent outside of any batch, an event stays in the escrow until the result of its delivery is collected.
+        """
+        scheduler = self.schedulers[subscriber.name]
+        lanes = dict(rev=self.cdb.revk, iss=self.cdb.recv)
+        with self.cdb.batch():
+            for action, db in lanes.items():
+                self.collect(subscriber, scheduler, db, action)
+
+        sink = subscriber.sink
+        queues = {action: self.waiting(subscriber, scheduler.lane(action), db) for action, db in lanes.items()}
+        for lane, ((_, said, dates), creder, sn, number) in scheduler.rounds(
+                queues, ready=lambda: subscriber.ready() and not sink.full):
+            action = lane.action
+            resource = creder.schema
+            actor = creder.issuer
+            try:
+                data = self.logged(number, said, action)
+                if data is None:  # queued before events were logged or its event was pruned from the log
+                    data = self.payload(action, creder)
+            except Exception as ex:
+                logger.error(f"Building the {action} payload of {said} for {subscriber.name} failed: {ex}")
                 continue
 
-            elif state.et in (kering.Ilks.rev, kering.Ilks.brv):  # revoked
-                self.cdb.rev.rem(keys=(said,))
-                self.cdb.revk.pin(keys=(said, dater.qb64), val=creder)
+            logger.info(f"Sending {action} of {self.schemas.name(creder.schema)} to {subscriber.name} "
+                        f"with SAID {said}")
+            logger.info(f"Payload: \n{json.dumps(data, indent=1)}\n")
+
+            self.request(subscriber, creder.said, resource, action, actor, data, sequence=sn)
+            subscriber.sent()
+            scheduler.sent(action, said, dates)
 
-    def processReceived(self, db, action):
+    def waiting(self, subscriber, lane, db):
         """
-        Prepare the appropriate payload for issuances or revocations based on schema type and send
-        the payload in a request to the webhook URL.
+        Generates the events of the lane that are not in flight to the subscriber with their sequence numbers and
+        their numbers in the event log.
+        An event is only generated once all events queued before it for the same ordering key are delivered so
+        events of one key are delivered in order while events of different keys are delivered concurrently.
         """
+        name = subscriber.name
+        for keys, creder in db.getItemIter(keys=(name, "")):
+            (_, said, dates) = keys
+            if said in lane.inflight or subscriber.sink.pending(said):
+                continue
 
-        for (said, dates), creder in db.getItemIter():
-            if said not in self.clients:
-                resource = creder.schema
-                actor = creder.issuer
-                if action == "iss":  # presentation of issued credential
-                    if creder.schema == QVI_SCHEMA:
-                        data = self.qviPayload(creder)
-                    elif creder.schema == LE_SCHEMA:
-                        data = self.entityPayload(creder)
-                    elif creder.schema == OOR_SCHEMA:
-                        data = self.roleCredentialPayload(self.reger, creder)
-                    else:
-                        logger.error(f"invalid credential with schema {creder.schema} said {creder.said} issuer {creder.issuer}")
-                        raise kering.ValidationError("this will never happen because all credentials that get here are"
-                                                     " valid")
-                else:  # revocation of credential
-                    data = self.revokePayload(creder)
-
-                logger.info(f"Sending {action} of {type_to_name[creder.schema]} to {self.hook} with SAID {said}")
-                logger.info(f"Payload: \n{json.dumps(data, indent=1)}\n")
-
-                self.request(creder.said, resource, action, actor, data)
+            key = self.orderKey(creder)
+            head = self.cdb.head(name, key)
+            while head is not None and head[1:3] != (said, dates) and not self.queued(name, head[1], head[2]):
+                self.cdb.dequeue(name, key, head[0])  # stale entry of an event no longer in escrow
+                head = self.cdb.head(name, key)
+
+            if head is None:  # queued before sequencing
+                yield keys, creder, None, None
+            elif head[1:3] == (said, dates):
+                yield keys, creder, head[0], head[3]
+
+    def logged(self, number, said, action):
+        """ Returns the data of the event number of the event log if it is the action on said, else None """
+        if number is None:
+            return None
+        event = self.cdb.getEvent(number)
+        if event is None or event.get("said") != said or event.get("action") != action:
+            return None
+        return event["data"]
+
+    def queued(self, name, said, dates):
+        """ Returns True if the event is still in one of the delivery queues of subscriber name """
+        return (self.cdb.recv.get(keys=(name, said, dates)) is not None
+                or self.cdb.revk.get(keys=(name, said, dates)) is not None)
+
+    def collect(self, subscriber, scheduler, db, action):
+        """ Collect the results of the deliveries of a lane in flight to the subscriber """
+        for said, dates in list(scheduler.lane(action).inflight.items()):
+            status = subscriber.sink.status(said)
+            if status is None:
                 continue
 
-            (client, clientDoer) = self.clients[said]
-            if client.responses:
-                response = client.responses.popleft()
-                self.remove([clientDoer])
-                client.close()
-                del self.clients[said]
+            dater = coring.Dater(qb64=dates)
+            now = helping.nowUTC()
+            creder = db.get(keys=(subscriber.name, said, dates))
+            if 200 <= status < 300:
+                subscriber.succeeded()
+                scheduler.done(action, said, latency=(now - dater.datetime).total_seconds())
+                self.cdb.unqueue(db, keys=(subscriber.name, said, dates))
+                if creder is not None:
+                    self.cdb.enqueue(self.cdb.ack, keys=(subscriber.name, said), val=creder)
+                    if action == "iss":
+                        self.cdb.indexPresentation(self.presentation(said, dater, creder))
+                    self.release(subscriber.name, creder, said, dates)
+            else:
+                subscriber.failed()
+                scheduler.done(action, said)
+                logger.info(f"Delivery of {action} with SAID {said} to {subscriber.name} failed with {status}, "
+                            f"circuit breaker is {subscriber.state}")
+                if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
+                    self.cdb.unqueue(db, keys=(subscriber.name, said, dates))
+                    if creder is not None:
+                        self.release(subscriber.name, creder, said, dates)
 
-                if 200 <= response["status"] < 300:
-                    db.rem(keys=(said, dates))
-                    self.cdb.ack.pin(keys=(said,), val=creder)
-                else:
-                    dater = coring.Dater(qb64=dates)
-                    now = helping.nowUTC()
-                    if now - dater.datetime > datetime.timedelta(minutes=self.timeout):
-                        db.rem(keys=(said, dates))
+    @staticmethod
+    def presentation(said, dater, creder):
+        """ Returns the presentation history record of the credential received at dater """
+        return dict(said=said, schema=creder.schema, issuer=creder.issuer, holder=creder.attrib.get("i"),
+                    lei=creder.attrib.get("LEI"), dt=helping.toIso8601(dater.datetime))
+
+    def release(self, name, creder, said, dates):
+        """ Let the next event of the ordering key of a delivered or dropped event be delivered """
+        key = self.orderKey(creder)
+        head = self.cdb.head(name, key)
+        if head is not None and head[1:3] == (said, dates):
+            self.cdb.dequeue(name, key, head[0])
 
     def processAcks(self):
         """Once a webhook request is acknowledged then remove it from the ack queue."""
-        for (said,), creder in self.cdb.ack.getItemIter():
+        for (name, said), creder in self.cdb.ack.getItemIter():
             # TODO: generate EXN ack message with credential information
-            logger.info(f"ACK for credential {said} will be sent to {creder.issuer}")
-            self.cdb.ack.rem(keys=(said,))
+            logger.info(f"ACK for credential {said} delivered to {name} will be sent to {creder.issuer}")
+            self.cdb.unqueue(self.cdb.ack, keys=(name, said))
 
     def escrowDo(self, tymth, tock=1.0):
         """ Process escrows of comms pipeline
@@ -353,80 +671,47 @@ class Communicator(doing.DoDoer):
             except Exception as e:
                 logger.error(e)
 
-            yield self.retry
+            yield self.interval
 
     def processEscrows(self):
         """
         Process communication pipelines for presentations, revocations, and webhook HTTP request acknowledgements.
+        The escrow moves of the presentations and revocations of a pass are committed together in one transaction
+        of the CueBaser before anything is sent, each item in a savepoint so one failing item is retried on its own
+        without undoing the others.
 
         """
-        self.processPresentations()
-        self.processRevocations()
-        self.processReceived(db=self.cdb.recv, action="iss")
-        self.processReceived(db=self.cdb.revk, action="rev")
-        self.processAcks()
+        with self.cdb.batch():
+            self.processPresentations()
+            self.processRevocations()
+
+        self.processReceived()
+        for subscriber in self.subscribers:
+            subscriber.sink.flush()
 
-    def request(self, said, resource, action, actor, data):
+        with self.cdb.batch():
+            self.processAcks()
+
+    def request(self, subscriber, said, resource, action, actor, data, sequence=None):
         """
-        Generate and launch HTTP request to remote webhook URL.
-        Adds custom Sally-Resource and Sally-Timestamp headers.
+        Deliver the event for a credential to the sink of a subscriber.
 
         Parameters:
+            subscriber (Subscriber): subscriber to deliver the event to
             said (str): qb64 SAID of credential
             data (dict): serializable body to send with call
             action (str): the action performed on he resource [iss|rev]
             actor (str): qualified b64 AID of sender of the event
             resource (str): the resource type that triggered the event
+            sequence (int): sequence number of the event for its ordering key, None if it was queued unsequenced
         """
-        purl = parse.urlparse(self.hook)
-        client = http.clienting.Client(hostname=purl.hostname, port=purl.port)
-        clientDoer = http.clienting.ClientDoer(client=client)
-        self.extend([clientDoer])
-
-        body = dict(
-            action=action,
-            actor=actor,
-            data=data
-        )
+        subscriber.sink.send(said, resource, action, actor, data, sequence=sequence)
 
-        raw = json.dumps(body).encode("utf-8")
-        headers = Hict([
-            ("Content-Type", "application/json"),
-            ("Content-Length", len(raw)),
-            ("Connection", "close"),
-            ("Sally-Resource", resource),
-            ("Sally-Timestamp", helping.nowIso8601()),
-        ])
-        path = purl.path or "/"
-
-        keyid = encodeB64(self.hab.kever.serder.verfers[0].raw).decode('utf-8')
-        header, unq = httping.siginput(
-            self.hab, "sig0", "POST", path, headers,
-            fields=[
-                "Sally-Resource",
-                "@method",
-                "@path",
-                "Sally-Timestamp"
-            ],
-            alg="ed25519",
-            keyid=keyid
-        )
-
-        headers.extend(header)
-        signage = ending.Signage(
-            markers=dict(sig0=unq), indexed=True, signer=self.hab.pre, ordinal=None, digest=None, kind=None)
-
-        headers.extend(ending.signature([signage]))
-
-        client.request(
-            method='POST',
-            path=path,
-            qargs=parse.parse_qs(purl.query),
-            headers=headers,
-            body=raw
-        )
-
-        self.clients[said] = (client, clientDoer)
+    def exit(self, deeds=None):
+        """ Close the subscriber sinks after closing the escrow and sink Doers """
+        super(Communicator, self).exit(deeds=deeds)
+        for subscriber in self.subscribers:
+            subscriber.sink.close()
 
     def validateQualifiedvLEIIssuer(self, creder):
         """ Validate issuer of QVI against known valid issuer
@@ -437,7 +722,7 @@ class Communicator(doing.DoDoer):
         Raises:
             ValidationError: If credential was not issued from known valid issuer
         """
-        if creder.schema != QVI_SCHEMA:
+        if self.schemas.lookup(creder.schema, link=True).kind != "qvi":
             raise kering.ValidationError(f"invalid schema {creder.schema} for QVI credential {creder.said}")
 
         if not creder.issuer == self.auth:
@@ -447,14 +732,14 @@ class Communicator(doing.DoDoer):
 
     def validateLegalEntity(self, creder):
         """Validate schema of LE credential and QVI chain"""
-        if creder.schema != LE_SCHEMA:
+        if self.schemas.lookup(creder.schema, link=True).kind != "le":
             raise kering.ValidationError(f"invalid schema {creder.schema} for LE credential {creder.said}")
 
         self.validateQVIChain(creder)
 
     def validateOfficialRoleAuth(self, creder):
         """Validate schema of OOR Auth credential and the LE chain"""
-        if creder.schema != OOR_AUTH_SCHEMA:
+        if self.schemas.lookup(creder.schema, link=True).kind != "oor-auth":
             raise kering.ValidationError(f"invalid schema {creder.schema} for OOR credential {creder.said}")
 
         if creder is None or creder.edge is None:
@@ -469,7 +754,7 @@ class Communicator(doing.DoDoer):
 
     def validateOfficialRole(self, creder):
         """Validate OOR schema, the OOR Auth chain, and that the data attributes from the OOR Auth match the OOR credential data"""
-        if creder.schema != OOR_SCHEMA:
+        if self.schemas.lookup(creder.schema, link=True).kind != "oor":
             raise kering.ValidationError(f"invalid schema {creder.schema} for OOR credential {creder.said}")
 
         if creder is None or creder.edge is None:
@@ -512,12 +797,11 @@ class Communicator(doing.DoDoer):
             logger.debug("QVI credential body:\n%s\n", qcreder.pretty())
             raise ex
 
-    @staticmethod
-    def qviPayload(creder):
+    def qviPayload(self, creder):
         """Creates a QVI credential payload to send to the webhook"""
         a = creder.sad["a"]
         data = dict(
-            type=type_to_name[creder.schema],
+            type=self.schemas.name(creder.schema),
             schema=creder.schema,
             issuer=creder.issuer,
             issueTimestamp=a["dt"],
@@ -528,8 +812,7 @@ class Communicator(doing.DoDoer):
 
         return data
 
-    @staticmethod
-    def entityPayload(creder):
+    def entityPayload(self, creder):
         """Creates a legal entity payload to send to the webhook"""
         a = creder.sad["a"]
         if creder is None or creder.edge is None:
@@ -537,7 +820,7 @@ class Communicator(doing.DoDoer):
         edges = creder.edge
         qsaid = edges["qvi"]["n"]
         data = dict(
-            type=type_to_name[creder.schema],
+            type=self.schemas.name(creder.schema),
             schema=creder.schema,
             issuer=creder.issuer,
             issueTimestamp=a["dt"],
@@ -549,8 +832,7 @@ class Communicator(doing.DoDoer):
 
         return data
 
-    @staticmethod
-    def roleCredentialPayload(reger, creder):
+    def roleCredentialPayload(self, creder):
         """Creates an OOR credential payload to send to the webhook"""
         a = creder.sad["a"]
         if creder is None or creder.edge is None:
@@ -558,19 +840,19 @@ class Communicator(doing.DoDoer):
         edges = creder.edge
         asaid = edges["auth"]["n"]
 
-        auth = reger.creds.get(asaid)
+        auth = self.reger.creds.get(asaid)
         if auth is None or auth.edge is None:
             raise kering.ValidationError(f"OOR credential does not have expected 'le' edge")
         aedges = auth.edge
         lesaid = aedges["le"]["n"]
-        qvi = reger.creds.get(lesaid)
+        qvi = self.reger.creds.get(lesaid)
         if qvi is None or qvi.edge is None:
             raise kering.ValidationError(f"OOR credential does not have expected 'qvi' edge")
         qedges = qvi.edge
         qsaid = qedges["qvi"]["n"]
 
         data = dict(
-            type=type_to_name[creder.schema],
+            type=self.schemas.name(creder.schema),
             schema=creder.schema,
             issuer=creder.issuer,
             issueTimestamp=a["dt"],
@@ -592,7 +874,7 @@ class Communicator(doing.DoDoer):
         state = self.reger.tevers[regk].vcState(creder.said)
 
         data = dict(
-            type=type_to_name[creder.schema],
+            type=self.schemas.name(creder.schema),
             schema=creder.schema,
             credential=creder.said,
             revocationTimestamp=state.dt
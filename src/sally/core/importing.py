@@ -0,0 +1,199 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.importing module
+
+Offline bulk import of archived CESR streams of KELs, TELs and grants
+"""
+import mmap
+import os
+import re
+import time
+
+from keri import help
+from keri.app import notifying
+from keri.core import eventing, parsing, routing
+from keri.peer import exchanging
+from keri.vc import protocoling
+from keri.vdr import verifying
+from keri.vdr.eventing import Tevery
+
+logger = help.ogler.getLogger()
+
+# Version string of a KERI or ACDC message, its size field is the size of the message body without attachments
+Version = re.compile(rb'(?:KERI|ACDC)[0-9a-f]{2}(?:JSON|CBOR|MGPK)(?P<size>[0-9a-f]{6})_')
+VersionSpan = 32  # bytes from the start of a message its version string is within
+# Attachments in the text domain, the first byte that is not Base64 starts the next message
+Attachments = re.compile(rb'[A-Za-z0-9_-]*')
+
+
+def frame(ims, start=0, eof=False):
+    """ Returns the end of the message starting at start of ims including its attachments
+
+    The keri parser discards the whole stream when it is given a message cut off before its end, so streams that
+    arrive in pieces are only fed to it one whole message at a time. The size of the body is read from its version
+    string and the text domain attachments run up to the start of the next message, so the end of the attachments
+    of the last message is only known once more bytes arrive or at the end of the stream.
+
+    Parameters:
+        ims (bytearray | mmap): stream of messages
+        start (int): offset of the start of the message in ims
+        eof (bool): True if no more bytes will be appended to ims
+
+    Returns:
+        int: offset of the end of the message, None if ims does not hold the whole message yet
+
+    Raises:
+        ValueError: if there is no message at start
+    """
+    match = Version.search(ims, start, start + VersionSpan)
+    if Attachments.match(ims, start, start + 1).end() > start:
+        raise ValueError(f"attachments without a message at offset {start}")
+    if match is None:
+        if not eof and len(ims) - start < VersionSpan:
+            return None
+        raise ValueError(f"no message version string at offset {start}")
+
+    end = start + int(match.group("size"), 16)
+    if end > len(ims):
+        return None
+
+    end = Attachments.match(ims, end).end()
+    if end == len(ims) and not eof:
+        return None
+    return end
+
+
+class Importer:
+    """
+    Streams archived CESR files through a parser configured like the one of serving.setup, at disk speed instead of
+    one HTTP PUT at a time. Files are memory mapped and parsed through windows of whole messages of about chunk
+    bytes, escrows are only processed once all files are parsed instead of after every message. Grants are written
+    as notices, the same as grants received over HTTP, so Sally verifies them the next time it runs.
+    """
+
+    ChunkSize = 1024 * 1024  # bytes, a window grows to hold a larger message with its attachments
+
+    def __init__(self, hby, reger, chunk=None, interval=5.0, report=None, noter=None):
+        """
+        Parameters:
+            hby (Habery): identifier database environment to import KELs into
+            reger (Reger): credential registry to import TELs and credentials into
+            chunk (int): bytes parsed per window, defaults to ChunkSize
+            interval (float): seconds between progress reports
+            report (Callable): called with the progress dict, defaults to logging it
+            noter (Noter): notification database to queue the grants in, defaults to the one of the keystore
+        """
+        self.hby = hby
+        self.reger = reger
+        self.chunk = chunk if chunk is not None else self.ChunkSize
+        self.interval = interval
+        self.report = report if report is not None else self.log
+
+        self.notifier = notifying.Notifier(hby=hby, noter=noter)
+        self.exc = exchanging.Exchanger(hby=hby, handlers=[])
+        protocoling.loadHandlers(hby=hby, exc=self.exc, notifier=self.notifier)
+
+        self.verifier = verifying.Verifier(hby=hby, reger=reger)
+        self.rvy = routing.Revery(db=hby.db)
+        self.kvy = eventing.Kevery(db=hby.db, lax=True, local=False, rvy=self.rvy)
+        self.kvy.registerReplyRoutes(router=self.rvy.rtr)
+        self.tvy = Tevery(reger=reger, db=hby.db, local=False)
+        self.tvy.registerReplyRoutes(router=self.rvy.rtr)
+        self.parser = parsing.Parser(framed=True, kvy=self.kvy, tvy=self.tvy, rvy=self.rvy, vry=self.verifier,
+                                     exc=self.exc)
+
+        self.progress = dict(files=0, bytes=0, messages=0, truncated=0, grants=0, seconds=0.0)
+        self.start = self.reported = time.perf_counter()
+
+    @staticmethod
+    def paths(target):
+        """ Returns the files to import, target itself if it is a file else the files below it in name order """
+        if os.path.isfile(target):
+            return [target]
+        if not os.path.isdir(target):
+            raise ValueError(f"no such file or directory {target}")
+
+        paths = []
+        for root, dirs, files in os.walk(target):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files) if not name.startswith("."))
+        return paths
+
+    def importAll(self, target):
+        """ Import every file of target then process the escrows and returns the progress dict of this import """
+        self.progress = dict(files=0, bytes=0, messages=0, truncated=0, grants=0, seconds=0.0)
+        self.start = self.reported = time.perf_counter()
+        notices = self.notices()
+        for path in self.paths(target):
+            self.importFile(path)
+
+        self.processEscrows()
+        self.progress["grants"] = self.notices() - notices
+        self.progress["seconds"] = time.perf_counter() - self.start
+        self.report(self.progress)
+        return self.progress
+
+    def importFile(self, path):
+        """ Parse the CESR stream of the file at path through windows of whole messages of the memory mapped file
+
+        Each window holds the whole messages that start within chunk bytes of its start, at least one, so the parser
+        never sees a message cut off by the end of the window. A message cut off by the end of the file is counted
+        as truncated and dropped.
+        """
+        self.progress["files"] += 1
+        if os.path.getsize(path) == 0:
+            return
+
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while pos < len(mm):
+                end, messages, error = pos, 0, None
+                while end < len(mm) and (messages == 0 or end - pos < self.chunk):
+                    try:
+                        stop = frame(mm, end, eof=True)
+                    except ValueError as ex:
+                        error = str(ex)
+                        break
+                    if stop is None:
+                        error = f"message at offset {end} cut off"
+                        break
+                    end, messages = stop, messages + 1
+
+                if messages:
+                    self.parser.parse(ims=bytearray(mm[pos:end]))
+                    self.progress["bytes"] += end - pos
+                    self.progress["messages"] += messages
+                    pos = end
+
+                if error is not None:
+                    logger.error(f"dropping {len(mm) - pos} bytes at the end of {path}: {error}")
+                    self.progress["bytes"] += len(mm) - pos
+                    self.progress["truncated"] += 1
+                    break
+
+                self.tick()
+
+    def processEscrows(self):
+        """ Resolve the events that arrived out of order in the archive once all of it is parsed """
+        self.kvy.processEscrows()
+        self.rvy.processEscrowReply()
+        self.tvy.processEscrows()
+        self.verifier.processEscrows()
+        self.exc.processEscrow()
+
+    def notices(self):
+        return sum(1 for _ in self.notifier.noter.notes.getItemIter())
+
+    def tick(self):
+        now = time.perf_counter()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self.progress["seconds"] = now - self.start
+            self.report(self.progress)
+
+    @staticmethod
+    def log(progress):
+        rate = progress["bytes"] / progress["seconds"] if progress["seconds"] else 0.0
+        logger.info(f"Imported {progress['messages']} messages, {progress['bytes']} bytes of {progress['files']} "
+                    f"files in {progress['seconds']:.1f}s ({rate / 1024 / 1024:.1f} MiB/s)")
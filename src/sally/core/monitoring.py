@@ -3,24 +3,123 @@ import sally
 from keri.help import nowIso8601
 
 
+class Metrics:
+    """
+    In memory registry of counters and gauges for operational monitoring.
+    Each metric is identified by name and an optional set of labels.
+    """
+
+    def __init__(self):
+        self.counters = dict()
+        self.gauges = dict()
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """ Increment the counter name with labels by value """
+        key = self.key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """ Set the gauge name with labels to value """
+        self.gauges[self.key(name, labels)] = value
+
+    def get(self, name, **labels):
+        """ Returns the current value of the counter or gauge name with labels, None if never recorded """
+        key = self.key(name, labels)
+        if key in self.counters:
+            return self.counters[key]
+        return self.gauges.get(key)
+
+    def labeled(self, **labels):
+        """ Returns a view of this registry that adds labels to every metric recorded through it """
+        return Labeled(metrics=self, labels=labels)
+
+    def snapshot(self):
+        """ Returns a serializable dict of metric name to list of labeled values """
+        snap = dict()
+        for (name, labels), value in list(self.counters.items()) + list(self.gauges.items()):
+            snap.setdefault(name, []).append(dict(labels=dict(labels), value=value))
+        return snap
+
+    def render(self):
+        """ Returns the metrics in the Prometheus text exposition format """
+        lines = []
+        for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+            typed = set()
+            for (name, labels), value in sorted(metrics.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                if labels:
+                    label = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"{name}{{{label}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class Labeled:
+    """
+    View of a Metrics registry that records every metric with a fixed set of labels, such as the tenant of a
+    Sally hosting several identifiers, so all of them are exposed by the same registry.
+    """
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def inc(self, name, value=1, **labels):
+        self.metrics.inc(name, value, **self.labels, **labels)
+
+    def set(self, name, value, **labels):
+        self.metrics.set(name, value, **self.labels, **labels)
+
+    def get(self, name, **labels):
+        return self.metrics.get(name, **self.labels, **labels)
+
+
 class HealthEnd:
     """
     Basic health check endpoint including a health message, Sally version, and operational metrics
     """
 
-    def __init__(self, cdb = None):
+    def __init__(self, cdb = None, metrics = None, subscribers = None):
         """
         Adds the CueBaser to allow getting metric counts.
         Defaults to none in case used via demo webhook
         """
         self.cdb = cdb
+        self.metrics = metrics
+        self.subscribers = subscribers if subscribers is not None else []
 
 
     def on_get(self, req, resp):
         counts = self.cdb.getCounts() if self.cdb else {}
+        subscribers = {subscriber.name: dict(counts=self.cdb.getSubscriberCounts(subscriber.name),
+                                             breaker=subscriber.health())
+                       for subscriber in self.subscribers} if self.cdb else {}
         resp.status = falcon.HTTP_OK
         resp.media = {
             "message": f"Health is okay. Time is {nowIso8601()}",
             "version": f"{sally.__version__}",
-            "counts": counts
-        }
\ No newline at end of file
+            "counts": counts,
+            "subscribers": subscribers,
+            "metrics": self.metrics.snapshot() if self.metrics else {}
+        }
+
+
+class MetricsEnd:
+    """
+    Operational metrics endpoint in the Prometheus text exposition format
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    def on_get(self, req, resp):
+        resp.status = falcon.HTTP_OK
+        resp.content_type = "text/plain; version=0.0.4"
+        resp.text = self.metrics.render()
@@ -0,0 +1,146 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.preloading module
+
+Startup preload of configured OOBIs and the readiness gate of Sally
+"""
+import time
+from urllib import parse
+
+import falcon
+from hio.base import doing
+from keri import help
+from keri.app.oobiing import Result
+from keri.db import basing as kbasing
+from keri.end.ending import OOBI_RE, DOOBI_RE
+from keri.help import helping
+
+logger = help.ogler.getLogger()
+
+
+class Preloader(doing.Doer):
+    """
+    Preload of the OOBIs queued from the iurls and durls of the keystore configuration at startup.
+
+    The configuration queues its OOBIs again on every boot. OOBIs of schemas and AIDs that are already in the
+    keystore are marked resolved on construction so the Oobiery does not fetch them again, the rest are requested by
+    the Oobiery together on its first pass. Each pass records the OOBIs resolved since and once none are left
+    reports how long the preload took.
+    """
+
+    def __init__(self, hby, metrics=None, tock=0.25, **kwa):
+        """
+        Parameters:
+            hby (Habery): identifier database environment with the queued OOBIs
+            metrics (Metrics): metrics registry to report the preload in
+            tock (float): seconds between checks of the OOBIs being resolved
+        """
+        self.hby = hby
+        self.metrics = metrics
+        self.start = time.perf_counter()
+        self.pending = set()  # OOBI URLs not resolved yet
+        self.results = dict(cached=0, resolved=0, failed=0)
+        self.preload()
+        super(Preloader, self).__init__(tock=tock, **kwa)
+
+    def preload(self):
+        """ Mark the queued OOBIs already in the keystore resolved and record the others as pending """
+        for (url,), obr in self.hby.db.oobis.getItemIter():
+            if self.cached(url):
+                self.hby.db.oobis.rem(keys=(url,))
+                self.hby.db.roobi.pin(keys=(url,), val=kbasing.OobiRecord(date=helping.nowIso8601(),
+                                                                         state=Result.resolved))
+                self.results["cached"] += 1
+                logger.info(f"OOBI {url} already in the keystore, skipping")
+            else:
+                self.pending.add(url)
+
+        logger.info(f"Preloading {len(self.pending)} OOBIs, {self.results['cached']} already in the keystore")
+
+    def cached(self, url):
+        """ Returns True if the schema or the KEL the OOBI url resolves to is already in the keystore """
+        path = parse.urlparse(url).path
+        if (match := DOOBI_RE.match(path)) is not None:
+            return self.hby.db.schema.get(keys=(match.group("said"),)) is not None
+        if (match := OOBI_RE.match(path)) is not None:
+            return match.group("cid") in self.hby.kevers
+        return False
+
+    def recur(self, tyme):
+        """ Record the OOBIs resolved since the last pass, done once none are pending """
+        now = time.perf_counter()
+        for url in list(self.pending):
+            obr = self.hby.db.roobi.get(keys=(url,))
+            if obr is None:
+                continue
+
+            self.pending.remove(url)
+            result = "resolved" if obr.state == Result.resolved else "failed"
+            self.results[result] += 1
+            logger.info(f"OOBI {url} {result} after {now - self.start:.2f}s")
+
+        if self.pending:
+            return False
+
+        seconds = now - self.start
+        logger.info(f"Preloaded OOBIs in {seconds:.2f}s: {self.results}")
+        if self.metrics is not None:
+            self.metrics.set("sally_oobi_preload_seconds", seconds)
+            for result, count in self.results.items():
+                self.metrics.set("sally_oobi_preload", count, result=result)
+        return True
+
+
+class Readiness:
+    """
+    Readiness gate of Sally, ready once the schemas of the supported credentials and the KELs of the authorities are
+    in the keystore so presentations can be verified.
+    """
+
+    def __init__(self, hby, schemas, auths, metrics=None):
+        """
+        Parameters:
+            hby (Habery): identifier database environment
+            schemas (list): SAIDs of the schemas required to verify the supported credentials
+            auths (list): aliases or AIDs of the authorities whose KELs are required
+            metrics (Metrics): metrics registry to report readiness in
+        """
+        self.hby = hby
+        self.schemas = list(schemas)
+        self.auths = list(auths)
+        self.metrics = metrics
+
+    def missing(self):
+        """ Returns a dict of the required schemas and KELs not yet in the keystore """
+        missing = dict()
+        schemas = [said for said in self.schemas if self.hby.db.schema.get(keys=(said,)) is None]
+        if schemas:
+            missing["schemas"] = schemas
+
+        auths = []
+        for auth in self.auths:
+            hab = self.hby.habByName(name=auth)
+            pre = hab.pre if hab is not None else auth
+            if pre not in self.hby.kevers:
+                auths.append(pre)
+        if auths:
+            missing["auths"] = auths
+
+        if self.metrics is not None:
+            self.metrics.set("sally_ready", 0 if missing else 1)
+        return missing
+
+
+class ReadyEnd:
+    """
+    Readiness endpoint, 200 once Sally can verify presentations and 503 with what is missing until then
+    """
+
+    def __init__(self, readiness):
+        self.readiness = readiness
+
+    def on_get(self, req, resp):
+        missing = self.readiness.missing()
+        resp.status = falcon.HTTP_503 if missing else falcon.HTTP_OK
+        resp.media = dict(ready=not missing, missing=missing)
@@ -0,0 +1,136 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.profiling module
+
+Runtime memory profiling of a running Sally with tracemalloc
+"""
+import tracemalloc
+
+import falcon
+from keri import help
+
+logger = help.ogler.getLogger()
+
+
+class MemoryProfiler:
+    """
+    Starts and stops tracemalloc on demand and reports the top allocation sites, the change since the previous
+    report and the sizes of the in-process structures that grow with load.
+    """
+
+    MaxTop = 1000
+    MaxFrames = 65535  # most frames tracemalloc records per allocation
+
+    def __init__(self, sizes=None):
+        """
+        Parameters:
+            sizes (dict): name to callable returning the current size of a known in-process structure
+        """
+        self.sizes = sizes if sizes is not None else dict()
+        self.baseline = None  # snapshot of the previous report
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=1):
+        """ Start tracing allocations, recording up to frames frames of the traceback of each """
+        if not self.tracing:
+            logger.info(f"Starting tracemalloc with {frames} frames")
+            tracemalloc.start(frames)
+        self.baseline = None
+
+    def stop(self):
+        """ Stop tracing allocations and release the traces """
+        if self.tracing:
+            logger.info("Stopping tracemalloc")
+            tracemalloc.stop()
+        self.baseline = None
+
+    def measure(self):
+        """ Returns the current size of each known structure, None for those that cannot be measured """
+        sizes = dict()
+        for name, size in self.sizes.items():
+            try:
+                sizes[name] = size()
+            except Exception as ex:
+                logger.debug(f"Measuring {name} failed: {ex}")
+                sizes[name] = None
+        return sizes
+
+    def report(self, top=20, diff=False, key="lineno"):
+        """ Returns the memory report, the snapshot taken becomes the baseline of the next diff
+
+        Parameters:
+            top (int): number of allocation sites reported
+            diff (bool): also report the allocation sites that changed most since the previous report
+            key (str): group allocations by lineno or filename
+        """
+        report = dict(tracing=self.tracing, sizes=self.measure())
+        if not self.tracing:
+            return report
+
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+        report.update(current=current, peak=peak, top=[self.stat(s) for s in snapshot.statistics(key)[:top]])
+        if diff:
+            report["diff"] = ([self.stat(s) for s in snapshot.compare_to(self.baseline, key)[:top]]
+                              if self.baseline is not None else None)
+
+        self.baseline = snapshot
+        return report
+
+    @staticmethod
+    def stat(statistic):
+        """ Returns the serializable allocation site of a Statistic or StatisticDiff """
+        frame = statistic.traceback[0]
+        stat = dict(site=f"{frame.filename}:{frame.lineno}", size=statistic.size, count=statistic.count)
+        if isinstance(statistic, tracemalloc.StatisticDiff):
+            stat.update(sizeDiff=statistic.size_diff, countDiff=statistic.count_diff)
+        return stat
+
+
+class MemoryEnd:
+    """
+    Admin endpoint to profile the memory of a running Sally without restarting it.
+
+    POST {"action": "start", "frames": 10} or {"action": "stop"} to start or stop tracing allocations.
+    GET ?top=20&diff=true&key=lineno to report the top allocation sites and their change since the previous GET.
+    """
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def on_get(self, req, rep):
+        top = req.get_param_as_int("top", min_value=1, max_value=MemoryProfiler.MaxTop, default=20)
+        diff = req.get_param_as_bool("diff", default=False)
+        key = req.get_param("key", default="lineno")
+        if key not in ("lineno", "filename"):
+            raise falcon.HTTPBadRequest(description=f"invalid key {key}, expected lineno or filename")
+
+        rep.status = falcon.HTTP_200
+        rep.media = self.profiler.report(top=top, diff=diff, key=key)
+
+    def on_post(self, req, rep):
+        body = req.get_media(default_when_empty=None)
+        if not isinstance(body, dict):
+            raise falcon.HTTPBadRequest(description="expected a JSON object with an action")
+
+        action = body.get("action")
+        if action == "start":
+            frames = body.get("frames", 1)
+            if not isinstance(frames, int) or isinstance(frames, bool) or not 1 <= frames <= MemoryProfiler.MaxFrames:
+                raise falcon.HTTPBadRequest(description=f"invalid frames {frames}")
+            self.profiler.start(frames=frames)
+        elif action == "stop":
+            self.profiler.stop()
+        else:
+            raise falcon.HTTPBadRequest(description=f"invalid action {action}, expected start or stop")
+
+        rep.status = falcon.HTTP_200
+        rep.media = dict(tracing=self.profiler.tracing)
@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.querying module
+
+Query endpoints over the presentation history
+"""
+import datetime
+from base64 import urlsafe_b64decode as decodeB64
+from base64 import urlsafe_b64encode as encodeB64
+
+import falcon
+from keri import help
+from keri.help import helping
+
+from sally.core import basing
+
+logger = help.ogler.getLogger()
+
+
+class PresentationsEnd:
+    """
+    Paginated query endpoint over the history of delivered presentations. A query reads the indexes of the lei,
+    holder, issuer and schema it filters on, intersecting them when it filters on several, or the date order of the
+    history when it filters on none of them. Only matching presentations are read, however selective each filter is.
+    """
+
+    MaxLimit = 1000
+
+    def __init__(self, cdb, limit=100):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment with the presentation history
+            limit (int): default number of presentations per page
+        """
+        self.cdb = cdb
+        self.limit = limit
+
+    def on_get(self, req, rep):
+        """ Returns a page of presentations in received order and the cursor of the next page
+
+        Query Parameters:
+            lei, holder, issuer, schema (str): only presentations with these values
+            since, until (str): only presentations received in this ISO8601 datetime range, inclusive
+            limit (int): maximum number of presentations on the page
+            cursor (str): next cursor of the previous page
+        """
+        filters = {field: req.get_param(field) for field in basing.IndexedFields if req.get_param(field)}
+        since = self.datetime(req, "since")
+        until = self.datetime(req, "until")
+        limit = req.get_param_as_int("limit", min_value=1, max_value=self.MaxLimit, default=self.limit)
+
+        after = None
+        if (cursor := req.get_param("cursor")) is not None:
+            try:
+                after = decodeB64(cursor.encode("utf-8")).decode("utf-8")
+            except ValueError:
+                raise falcon.HTTPBadRequest(description=f"invalid cursor {cursor}")
+
+        presentations = []
+        last = None
+        for key, record in self.cdb.getPresentationMatchIter(filters=filters, since=since, until=until, after=after):
+            last = key
+            presentations.append(record)
+            if len(presentations) >= limit:
+                break
+
+        more = len(presentations) >= limit and last is not None
+        rep.status = falcon.HTTP_200
+        rep.media = dict(presentations=presentations,
+                         next=encodeB64(last.encode("utf-8")).decode("utf-8") if more else None)
+
+    @staticmethod
+    def datetime(req, name):
+        """ Returns the ISO8601 datetime query parameter name normalized to UTC like the history keys """
+        if (dt := req.get_param(name)) is None:
+            return None
+        try:
+            parsed = helping.fromIso8601(dt)
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+            return helping.toIso8601(parsed.astimezone(datetime.timezone.utc))
+        except ValueError:
+            raise falcon.HTTPBadRequest(description=f"invalid {name} {dt}")
@@ -0,0 +1,155 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.retaining module
+
+Retention of the CueBaser sub databases that grow with every presentation and revocation
+"""
+import datetime
+import json
+from itertools import islice
+
+from hio.base import doing
+from keri import help
+from keri.help import helping
+from sally.core import basing
+
+logger = help.ogler.getLogger()
+
+DAY = 24 * 60 * 60
+
+# Default retention policy per sub database. age is the seconds an entry is kept, count the number of entries kept.
+# Senders (snd) are kept while their credential is in the iss or rev escrow, they are never read afterwards.
+DEFAULT_RETENTION = dict(
+    evts=dict(age=30 * DAY, count=None),
+    quar=dict(age=30 * DAY),
+    snd=dict(),
+)
+
+
+class Retainer(doing.Doer):
+    """
+    Enforces a retention policy on the CueBaser in small batches so a large backlog of expired entries never holds
+    up the other Doers. Each pass examines at most batch entries of each sub database in one transaction and
+    resumes where the previous pass stopped. Also reports the size of the database, the bytes compaction would
+    reclaim and the bytes the last compaction reclaimed.
+    """
+
+    CursorQuarantine = "retention.quar"
+    CursorSenders = "retention.snd"
+
+    def __init__(self, cdb, policy=None, batch=100, interval=60.0, metrics=None, **kwa):
+        """
+        Parameters:
+            cdb (CueBaser): communication escrow database environment
+            policy (dict): sub database name [evts|quar|snd] to retention, defaults to DEFAULT_RETENTION
+            batch (int): entries examined per sub database and pass
+            interval (float): seconds between passes
+            metrics (Metrics): metrics registry to report removed entries and database usage in
+        """
+        self.cdb = cdb
+        self.policy = policy if policy is not None else DEFAULT_RETENTION
+        for name in self.policy:
+            if name not in ("evts", "quar", "snd"):
+                raise ValueError(f"no retention for sub database {name}")
+
+        self.batch = batch
+        self.metrics = metrics
+        super(Retainer, self).__init__(tock=interval, **kwa)
+
+    def recur(self, tyme):
+        self.prune()
+        return False
+
+    def prune(self, now=None):
+        """ Remove the expired entries of one batch of each sub database with a retention policy
+
+        Parameters:
+            now (datetime): current time, defaults to the current UTC time
+
+        Returns:
+            dict: sub database name to number of entries removed
+        """
+        now = now if now is not None else helping.nowUTC()
+        removed = dict()
+        with self.cdb.batch():
+            if "evts" in self.policy:
+                removed["evts"] = self.pruneEvents(now, **self.policy["evts"])
+            if "quar" in self.policy:
+                removed["quar"] = self.pruneQuarantine(now, **self.policy["quar"])
+            if "snd" in self.policy:
+                removed["snd"] = self.pruneSenders()
+
+        for name, count in removed.items():
+            if count:
+                logger.info(f"Retention removed {count} entries from {name}")
+            if self.metrics is not None:
+                self.metrics.inc("sally_retention_removed_total", count, db=name)
+
+        self.record()
+        return removed
+
+    def pruneEvents(self, now, age=None, count=None):
+        """ Remove the oldest events of the event log that are older than age seconds or beyond the last count """
+        removed = 0
+        for sn, raw in list(islice(self.cdb.getEventIter(), self.batch)):
+            beyond = count is not None and self.cdb.lastEvent - sn >= count
+            if not beyond and not self.expired(json.loads(raw).get("timestamp"), now, age):
+                break  # the log is in time order so every later event is kept as well
+
+            self.cdb.evts.rem(keys=(f"{sn:032x}",))
+            removed += 1
+
+        return removed
+
+    def pruneQuarantine(self, now, age=None):
+        """ Remove quarantined notices older than age seconds """
+        removed = 0
+        for (rid,), raw in self.resume(self.cdb.quar, self.CursorQuarantine):
+            if self.expired(json.loads(raw).get("dt"), now, age):
+                self.cdb.quar.rem(keys=(rid,))
+                removed += 1
+
+        return removed
+
+    def pruneSenders(self):
+        """ Remove the senders of credentials that are no longer in the iss or rev escrow """
+        removed = 0
+        for (said,), _ in self.resume(self.cdb.snd, self.CursorSenders):
+            if self.cdb.iss.get(keys=(said,)) is None and self.cdb.rev.get(keys=(said,)) is None:
+                self.cdb.snd.rem(keys=(said,))
+                removed += 1
+
+        return removed
+
+    def resume(self, sub, name):
+        """ Returns the next batch of (keys, raw) of sub after the cursor name and moves the cursor past them
+
+        The cursor is cleared once the end of the sub database is reached so the next pass starts over.
+        """
+        after = self.cdb.crsr.get(keys=(name,))
+        items = list(islice(basing.getItemIterAfter(sub, after=after), self.batch))
+
+        if len(items) >= self.batch:
+            self.cdb.crsr.pin(keys=(name,), val=sub.sep.join(items[-1][0]))
+        else:
+            self.cdb.crsr.rem(keys=(name,))
+
+        return items
+
+    @staticmethod
+    def expired(dt, now, age):
+        """ Returns True if the ISO8601 time dt is more than age seconds before now """
+        if age is None or dt is None:
+            return False
+        return now - helping.fromIso8601(dt) > datetime.timedelta(seconds=age)
+
+    def record(self):
+        if self.metrics is None:
+            return
+
+        usage = self.cdb.usage()
+        self.metrics.set("sally_db_bytes", usage["size"])
+        self.metrics.set("sally_db_free_bytes", usage["free"])
+        if (compaction := self.cdb.meta.get(keys=("compaction",))) is not None:
+            self.metrics.set("sally_db_reclaimed_bytes", json.loads(compaction)["reclaimed"])
@@ -0,0 +1,207 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.scheduling module
+
+Priority scheduling of event deliveries across the revocation and issuance lanes of a subscriber
+"""
+import time
+
+from keri import help
+
+logger = help.ogler.getLogger()
+
+# Default lane configuration. Revocations are the time critical events so they get the larger weight and a
+# latency target. While the revocation lane is backlogged longer than its target issuances are paused. A target
+# has to be longer than the interval between delivery passes of the Communicator, an event waits up to one interval.
+DEFAULT_LANES = dict(
+    rev=dict(weight=4, concurrency=None, target=5.0),
+    iss=dict(weight=1, concurrency=None, target=None),
+)
+
+
+class Lane:
+    """
+    Delivery lane of one action [iss|rev] of a subscriber with its weight, concurrency budget and latency target.
+    Tracks the deliveries of the lane in flight and since when the lane has had events waiting to be sent.
+    """
+
+    def __init__(self, action, weight=1, concurrency=None, target=None):
+        """
+        Parameters:
+            action (str): the action of the events delivered in this lane [iss|rev]
+            weight (int): deliveries started from this lane per round of the weighted round robin
+            concurrency (int): maximum deliveries of this lane in flight, None for no limit besides the subscriber's
+            target (float): latency target (in seconds) for events of this lane, None for no target
+        """
+        if weight < 1:
+            raise ValueError(f"invalid weight {weight} for {action} lane")
+
+        self.action = action
+        self.weight = weight
+        self.concurrency = concurrency
+        self.target = target
+        self.inflight = dict()  # SAID to dater qb64 of the deliveries in flight
+        self.backlog = None  # monotonic time since the lane has had events waiting, None if drained
+        self.served = None  # monotonic time a delivery was last started from this lane
+
+    @property
+    def full(self):
+        return self.concurrency is not None and len(self.inflight) >= self.concurrency
+
+    def waiting(self, now):
+        """ Record that the lane has events it could not send this pass """
+        if self.backlog is None:
+            self.backlog = now
+
+    def drained(self):
+        """ Record that all waiting events of the lane were sent """
+        self.backlog = None
+
+    def behind(self, now):
+        """ Returns True if the lane has been backlogged longer than its latency target """
+        return self.target is not None and self.backlog is not None and now - self.backlog >= self.target
+
+    def starved(self, now, starvation):
+        """ Returns True if the lane has waiting events and no delivery was started for starvation seconds """
+        if self.backlog is None:
+            return False
+        return now - (self.served if self.served is not None else self.backlog) >= starvation
+
+
+class Scheduler:
+    """
+    Weighted round robin scheduler over the delivery lanes of a subscriber.
+
+    Each round a lane may start up to weight deliveries within its own concurrency budget. While a lane with a
+    latency target is behind, lanes without a target are paused so they do not take delivery slots from it.
+    A lane that has had waiting events without a delivery for starvation seconds is served first regardless.
+    """
+
+    def __init__(self, name, lanes=None, starvation=60.0, metrics=None):
+        """
+        Parameters:
+            name (str): name of the subscriber the lanes deliver to
+            lanes (dict): action to lane configuration, defaults to DEFAULT_LANES
+            starvation (float): seconds a backlogged lane may go without a delivery before it is served first
+            metrics (Metrics): metrics registry to record lane latencies in
+        """
+        self.name = name
+        self.starvation = starvation
+        self.metrics = metrics
+        self.lanes = dict()
+        for action, config in (lanes if lanes is not None else DEFAULT_LANES).items():
+            self.lanes[action] = Lane(action=action, **config)
+
+    def lane(self, action):
+        return self.lanes[action]
+
+    def order(self, now=None):
+        """ Returns the lanes to serve this pass, starved lanes first then by weight
+
+        Parameters:
+            now (float): current monotonic time in seconds
+        """
+        now = now if now is not None else time.monotonic()
+        lanes = sorted(self.lanes.values(), key=lambda lane: lane.weight, reverse=True)
+        starved = [lane for lane in lanes if lane.starved(now, self.starvation)]
+        for lane in starved:
+            logger.warning(f"{lane.action} lane of subscriber {self.name} starved for {self.starvation} seconds")
+            if self.metrics is not None:
+                self.metrics.inc("sally_lane_starved_total", subscriber=self.name, lane=lane.action)
+
+        paused = self.paused(now)
+        ordered = list(starved)
+        for lane in lanes:
+            if lane in starved or lane in paused:
+                continue
+            ordered.append(lane)
+
+        return ordered
+
+    def paused(self, now):
+        """ Returns the lanes without a latency target while a lane with a target is behind it """
+        if not any(lane.behind(now) for lane in self.lanes.values()):
+            return []
+        return [lane for lane in self.lanes.values() if lane.target is None]
+
+    def rounds(self, queues, ready, now=None):
+        """ Generates (lane, item) in weighted round robin order over the ordered lanes
+
+        Stops a lane once its queue is exhausted or its concurrency budget is used up, and stops entirely once
+        ready() returns False. A starved lane that is otherwise paused is only served for a single round.
+        Lanes with items left over are recorded as backlogged, exhausted lanes as drained.
+
+        Parameters:
+            queues (dict): action to iterator of the waiting items of the lane
+            ready (Callable): returns True while the subscriber allows another delivery to be started
+            now (float): current monotonic time in seconds
+        """
+        now = now if now is not None else time.monotonic()
+        paused = self.paused(now)
+        active = self.order(now)
+        for lane in self.lanes.values():
+            if lane not in active:
+                self.peek(lane, queues, now)  # paused this pass
+
+        while active:
+            for lane in list(active):
+                for _ in range(lane.weight):
+                    if not ready():
+                        for remaining in active:
+                            self.peek(remaining, queues, now)
+                        return
+
+                    if lane.full:
+                        self.peek(lane, queues, now)
+                        active.remove(lane)
+                        break
+
+                    item = next(queues[lane.action], None)
+                    if item is None:
+                        lane.drained()
+                        active.remove(lane)
+                        break
+
+                    lane.served = now
+                    yield lane, item
+
+                if lane in active and lane in paused:
+                    self.peek(lane, queues, now)
+                    active.remove(lane)
+
+    @staticmethod
+    def peek(lane, queues, now):
+        """ Record whether a lane that is not served any further this pass has events waiting """
+        if next(queues[lane.action], None) is not None:
+            lane.waiting(now)
+        else:
+            lane.drained()
+
+    def sent(self, action, said, dates):
+        """ Record a delivery of the lane in flight """
+        lane = self.lanes[action]
+        lane.inflight[said] = dates
+        self.record(lane)
+
+    def done(self, action, said, latency=None):
+        """ Record the completion of a delivery in flight and the latency of a successful delivery
+
+        Parameters:
+            action (str): action of the lane of the delivery
+            said (str): qb64 SAID of the credential delivered
+            latency (float): seconds from the event entering the escrow to its delivery, None if it failed
+        """
+        lane = self.lanes[action]
+        lane.inflight.pop(said, None)
+        self.record(lane)
+        if latency is None or self.metrics is None:
+            return
+
+        self.metrics.set("sally_lane_latency_seconds", latency, subscriber=self.name, lane=action)
+        if lane.target is not None and latency > lane.target:
+            self.metrics.inc("sally_lane_target_missed_total", subscriber=self.name, lane=action)
+
+    def record(self, lane):
+        if self.metrics is not None:
+            self.metrics.set("sally_lane_inflight", len(lane.inflight), subscriber=self.name, lane=lane.action)
@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.scheming module
+
+Registry of supported credential schemas
+"""
+import json
+from collections import namedtuple
+
+from keri import help, kering
+
+logger = help.ogler.getLogger()
+
+# vLEI ACDC schema SAIDs
+QVI_SCHEMA = "EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao"
+LE_SCHEMA = "ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY"
+OOR_AUTH_SCHEMA = "EKA57bKBKxr_kN7iN5i7lMUxpMG-s19dRcmov1iDxz-E"
+OOR_SCHEMA = "EBNaNu-M9P5cgrnfl2Fvymy4E_jvxxyjb70PRtiANlJy"
+
+# Default schema configuration. Each schema SAID maps to a display name and the kind of credential
+# chain it belongs to. The kind selects the validator and payload builder used for the credential.
+# Schemas with "present" set to false are only accepted as links in a chain, never as presentations.
+DEFAULT_SCHEMAS = {
+    QVI_SCHEMA: dict(name="QVI", kind="qvi"),
+    LE_SCHEMA: dict(name="LE", kind="le"),
+    OOR_AUTH_SCHEMA: dict(name="OOR Auth", kind="oor-auth", present=False),
+    OOR_SCHEMA: dict(name="OOR", kind="oor"),
+}
+
+# Edges each kind of credential must have to chain to the credential it is issued under
+EDGES = {
+    "qvi": (),
+    "le": ("qvi",),
+    "oor-auth": ("le",),
+    "oor": ("auth",),
+}
+
+Schemage = namedtuple("Schemage", "said name kind validator payload")
+
+
+def loadSchemas(path):
+    """ Load the schema configuration from the JSON file at path
+
+    The file is expected to have the following format:
+    {
+        "schemas": {
+            "EBfdlu8R27Fbx-ehrqwImnK-8Cm79sqbAQ4MmvEAYqao": {"name": "QVI", "kind": "qvi"},
+            "EKA57bKBKxr_kN7iN5i7lMUxpMG-s19dRcmov1iDxz-E": {"name": "OOR Auth", "kind": "oor-auth", "present": false}
+        }
+    }
+
+    Parameters:
+        path (str): path to schema configuration file
+
+    Returns:
+        dict: schema SAID to schema configuration
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    if "schemas" not in data:
+        raise kering.ConfigurationError(f"schema configuration file {path} is missing 'schemas'")
+
+    return data["schemas"]
+
+
+class SchemaRegistry:
+    """
+    Maps schema SAIDs to the validator, payload builder and display name used for credentials of that schema.
+    Lookups are a single dict access so dispatch is constant time regardless of the number of supported schemas.
+    """
+
+    def __init__(self):
+        self.schemas = dict()
+
+    def register(self, said, name, kind, validator, payload=None):
+        """ Register a schema with the validator and payload builder for its credential chain
+
+        Parameters:
+            said (str): qb64 SAID of the schema
+            name (str): human readable name of the schema used in logs and payloads
+            kind (str): kind of credential chain the schema belongs to
+            validator (Callable): validates a credential of this schema, raises ValidationError if invalid
+            payload (Callable): builds the webhook payload for a credential of this schema, None if the schema
+                is only accepted as a link in a chain and can not be presented on its own
+        """
+        self.schemas[said] = Schemage(said=said, name=name, kind=kind, validator=validator, payload=payload)
+
+    def configure(self, schemas, validators, payloads):
+        """ Register each schema in schemas resolving the validators and payload builders by kind
+
+        Parameters:
+            schemas (dict): schema SAID to schema configuration as loaded by loadSchemas
+            validators (dict): kind to validator callable
+            payloads (dict): kind to payload builder callable
+        """
+        for said, config in schemas.items():
+            kind = config["kind"]
+            if kind not in validators:
+                raise kering.ConfigurationError(f"unknown credential kind {kind} for schema {said}")
+
+            payload = payloads.get(kind) if config.get("present", True) else None
+            self.register(said=said, name=config.get("name", kind), kind=kind,
+                          validator=validators[kind], payload=payload)
+            logger.info(f"Registered {config.get('name', kind)} schema {said}")
+
+    def lookup(self, said, link=False):
+        """ Returns the registered Schemage for the schema SAID
+
+        Parameters:
+            said (str): qb64 SAID of the schema
+            link (bool): True means the credential is a link in a chain and does not need to be presentable
+
+        Raises:
+            ValidationError: If the schema is not supported
+        """
+        schemage = self.schemas.get(said)
+        if schemage is None or (not link and schemage.payload is None):
+            raise kering.ValidationError(f"unsupported schema {said}")
+
+        return schemage
+
+    def name(self, said):
+        """ Returns the display name of the schema or the SAID itself if the schema is not supported """
+        schemage = self.schemas.get(said)
+        return schemage.name if schemage is not None else said
+
+    def __contains__(self, said):
+        schemage = self.schemas.get(said)
+        return schemage is not None and schemage.payload is not None
+
+    def __len__(self):
+        return len(self.schemas)
+
+
+class Screener:
+    """
+    Cheap check of the credential embedded in a grant against the supported schemas and the edges expected for its
+    kind, before any of the grant's events are parsed or stored. Only the structure is checked, the credential
+    chain is still validated in full once the credential is received.
+    """
+
+    def __init__(self, schemas=None, metrics=None):
+        """
+        Parameters:
+            schemas (dict): schema SAID to schema configuration, defaults to the vLEI schemas
+            metrics (Metrics): metrics registry to count rejected grants in
+        """
+        schemas = schemas if schemas is not None else DEFAULT_SCHEMAS
+        self.kinds = {said: config["kind"] for said, config in schemas.items() if config.get("present", True)}
+        self.metrics = metrics
+
+    def screen(self, sad):
+        """ Returns the reason [schema|edge] to reject the presented credential, None if it may be processed
+
+        Parameters:
+            sad (dict): the credential embedded in the grant
+        """
+        kind = self.kinds.get(sad.get("s"))
+        if kind is None:
+            return self.reject("schema", sad)
+
+        edges = sad.get("e", {})
+        for label in EDGES.get(kind, ()):
+            edge = edges.get(label) if isinstance(edges, dict) else None
+            if not isinstance(edge, dict) or not isinstance(edge.get("n"), str):
+                return self.reject("edge", sad)
+
+        return None
+
+    def reject(self, reason, sad):
+        logger.info(f"Rejected presentation of credential {sad.get('d')} with schema {sad.get('s')}, "
+                    f"invalid {reason}")
+        if self.metrics is not None:
+            self.metrics.inc("sally_prefilter_rejected_total", reason=reason)
+        return reason
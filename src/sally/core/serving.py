@@ -5,6 +5,7 @@ sally.core.serving module
 
 Endpoint service
 """
+import json
 import os
 
 import falcon
@@ -22,13 +23,17 @@ from keri.vdr import viring, verifying
 from keri.vdr.eventing import Tevery
 from keri.vc import protocoling
 
-from sally.core import handling, basing, monitoring, httping
-from sally.core.credentials import TeveryCuery
+from sally.core import (admitting, capturing, handling, basing, feeding, monitoring, httping, preloading, profiling,
+                        querying, retaining, scheming, sinking)
+from sally.core.credentials import CredentialStatusEnd, StatusCache, TeveryCuery
 from sally.core.verifying import VerificationAgent
 
 logger = help.ogler.getLogger()
 
-def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True, incept_args=None):
+def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True, incept_args=None, schemas=None,
+          admission=None, subscriptions=None, delivery=None, lanes=None, starvation=60.0, interval=1.0,
+          ordering="credential", attempts=3, budget=25, durability=basing.Durability.full, checkpoint=1.0,
+          retention=None, capture=None, tenants=None, preload=True, adminPort=None):
     """
     Setup components, HTTP endpoints, and MailboxDirector working with witnesses to receive events.
 
@@ -36,12 +41,33 @@ def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True,
         hby (Habery): identifier database environment
         alias (str): alias of the identifier representing this agent
         httpPort (int): external port to listen on for HTTP messages
-        hook (str): URL of external web hook to notify of credential issuance and revocations
+        hook (str|list): URL or URLs of external web hooks to notify of credential issuance and revocations
         auth (str): alias or AID of external authority for contacts and credentials
         timeout (int): escrow timeout (in minutes) for events not delivered to upstream web hook
         retry (int): retry delay (in seconds) for failed web hook attempts
         direct (bool): listen for direct-mode messages on HTTP port or use indirect-mode mailbox
         incept_args (dict): arguments for incepting Sally's identifier if it does not exist
+        schemas (dict): schema SAID to schema configuration of supported credentials, defaults to the vLEI schemas
+        admission (dict): keyword arguments of the presentation Admitter, None disables admission control
+        subscriptions (list): subscriber configurations with their own name, URL and event filters
+        delivery (dict): delivery options such as the circuit breaker threshold and the connectTimeout, readTimeout,
+            maxClients and TLS cafile, certfile and keyfile of the sinks
+        lanes (dict): action [iss|rev] to delivery lane weight, concurrency and latency target
+        starvation (float): seconds a backlogged delivery lane may go without a delivery before it is served first
+        interval (float): seconds between passes of the delivery pipeline, shorter than the latency target of a lane
+        ordering (str): deliver events in order per credential SAID (credential) or per holder AID (holder)
+        attempts (int): processing attempts of a grant notice before it is quarantined
+        budget (int): grant notices processed per pass before yielding to the other Doers
+        durability (str): durability tier of the escrow database [full|checkpoint|none]
+        checkpoint (float): seconds between syncs of the escrow database with checkpoint durability
+        retention (dict): retention policy of the escrow database, defaults to retaining.DEFAULT_RETENTION
+        capture (dict): path, size and count of the rotating capture file of inbound CESR bytes, None disables capture
+        tenants (list): alias, auth, hooks and subscribers of further identifiers hosted in this process, as loaded
+            by loadTenants. They share the HTTP server, parser and KEL and TEL stores and each get their own escrow
+            database, Communicator and tenant labeled metrics
+        preload (bool): skip the queued OOBIs already in the keystore and report the time taken to resolve the others
+        adminPort (int): port of the memory profiling admin endpoint /admin/memory, served on 127.0.0.1 only and
+            apart from the public HTTP port, None disables it
     """
     cues = decking.Deck()
     # make hab
@@ -73,9 +99,13 @@ def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True,
     exc = exchanging.Exchanger(hby=hby, handlers=[])
     rep = storing.Respondant(hby=hby, mbx=mbx)
 
-    cdb = basing.CueBaser(name=hby.name)
+    cdb = basing.CueBaser(name=hby.name, durability=durability)
     clear_escrows(cdb)
 
+    metrics = monitoring.Metrics()
+    screener = scheming.Screener(schemas=schemas, metrics=metrics)
+    preloader = preloading.Preloader(hby=hby, metrics=metrics) if preload else None
+
     rvy = routing.Revery(db=hby.db)
     notifier = notifying.Notifier(hby=hby)
     # writes notifications for received IPEX grant exn messages
@@ -86,21 +116,58 @@ def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True,
 
     tvy = Tevery(reger=verifier.reger, db=hby.db, local=False)
     tvy.registerReplyRoutes(router=rvy.rtr)
-    tc = TeveryCuery(cdb=cdb, reger=reger, cues=tvy.cues)
 
-    parser = parsing.Parser(framed=True, kvy=kvy, tvy=tvy, rvy=rvy, vry=verifier, exc=exc)
+    hosted = [host(hby, reger, tenant, timeout=timeout, retry=retry, schemas=schemas, delivery=delivery, lanes=lanes,
+                   starvation=starvation, interval=interval, metrics=metrics, ordering=ordering, durability=durability,
+                   checkpoint=checkpoint, retention=retention)
+              for tenant in (tenants or [])]
+    routes = {thab.pre: tcdb for thab, tcdb, _ in hosted}
+    if hab.pre in routes or len(routes) != len(hosted):
+        raise ValueError("each tenant must have its own identifier")
+
+    admitter = (admitting.Admitter(cdb=cdb, metrics=metrics, tenants=list(routes.values()), **admission)
+                if admission is not None else None)
+
+    statuses = StatusCache(reger=reger)
+    tc = TeveryCuery(cdb=cdb, reger=reger, cues=tvy.cues, cache=statuses, tenants=list(routes.values()))
+
+    # inbound CESR bytes, recorded in the capture file when capture is enabled
+    ims = capturing.Tap(capturing.Capture(**capture)) if capture is not None else None
+    parser = parsing.Parser(ims=ims, framed=True, kvy=kvy, tvy=tvy, rvy=rvy, vry=verifier, exc=exc)
 
-    comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger,
-                                  auth=auth, hook=hook, timeout=timeout, retry=retry)
-    app.add_route("/health", monitoring.HealthEnd(cdb=cdb))
+    hooks = [hook] if isinstance(hook, str) else hook
+    subscribers = sinking.openSubscribers(hab, hooks=hooks, subscriptions=subscriptions, retry=retry, metrics=metrics,
+                                          **(delivery if delivery is not None else {}))
+    comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, auth=auth, timeout=timeout, retry=retry,
+                                  schemas=schemas, subscribers=subscribers, lanes=lanes, starvation=starvation,
+                                  metrics=metrics, ordering=ordering, interval=interval)
+    app.add_route("/health", monitoring.HealthEnd(cdb=cdb, metrics=metrics, subscribers=subscribers))
+    app.add_route("/metrics", monitoring.MetricsEnd(metrics=metrics))
+    readiness = preloading.Readiness(hby=hby, schemas=(schemas if schemas is not None else scheming.DEFAULT_SCHEMAS),
+                                     auths=[auth] + [tenant["auth"] for tenant in (tenants or [])], metrics=metrics)
+    app.add_route("/ready", preloading.ReadyEnd(readiness=readiness))
+    app.add_route("/events", feeding.EventsEnd(cdb=cdb))
+    app.add_route("/presentations", querying.PresentationsEnd(cdb=cdb))
+    app.add_route("/credentials/{said}/status", CredentialStatusEnd(cdb=cdb, cache=statuses))
 
     ending.loadEnds(app, hby=hby, default=hab.pre)
 
-    doers = [httpServerDoer, comms, tc]
+    doers = [httpServerDoer, comms, tc, retaining.Retainer(cdb=cdb, policy=retention, metrics=metrics)]
+    if durability == basing.Durability.checkpoint:
+        doers.append(basing.CheckpointDoer(cdb=cdb, interval=checkpoint))
+    for _, _, tdoers in hosted:
+        doers.extend(tdoers)
+    if preloader is not None:
+        doers.append(preloader)
+    if ims is not None:
+        logger.info(f"Capturing inbound CESR streams to {ims.capture.path}")
+        doers.append(capturing.CaptureDoer(capture=ims.capture))
     if direct:
         logger.info("Adding direct mode HTTP listener")
         # reading notifications for received ipex grant exn messages
-        doers.extend(handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=parser))
+        doers.extend(handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=parser, reger=reger,
+                                           admitter=admitter, screener=screener, attempts=attempts,
+                                           budget=budget, tenants=routes))
 
         # Set up HTTP endpoint for PUT-ing application/cesr streams to the SallyAgent at '/'
         httpEnd = indirecting.HttpEnd(rxbs=parser.ims, mbx=mbx)
@@ -110,15 +177,121 @@ def setup(hby, *, alias, httpPort, hook, auth, timeout=10, retry=3, direct=True,
     else:
         logger.info("Adding indirect mode mailbox listener")
         mbd = indirecting.MailboxDirector(
-            hby=hby, exc=exc, kvy=kvy, tvy=tvy, rvy=rvy, verifier=verifier, rep=rep,
+            hby=hby, ims=ims, exc=exc, kvy=kvy, tvy=tvy, rvy=rvy, verifier=verifier, rep=rep,
             topics=["/receipt", "/replay", "/multisig", "/credential", "/delegate", "/challenge"])  # topics to listen for messages on
         # reading notifications for received ipex grant exn messages
-        doers.extend(handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=mbd.parser))
+        doers.extend(handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=mbd.parser, reger=reger,
+                                           admitter=admitter, screener=screener, attempts=attempts,
+                                           budget=budget, tenants=routes))
         doers.append(mbd)
 
+    if adminPort is not None:
+        logger.info(f"Adding memory profiling admin endpoint at http://127.0.0.1:{adminPort}/admin/memory")
+        communicators = [comms] + [tdoers[0] for _, _, tdoers in hosted]
+        sizes = knownSizes(hby=hby, reger=reger, parser=parser if direct else mbd.parser, kvy=kvy, tvy=tvy,
+                           notifier=notifier, communicators=communicators, statuses=statuses, admitter=admitter)
+        adminApp = falcon.App()
+        adminApp.add_route("/admin/memory", profiling.MemoryEnd(profiler=profiling.MemoryProfiler(sizes=sizes)))
+        doers.append(http.ServerDoer(server=http.Server(host="127.0.0.1", port=adminPort, app=adminApp)))
+
     return doers
 
 
+def knownSizes(hby, reger, parser, kvy, tvy, notifier, communicators, statuses, admitter=None):
+    """ Returns name to callable returning the size of the in-process structures that grow with load """
+    sizes = {
+        "parser.ims": lambda: len(parser.ims),
+        "kvy.cues": lambda: len(kvy.cues),
+        "tvy.cues": lambda: len(tvy.cues),
+        "notifier.signals": lambda: len(notifier.signaler.signals),
+        "hby.kevers": lambda: len(hby.kevers),
+        "reger.tevers": lambda: len(reger.tevers),
+        "statuses.states": lambda: len(statuses.states),
+    }
+    if admitter is not None:
+        sizes["admitter.buckets"] = lambda: len(admitter.buckets)
+
+    for comms in communicators:
+        for subscriber in comms.subscribers:
+            sink = subscriber.sink
+            if isinstance(sink, sinking.HttpSink):
+                sizes[f"{comms.hab.name}.{subscriber.name}.clients"] = lambda sink=sink: len(sink.clients)
+            sizes[f"{comms.hab.name}.{subscriber.name}.results"] = lambda sink=sink: len(sink.results)
+
+    return sizes
+
+
+def host(hby, reger, tenant, *, timeout, retry, schemas, delivery, lanes, starvation, interval, metrics, ordering,
+         durability, checkpoint, retention):
+    """
+    Setup the escrow database, Communicator and retention of a further identifier hosted in this process.
+
+    Parameters:
+        hby (Habery): identifier database environment shared by all tenants
+        reger (Reger): credential registry shared by all tenants
+        tenant (dict): alias and auth of the tenant and the hooks and subscribers to deliver its events to
+        metrics (Metrics): metrics registry, the metrics of the tenant are labeled with its alias
+        other parameters as in setup
+
+    Returns:
+        tuple: (hab, cdb, doers) of the tenant
+    """
+    alias = tenant["alias"]
+    hab = hby.habByName(name=alias)
+    if hab is None:
+        raise ValueError(f"no identifier with alias {alias} for tenant")
+
+    logger.info(f"Hosting tenant {alias}:{hab.pre}")
+    cdb = basing.CueBaser(name=f"{hby.name}-{alias}", durability=durability)
+    clear_escrows(cdb)
+
+    labeled = metrics.labeled(tenant=alias)
+    subscribers = sinking.openSubscribers(hab, hooks=tenant.get("hooks"), subscriptions=tenant.get("subscribers"),
+                                          retry=retry, metrics=labeled, **(delivery if delivery is not None else {}))
+    comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, auth=tenant["auth"], timeout=timeout,
+                                  retry=retry, schemas=schemas, subscribers=subscribers, lanes=lanes,
+                                  starvation=starvation, metrics=labeled, ordering=ordering, interval=interval)
+
+    doers = [comms, retaining.Retainer(cdb=cdb, policy=retention, metrics=labeled)]
+    if durability == basing.Durability.checkpoint:
+        doers.append(basing.CheckpointDoer(cdb=cdb, interval=checkpoint))
+
+    return hab, cdb, doers
+
+
+def loadTenants(path):
+    """ Load the configuration of further identifiers hosted in this process from the JSON file at path
+
+    The file is expected to have the following format:
+    {
+        "tenants": [
+            {"alias": "sally-eu", "auth": "EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl",
+             "hooks": ["http://127.0.0.1:9924"]},
+            {"alias": "sally-us", "auth": "EB-u4VAF7A7_GR8PXJoAVHv5X9vjtXew8Yo6Z3w9mQUQ",
+             "subscribers": [{"name": "compliance", "url": "http://127.0.0.1:9925", "actions": ["rev"]}]}
+        ]
+    }
+    The subscribers of a tenant have the format of the subscriber file.
+
+    Parameters:
+        path (str): path to tenant configuration file
+
+    Returns:
+        list: tenant configurations
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    tenants = data.get("tenants", [])
+    for tenant in tenants:
+        if "alias" not in tenant or "auth" not in tenant:
+            raise ValueError(f"tenant {tenant} requires an alias and an auth")
+        if not tenant.get("hooks") and not tenant.get("subscribers"):
+            raise ValueError(f"tenant {tenant['alias']} requires at least one hook or subscriber")
+
+    return tenants
+
+
 def clear_escrows(cdb):
     """Clear escrows if the environment variable CLEAR_ESCROWS is set to True."""
     if env_var_to_bool("CLEAR_ESCROWS", True):
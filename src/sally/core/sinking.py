@@ -0,0 +1,808 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.sinking module
+
+Delivery sinks for verified presentation and revocation events
+"""
+import abc
+import json
+import os
+import re
+import socket
+import ssl
+import time
+from collections import deque
+from base64 import urlsafe_b64encode as encodeB64
+from urllib import parse
+
+import cbor2
+import msgpack
+from hio.base import doing
+from hio.core import http, tcp
+from hio.help import Hict
+from keri import help
+from keri.core import coring
+from keri.end import ending
+from keri.help import helping
+
+from sally.core import httping
+
+logger = help.ogler.getLogger()
+
+
+def openSink(url, hab, **kwa):
+    """ Returns the delivery sink for the URL based on its scheme
+
+    Supported schemes:
+        http://host:port/path   signed HTTP POST to a web hook
+        https://host:port/path  signed HTTP POST to a web hook over TLS
+        unix:///path/to/socket  newline delimited JSON over a Unix domain stream socket
+        file:///path/to/spool   append only, rotating JSONL spool file
+
+    Parameters:
+        url (str): URL of the sink
+        hab (Hab): identifier environment used to sign web hook calls
+        kwa (dict): keyword arguments passed to the sink
+    """
+    purl = parse.urlparse(url)
+    if purl.scheme in ("http", "https", ""):
+        return HttpSink(hab=hab, url=url, **kwa)
+    elif purl.scheme == "unix":
+        return UnixSink(path=purl.path, **kwa)
+    elif purl.scheme == "file":
+        return SpoolSink(path=purl.path, **kwa)
+
+    raise ValueError(f"unsupported sink scheme {purl.scheme} in {url}")
+
+
+def loadSubscribers(path):
+    """ Load subscriber configuration from the JSON file at path
+
+    The file is expected to have the following format:
+    {
+        "subscribers": [
+            {"name": "compliance", "url": "http://127.0.0.1:9923", "actions": ["iss", "rev"]},
+            {"name": "analytics", "url": "file:///var/sally/analytics.jsonl", "schemas": ["LE", "OOR"]},
+            {"name": "ledger", "url": "https://ledger.internal:8443/sally", "encoding": "cbor"}
+        ]
+    }
+    The schemas filter accepts schema SAIDs or the display names of registered schemas. The encoding selects the
+    body encoding of web hook calls to the subscriber.
+
+    Parameters:
+        path (str): path to subscriber configuration file
+
+    Returns:
+        list: subscriber configurations
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    return data.get("subscribers", [])
+
+
+def openSubscribers(hab, hooks=None, subscriptions=None, retry=3.0, threshold=5, metrics=None, **kwa):
+    """ Returns a Subscriber for each web hook URL and each subscription configuration
+
+    Web hooks without configuration are named hook0, hook1, ... in order and receive all events.
+
+    Parameters:
+        hab (Hab): identifier environment used to sign web hook calls
+        hooks (list): web hook or sink URLs
+        subscriptions (list): subscriber configurations as loaded by loadSubscribers
+        retry (float): initial retry delay (in seconds) once the circuit breaker of a subscriber opens
+        threshold (int): consecutive failed deliveries that open the circuit breaker of a subscriber
+        metrics (Metrics): metrics registry to record circuit breaker states in
+        kwa (dict): keyword arguments passed to each sink
+    """
+    breaker = dict(retry=retry, threshold=threshold, concurrency=kwa.get("maxClients", 32), metrics=metrics)
+    subscribers = []
+    for idx, url in enumerate(hooks or []):
+        subscribers.append(Subscriber(name=f"hook{idx}", sink=openSink(url, hab=hab, **kwa), **breaker))
+
+    for config in subscriptions or []:
+        options = dict(kwa, encoding=config["encoding"]) if "encoding" in config else kwa
+        subscribers.append(Subscriber(name=config["name"], sink=openSink(config["url"], hab=hab, **options),
+                                      schemas=config.get("schemas"), actions=config.get("actions"), **breaker))
+
+    names = [subscriber.name for subscriber in subscribers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate subscriber names in {names}")
+
+    return subscribers
+
+
+def envelope(said, resource, action, actor, data, sequence=None):
+    """ Returns the event body for sinks that do not carry HTTP headers """
+    body = dict(
+        said=said,
+        resource=resource,
+        timestamp=helping.nowIso8601(),
+        action=action,
+        actor=actor,
+        data=data
+    )
+    if sequence is not None:
+        body["sequence"] = sequence
+    return body
+
+
+class Encodings:
+    """ Body encodings of web hook calls """
+    json = "json"
+    cbor = "cbor"
+    msgpack = "msgpack"
+
+
+ContentTypes = {
+    Encodings.json: "application/json",
+    Encodings.cbor: "application/cbor",
+    Encodings.msgpack: "application/msgpack",
+}
+
+# body and payload fields holding qb64 SAIDs and AIDs, carried as qb2 bytes in binary encodings
+PrimitiveFields = ("actor", "credential", "issuer", "recipient", "schema", "qviCredential", "legalEntityCredential",
+                   "authCredential")
+
+
+def compact(body):
+    """ Returns a copy of the body with the qb64 primitives of PrimitiveFields converted to qb2 """
+    compacted = dict()
+    for field, value in body.items():
+        if isinstance(value, dict):
+            value = compact(value)
+        elif field in PrimitiveFields and isinstance(value, str):
+            value = coring.Matter(qb64=value).qb2
+        compacted[field] = value
+    return compacted
+
+
+def encode(body, encoding):
+    """ Returns the body serialized with encoding
+
+    JSON bodies carry qb64 SAIDs and AIDs. CBOR and MessagePack bodies carry them as qb2 bytes, a third smaller and
+    still self describing through their derivation code.
+    """
+    if encoding == Encodings.cbor:
+        return cbor2.dumps(compact(body))
+    elif encoding == Encodings.msgpack:
+        return msgpack.dumps(compact(body))
+    return json.dumps(body).encode("utf-8")
+
+
+class Sink(abc.ABC):
+    """
+    Abstract base class of delivery sinks. A sink delivers an event for a credential SAID with .send and reports the
+    outcome of the delivery as an HTTP style status code from .status once the delivery has completed.
+    At most one delivery is in flight for each SAID.
+    """
+
+    def __init__(self):
+        self.results = dict()
+
+    @abc.abstractmethod
+    def send(self, said, resource, action, actor, data, sequence=None):
+        """ Start delivery of an event
+
+        Parameters:
+            said (str): qb64 SAID of credential
+            resource (str): the resource type that triggered the event
+            action (str): the action performed on the resource [iss|rev]
+            actor (str): qualified b64 AID of sender of the event
+            data (dict): serializable body of the event
+            sequence (int): sequence number of the event for its ordering key, None if unsequenced
+        """
+
+    @property
+    def full(self):
+        """ True means the sink can not start another delivery until some in flight deliveries complete """
+        return False
+
+    def pending(self, said):
+        """ Returns True if a delivery for said has been started and its status not yet collected """
+        return said in self.results
+
+    def status(self, said):
+        """ Returns the status of the delivery for said and forgets it, None if still in progress """
+        status = self.results.get(said)
+        if status is not None:
+            del self.results[said]
+        return status
+
+    def flush(self):
+        """ Complete any deliveries that are batched by the sink """
+
+    def close(self):
+        """ Release any resources held by the sink """
+
+
+class TlsConnector(tcp.ClientTls):
+    """
+    TLS client connection that resumes the TLS session of an earlier connection to the same web hook so a new
+    connection costs an abbreviated handshake. Counts full and resumed handshakes in the shared session cache.
+    """
+
+    def __init__(self, cache, **kwa):
+        """
+        Parameters:
+            cache (TlsSessions): TLS sessions and handshake counts shared by the connections of a sink
+        """
+        self.cache = cache
+        super(TlsConnector, self).__init__(**kwa)
+
+    def wrap(self):
+        self.cs = self.context.wrap_socket(self.cs,
+                                           server_side=False,
+                                           do_handshake_on_connect=False,
+                                           server_hostname=self.certedhost,
+                                           session=self.cache.session)
+
+    def handshake(self):
+        done = super(TlsConnector, self).handshake()
+        if done:
+            self.cache.handshakes += 1
+            if self.cs.session_reused:
+                self.cache.resumed += 1
+        return done
+
+
+class TlsSessions:
+    """ TLS session to resume and handshake counts of the connections of a sink """
+
+    def __init__(self):
+        self.session = None
+        self.handshakes = 0  # all completed handshakes
+        self.resumed = 0  # handshakes that resumed the session of an earlier connection
+
+    def update(self, connector):
+        """ Remember the latest session of connector, available once its session ticket has been received """
+        if connector.cs is not None and connector.connected:
+            session = connector.cs.session
+            if session is not None and session.has_ticket:
+                self.session = session
+
+
+class HttpSink(doing.DoDoer, Sink):
+    """
+    Delivers events as signed HTTP POST requests to an http or https web hook URL.
+
+    Requests are sent over a pool of up to maxClients keep-alive connections, each running in its own client Doer
+    managed by this DoDoer and carrying one request at a time. HTTPS connections share one TLS context and resume
+    the TLS session of earlier connections so neither a TCP nor a full TLS handshake is paid per event.
+
+    Requests that are not connected within connectTimeout or not answered within readTimeout are reaped:
+    the connection is closed, its Doer removed and the delivery reported as failed with a 503 or 504 status.
+    """
+
+    def __init__(self, hab, url, connectTimeout=10.0, readTimeout=30.0, maxClients=32, cafile=None, certfile=None,
+                 keyfile=None, encoding=Encodings.json, **kwa):
+        """
+        Parameters:
+            hab (Hab): identifier environment used to sign web hook calls
+            url (str): URL of the web hook
+            connectTimeout (float): seconds to wait for the connection to the web hook
+            readTimeout (float): seconds to wait for the response of the web hook once the request is started
+            maxClients (int): maximum number of open client connections
+            cafile (str): path of the CA certificates to verify an https web hook with, system CAs if None
+            certfile (str): path of the client certificate for https web hooks requiring client authentication
+            keyfile (str): path of the private key of the client certificate
+            encoding (str): body encoding [json|cbor|msgpack], falls back to json if the web hook answers 415
+        """
+        if encoding not in ContentTypes:
+            raise ValueError(f"unsupported body encoding {encoding}")
+
+        self.hab = hab
+        self.encoding = encoding
+        self.url = url
+        self.purl = parse.urlparse(url)
+        self.connectTimeout = connectTimeout
+        self.readTimeout = readTimeout
+        self.maxClients = maxClients
+        self.clients = dict()  # SAID to (client, clientDoer, start tyme) of requests in flight
+        self.idle = deque()  # (client, clientDoer) of open connections without a request
+
+        self.cafile = cafile
+        self.context = None
+        self.tls = TlsSessions()
+        if self.purl.scheme == "https":
+            self.context = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH, cafile=cafile)
+            if certfile is not None:
+                self.context.load_cert_chain(certfile=certfile, keyfile=keyfile)
+
+        super(HttpSink, self).__init__(doers=[], always=True, **kwa)
+        Sink.__init__(self)
+
+    @property
+    def full(self):
+        return len(self.clients) >= self.maxClients
+
+    def checkout(self):
+        """ Returns an idle connection of the pool or opens a new one """
+        while self.idle:
+            (client, clientDoer) = self.idle.popleft()
+            if not client.connector.cutoff:
+                return client, clientDoer
+            self.discard(client, clientDoer)  # closed by the web hook while idle
+
+        if self.context is not None:
+            connector = TlsConnector(cache=self.tls, context=self.context, cafilepath=self.cafile,
+                                     host=self.purl.hostname, port=self.purl.port or 443)
+            client = http.clienting.Client(connector=connector, hostname=self.purl.hostname,
+                                           port=self.purl.port or 443, scheme="https")
+        else:
+            client = http.clienting.Client(hostname=self.purl.hostname, port=self.purl.port)
+        clientDoer = http.clienting.ClientDoer(client=client)
+        self.extend([clientDoer])
+        return client, clientDoer
+
+    def discard(self, client, clientDoer):
+        """ Close the connection and remove its Doer """
+        self.remove([clientDoer])
+        client.close()
+
+    def send(self, said, resource, action, actor, data, sequence=None):
+        """
+        Generate and launch HTTP request to remote webhook URL.
+        Adds custom Sally-Resource and Sally-Timestamp headers and the Sally-Sequence header for sequenced events.
+        """
+        if self.full:
+            logger.error(f"too many open requests to {self.url}, not sending {action} of {said}")
+            self.results[said] = 503
+            return
+
+        purl = self.purl
+        client, clientDoer = self.checkout()
+
+        body = dict(
+            action=action,
+            actor=actor,
+            data=data
+        )
+
+        raw = encode(body, self.encoding)
+        headers = Hict([
+            ("Content-Type", ContentTypes[self.encoding]),
+            ("Content-Length", len(raw)),
+            ("Connection", "keep-alive"),
+            ("Sally-Resource", resource),
+            ("Sally-Timestamp", helping.nowIso8601()),
+        ])
+        if sequence is not None:
+            headers["Sally-Sequence"] = str(sequence)
+        path = purl.path or "/"
+
+        keyid = encodeB64(self.hab.kever.serder.verfers[0].raw).decode('utf-8')
+        header, unq = httping.siginput(
+            self.hab, "sig0", "POST", path, headers,
+            fields=[
+                "Sally-Resource",
+                "@method",
+                "@path",
+                "Sally-Timestamp",
+                "Sally-Sequence"  # only signed when present
+            ],
+            alg="ed25519",
+            keyid=keyid
+        )
+
+        headers.extend(header)
+        signage = ending.Signage(
+            markers=dict(sig0=unq), indexed=True, signer=self.hab.pre, ordinal=None, digest=None, kind=None)
+
+        headers.extend(ending.signature([signage]))
+
+        client.request(
+            method='POST',
+            path=path,
+            qargs=parse.parse_qs(purl.query),
+            headers=headers,
+            body=raw
+        )
+
+        self.clients[said] = (client, clientDoer, self.tyme)
+
+    def pending(self, said):
+        return said in self.clients or said in self.results
+
+    def status(self, said):
+        if said not in self.clients:
+            return super(HttpSink, self).status(said)
+
+        (client, clientDoer, _) = self.clients[said]
+        if not client.responses:
+            return None
+
+        response = client.responses.popleft()
+        del self.clients[said]
+        if response["status"] == 415 and self.encoding != Encodings.json:
+            logger.warning(f"web hook {self.url} does not accept {self.encoding} bodies, falling back to json")
+            self.encoding = Encodings.json
+        if self.context is not None:
+            self.tls.update(client.connector)
+
+        if response["headers"].get("Connection", "").lower() == "close" or client.connector.cutoff:
+            self.discard(client, clientDoer)
+        else:
+            self.idle.append((client, clientDoer))  # keep alive for the next request
+
+        return response["status"]
+
+    def drop(self, said):
+        """ Close the connection of the request for said and remove its Doer """
+        (client, clientDoer, _) = self.clients.pop(said)
+        self.discard(client, clientDoer)
+
+    def reap(self, tyme):
+        """ Drop the requests that have not connected, lost their connection or not been answered in time and record
+        them as failed """
+        for said, (client, clientDoer, started) in list(self.clients.items()):
+            if client.responses:
+                continue
+
+            elapsed = tyme - started
+            if not client.connector.connected and elapsed >= self.connectTimeout:
+                logger.error(f"connection to {self.url} for {said} timed out after {elapsed} seconds")
+                self.results[said] = 503
+                self.drop(said)
+            elif client.connector.cutoff:
+                logger.error(f"connection to {self.url} for {said} closed before the response")
+                self.results[said] = 503
+                self.drop(said)
+            elif elapsed >= self.readTimeout:
+                logger.error(f"request to {self.url} for {said} timed out after {elapsed} seconds")
+                self.results[said] = 504
+                self.drop(said)
+
+    def recur(self, tyme, deeds=None):
+        """ Run the client Doers then reap stalled requests """
+        done = super(HttpSink, self).recur(tyme=tyme, deeds=deeds)
+        self.reap(tyme)
+        return done
+
+    def close(self):
+        for said in list(self.clients.keys()):
+            self.drop(said)
+        while self.idle:
+            self.discard(*self.idle.popleft())
+
+
+class UnixSink(doing.Doer, Sink):
+    """
+    Delivers events as newline delimited JSON over a Unix domain stream socket to a consumer on the same host.
+
+    The socket is non-blocking. Events are queued in an outbound buffer that is written as far as the socket accepts
+    on every send, flush and run of the Doer, so a slow consumer never holds up Sally. An event is delivered once its
+    whole line has been written. The connection is kept open across events. After an error, or once the consumer
+    has not read anything for timeout seconds, the connection is closed and the events queued on it are reported
+    failed, so a line cut off on one connection is never continued on the next.
+    """
+
+    def __init__(self, path, timeout=5.0, tock=0.0, **kwa):
+        """
+        Parameters:
+            path (str): file system path of the Unix domain socket of the consumer
+            timeout (float): seconds queued events may wait without any of their bytes being written
+            tock (float): seconds between runs of the Doer writing the outbound buffer
+        """
+        self.path = path
+        self.timeout = timeout
+        self.sock = None
+        self.outbox = deque()  # [said, line, bytes of the line written] of the events not completely written
+        self.written = None  # monotonic time bytes were last written or the outbox was empty
+
+        super(UnixSink, self).__init__(tock=tock)
+        Sink.__init__(self)
+
+    def connect(self):
+        if self.sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                raise
+            self.sock = sock
+        return self.sock
+
+    def send(self, said, resource, action, actor, data, sequence=None):
+        line = json.dumps(envelope(said, resource, action, actor, data, sequence)).encode("utf-8") + b'\n'
+        if not self.outbox:
+            self.written = time.monotonic()
+        self.outbox.append([said, line, 0])
+        self.drain()
+
+    def pending(self, said):
+        return said in self.results or any(queued[0] == said for queued in self.outbox)
+
+    def drain(self, now=None):
+        """ Write the outbound buffer as far as the socket accepts without blocking """
+        now = now if now is not None else time.monotonic()
+        try:
+            while self.outbox:
+                queued = self.outbox[0]
+                said, line, offset = queued
+                try:
+                    sent = self.connect().send(line[offset:])
+                except BlockingIOError:
+                    break
+
+                self.written = now
+                queued[2] += sent
+                if queued[2] == len(line):
+                    self.outbox.popleft()
+                    self.results[said] = 200
+        except OSError as ex:
+            self.fail(f"{ex}")
+            return
+
+        if self.outbox and now - self.written >= self.timeout:
+            self.fail(f"nothing read for {now - self.written:.1f} seconds")
+
+    def fail(self, reason):
+        """ Close the connection and report the events not completely written as failed """
+        for said, line, offset in self.outbox:
+            logger.error(f"failed to deliver {said} to {self.path}: {reason}")
+            self.results[said] = 503
+        self.outbox.clear()
+        self.disconnect()
+
+    def recur(self, tyme):
+        self.drain()
+        return False
+
+    def flush(self):
+        self.drain()
+
+    def disconnect(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def close(self):
+        self.fail("sink closed")
+
+
+class SpoolSink(Sink):
+    """
+    Delivers events by appending them as JSON lines to a spool file that consumers read at disk speed.
+    Writes are made durable in batches: an event is only reported delivered once a fsync covering it has
+    completed. A failed write or fsync truncates the spool file back to the end of the last whole line that is
+    still reported delivered, so consumers never read a partial line. The spool file is rotated once it grows
+    beyond maxBytes.
+    """
+
+    def __init__(self, path, batch=100, maxBytes=64 * 1024 * 1024, **kwa):
+        """
+        Parameters:
+            path (str): file system path of the spool file
+            batch (int): number of events written before forcing a fsync
+            maxBytes (int): size in bytes after which the spool file is rotated
+        """
+        super(SpoolSink, self).__init__()
+        self.path = path
+        self.batch = batch
+        self.maxBytes = maxBytes
+        self.unsynced = []
+        self.synced = None  # size of the spool file before the unsynced events were written
+        self.file = None
+
+    def open(self):
+        if self.file is None:
+            dirname = os.path.dirname(self.path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+            self.file = open(self.path, "ab", buffering=0)  # unbuffered so a failed write can be truncated away
+        return self.file
+
+    def size(self):
+        return os.fstat(self.file.fileno()).st_size
+
+    def send(self, said, resource, action, actor, data, sequence=None):
+        line = json.dumps(envelope(said, resource, action, actor, data, sequence)).encode("utf-8") + b'\n'
+        offset = None
+        try:
+            self.open()
+            offset = self.size()
+            view = memoryview(line)
+            while view:
+                view = view[self.file.write(view):]
+        except OSError as ex:
+            logger.error(f"failed to spool {action} of {said} to {self.path}: {ex}")
+            if offset is not None:
+                self.truncate(offset)
+            self.results[said] = 503
+            return
+
+        if not self.unsynced:
+            self.synced = offset
+        self.unsynced.append(said)
+        if len(self.unsynced) >= self.batch:
+            self.flush()
+
+    def pending(self, said):
+        return said in self.results or said in self.unsynced
+
+    def flush(self):
+        """ Make all written events durable with a single fsync and rotate the spool file if needed """
+        if not self.unsynced:
+            return
+
+        try:
+            if self.file is None:
+                raise OSError("spool file closed after a failed truncate")
+            os.fsync(self.file.fileno())
+        except OSError as ex:
+            logger.error(f"failed to sync spool {self.path}: {ex}")
+            if self.file is not None:
+                self.truncate(self.synced)  # the events are retried, their lines must not stay behind
+            status = 503
+        else:
+            status = 200
+
+        for said in self.unsynced:
+            self.results[said] = status
+        self.unsynced = []
+        self.synced = None
+
+        if self.file is not None and self.size() >= self.maxBytes:
+            self.rotate()
+
+    def truncate(self, offset):
+        """ Cut the spool file back to offset, the file is closed if that fails """
+        try:
+            self.file.truncate(offset)
+        except OSError as ex:
+            logger.error(f"failed to truncate spool {self.path} to {offset} bytes: {ex}")
+            self.file.close()
+            self.file = None
+
+    def rotate(self):
+        """ Close the current spool file and move it aside so consumers can process it as a whole """
+        self.file.close()
+        self.file = None
+        stamp = helping.nowUTC().strftime("%Y%m%d%H%M%S%f")
+        os.replace(self.path, f"{self.path}.{stamp}")
+        logger.info(f"Rotated spool file {self.path}")
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class Breakers:
+    """ Circuit breaker states of a subscriber """
+    closed = "closed"  # deliveries flow normally
+    open = "open"  # target is failing, deliveries are held in escrow until the retry delay passes
+    half = "half-open"  # a single probe delivery is tried to find out if the target recovered
+
+
+# gauge values of the breaker states in metrics
+BreakerGauges = {Breakers.closed: 0, Breakers.half: 1, Breakers.open: 2}
+
+
+class Subscriber:
+    """
+    Named delivery target with its own sink, event filters and circuit breaker.
+    Each subscriber has its own delivery queues in the CueBaser keyed by its name so a slow or failing
+    subscriber does not hold back the others.
+
+    After threshold consecutive failed deliveries the breaker opens and no deliveries are started until the
+    retry delay passes. Then a single probe delivery is started. If it fails the breaker opens again with a
+    doubled retry delay, if it succeeds the breaker closes and the number of deliveries in flight is ramped
+    back up from one, doubling with each success, to concurrency.
+    """
+
+    def __init__(self, name, sink, schemas=None, actions=None, retry=3.0, maxRetry=300.0, threshold=5,
+                 concurrency=32, metrics=None):
+        """
+        Parameters:
+            name (str): unique name of the subscriber, used as the first key of its escrow entries
+            sink (Sink): delivery sink of the subscriber
+            schemas (list): schema SAIDs or names to deliver, None for all schemas
+            actions (list): actions [iss|rev] to deliver, None for all actions
+            retry (float): initial retry delay (in seconds) once the breaker opens
+            maxRetry (float): maximum retry delay (in seconds) when probe deliveries keep failing
+            threshold (int): consecutive failed deliveries that open the breaker
+            concurrency (int): maximum number of deliveries in flight while the breaker is closed
+            metrics (Metrics): metrics registry to record the breaker state in
+        """
+        if not re.fullmatch(r"[A-Za-z0-9_-]+", name):
+            raise ValueError(f"invalid subscriber name {name}, only letters, digits, '_' and '-' are allowed")
+
+        self.name = name
+        self.sink = sink
+        self.schemas = set(schemas) if schemas is not None else None
+        self.actions = set(actions) if actions is not None else None
+        self.retry = retry
+        self.maxRetry = maxRetry
+        self.threshold = threshold
+        self.concurrency = concurrency
+        self.metrics = metrics
+
+        self.state = Breakers.closed
+        self.failures = 0  # consecutive failed deliveries
+        self.inflight = 0  # deliveries started and not yet answered
+        self.limit = concurrency  # deliveries allowed in flight, ramped up after recovery
+        self.delay = 0.0
+        self.retryAt = 0.0
+        self.record()
+
+    def accepts(self, schema, action, name=None):
+        """ Returns True if events with schema and action are delivered to this subscriber
+
+        Parameters:
+            schema (str): qb64 SAID of the credential schema
+            action (str): the action performed on the credential [iss|rev]
+            name (str): display name of the credential schema
+        """
+        if self.actions is not None and action not in self.actions:
+            return False
+        if self.schemas is not None and schema not in self.schemas and name not in self.schemas:
+            return False
+        return True
+
+    def ready(self, now=None):
+        """ Returns True if the breaker allows another delivery to be started """
+        if self.state == Breakers.open:
+            if (now if now is not None else time.monotonic()) < self.retryAt:
+                return False
+            self.transition(Breakers.half)
+
+        if self.state == Breakers.half:
+            return self.inflight == 0  # single probe
+
+        return self.inflight < self.limit
+
+    def sent(self):
+        """ Count a started delivery """
+        self.inflight += 1
+
+    def succeeded(self):
+        """ Close the breaker after a successful delivery and ramp up the deliveries allowed in flight """
+        self.inflight = max(0, self.inflight - 1)
+        self.failures = 0
+        if self.state != Breakers.closed:
+            self.delay = 0.0
+            self.retryAt = 0.0
+            self.limit = 1
+            self.transition(Breakers.closed)
+        elif self.limit < self.concurrency:
+            self.limit = min(self.concurrency, self.limit * 2)
+
+    def failed(self, now=None):
+        """ Count a failed delivery and open the breaker once failures reach the threshold or a probe fails """
+        self.inflight = max(0, self.inflight - 1)
+        self.failures += 1
+        if self.state == Breakers.open:  # delivery started before the breaker opened
+            return
+
+        if self.state == Breakers.half or self.failures >= self.threshold:
+            self.delay = min(self.maxRetry, self.delay * 2 if self.delay else self.retry)
+            self.retryAt = (now if now is not None else time.monotonic()) + self.delay
+            self.transition(Breakers.open)
+
+    def transition(self, state):
+        """ Move the breaker to state and record it """
+        logger.warning(f"circuit breaker of subscriber {self.name} is {state} after {self.failures} failures"
+                       + (f", retrying in {self.delay} seconds" if state == Breakers.open else ""))
+        self.state = state
+        if self.metrics is not None:
+            self.metrics.inc("sally_breaker_transitions_total", subscriber=self.name, state=state)
+        self.record()
+
+    def record(self):
+        if self.metrics is not None:
+            self.metrics.set("sally_breaker_state", BreakerGauges[self.state], subscriber=self.name)
+
+    def health(self):
+        """ Returns the breaker state for the health endpoint """
+        return dict(state=self.state, failures=self.failures, inflight=self.inflight, limit=self.limit,
+                    delay=self.delay)
@@ -18,7 +18,7 @@ from keri.vdr import verifying
 from keri.vc import protocoling
 from keri.help import helping
 
-from sally.core import handling
+from sally.core import scheming
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -104,7 +104,7 @@ class CredentialIssuer:
         extCred = credentialing.Credentialer(hby=self.extHby, rgy=self.extRgy, registrar=extRar, verifier=extVer)
         creder = extCred.create(regname=self.extRgy.name,
                                 recp=self.qviHab.pre,
-                                schema=handling.QVI_SCHEMA,
+                                schema=scheming.QVI_SCHEMA,
                                 source=None,
                                 rules=None,
                                 data=dict(LEI="6383001AJTYIGC8Y1X37"),
@@ -144,7 +144,7 @@ class CredentialIssuer:
 
         # Issue Legal Entity Credential from QVI to LE
         # Create edges pointing back to QVI credential
-        edges = dict(d="", qvi=dict(n=creder.said, s=handling.QVI_SCHEMA))
+        edges = dict(d="", qvi=dict(n=creder.said, s=scheming.QVI_SCHEMA))
         _, edges = coring.Saider.saidify(sad=edges, label=coring.Saids.d)
 
         # Load rules section
@@ -156,7 +156,7 @@ class CredentialIssuer:
         qviCred = credentialing.Credentialer(hby=self.qviHby, rgy=self.qviRgy, registrar=qviRar, verifier=qviVer)
         creder = qviCred.create(regname=self.qviRgy.name,
                                 recp=self.leeHab.pre,
-                                schema=handling.LE_SCHEMA,
+                                schema=scheming.LE_SCHEMA,
                                 source=edges,
                                 rules=rules,
                                 data=dict(LEI="5493001KJTIIGC8Y1R17"),
@@ -196,13 +196,13 @@ class CredentialIssuer:
 
         # Issue OOR AUTH Credential from LE to QVI
         # Create edges pointing back to LE credential
-        edges = dict(d="", le=dict(n=creder.said, s=handling.LE_SCHEMA))
+        edges = dict(d="", le=dict(n=creder.said, s=scheming.LE_SCHEMA))
         _, edges = coring.Saider.saidify(sad=edges, label=coring.Saids.d)
 
         leeCred = credentialing.Credentialer(hby=self.leeHby, rgy=self.leeRgy, registrar=leeRar, verifier=leeVer)
         creder = leeCred.create(regname=self.leeRgy.name,
                                 recp=self.qviHab.pre,
-                                schema=handling.OOR_AUTH_SCHEMA,
+                                schema=scheming.OOR_AUTH_SCHEMA,
                                 source=edges,
                                 rules=rules,
                                 data=dict(
@@ -245,13 +245,13 @@ class CredentialIssuer:
 
         # Issue OOR Credential from QVI to Person
         # Create edges pointing back to AUTH credential
-        edges = dict(d="", auth=dict(n=creder.said, o="I2I", s=handling.OOR_AUTH_SCHEMA))
+        edges = dict(d="", auth=dict(n=creder.said, o="I2I", s=scheming.OOR_AUTH_SCHEMA))
         _, edges = coring.Saider.saidify(sad=edges, label=coring.Saids.d)
 
         qviCred = credentialing.Credentialer(hby=self.qviHby, rgy=self.qviRgy, registrar=qviRar, verifier=qviVer)
         creder = qviCred.create(regname=self.qviRgy.name,
                                 recp=self.perHab.pre,
-                                schema=handling.OOR_SCHEMA,
+                                schema=scheming.OOR_SCHEMA,
                                 source=edges,
                                 rules=rules,
                                 data=dict(
@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.admitting module
+
+Testing admission control
+"""
+from keri.core import coring
+from keri.vc import proving
+
+from sally.core import admitting, basing, monitoring
+
+SENDER = "EOwXzTKWgsmCDVJwMS4VUJWX-m-oKx9d8VDyaRNY6mMZ"
+OTHER = "EI0QTANut9IcXuPDbr7la4JJrjhMZ-EEk5q7Ahds8qBa"
+
+
+def test_token_bucket():
+    bucket = admitting.TokenBucket(rate=2.0, burst=3, now=0.0)
+    assert bucket.take(now=0.0) is True
+    assert bucket.take(now=0.0) is True
+    assert bucket.take(now=0.0) is True
+    assert bucket.take(now=0.0) is False
+
+    assert bucket.take(now=0.5) is True  # one token refilled after half a second
+    assert bucket.take(now=0.5) is False
+
+    bucket.refill(now=10.0)
+    assert bucket.full
+
+
+def test_admitter():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    metrics = monitoring.Metrics()
+    admitter = admitting.Admitter(cdb=cdb, metrics=metrics, rate=1.0, burst=2, high=2, low=1)
+
+    assert admitter.admit(SENDER, now=0.0) == admitting.Decisions.admit
+    assert admitter.admit(SENDER, now=0.0) == admitting.Decisions.admit
+    assert admitter.admit(SENDER, now=0.0) == admitting.Decisions.limit
+    # other senders are not affected by a misbehaving sender
+    assert admitter.admit(OTHER, now=0.0) == admitting.Decisions.admit
+
+    assert metrics.get("sally_admission_total", decision="admit") == 3
+    assert metrics.get("sally_admission_total", decision="limit") == 1
+
+    # fill the escrow past the high watermark
+    cdb.iss.pin(keys=("EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_",), val=coring.Dater())
+    cdb.iss.pin(keys=("EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm",), val=coring.Dater())
+    assert admitter.admit(OTHER, now=10.0) == admitting.Decisions.defer
+    assert metrics.get("sally_admission_shedding") == 1
+    assert metrics.get("sally_admission_escrow_depth") == 2
+
+    # still deferring until below the low watermark
+    cdb.iss.rem(keys=("EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_",))
+    assert admitter.admit(OTHER, now=10.0) == admitting.Decisions.defer
+
+    cdb.iss.rem(keys=("EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm",))
+    assert admitter.admit(OTHER, now=10.0) == admitting.Decisions.admit
+    assert metrics.get("sally_admission_total", decision="defer") == 2
+
+    text = metrics.render()
+    assert '# TYPE sally_admission_total counter' in text
+    assert 'sally_admission_total{decision="defer"} 2' in text
+    assert 'sally_admission_shedding 0' in text
+
+    # the escrows of the other tenants count towards the watermarks
+    tenant = basing.CueBaser(name="test_tenant", temp=True)
+    admitter = admitting.Admitter(cdb=cdb, rate=1.0, burst=10, high=2, low=1, tenants=[tenant])
+    cdb.iss.pin(keys=("EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_",), val=coring.Dater())
+    tenant.iss.pin(keys=("EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm",), val=coring.Dater())
+    assert admitter.depth() == 2
+    assert admitter.admit(OTHER, now=20.0) == admitting.Decisions.defer
+    tenant.close(clear=True)
+    cdb.iss.trim()
+
+    # recv holds a copy of a presentation for each subscriber, only the deepest subscriber queue counts
+    admitter = admitting.Admitter(cdb=cdb, rate=1.0, burst=1, high=10, limiting=admitting.Decisions.reject)
+    dates = "1AAG2021-01-01T00c00c00d000000p00c00"
+    for i in range(3):
+        creder = proving.credential(schema="ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY", issuer=SENDER,
+                                    data=dict(LEI=f"25490000000000000{i:03d}"))
+        for name in ("hook0", "hook1", "audit"):
+            if name != "audit" or i == 0:
+                cdb.enqueue(cdb.recv, keys=(name, creder.said, dates), val=creder)
+    assert admitter.depth() == 3
+
+    # rate limited presentations are dropped under the reject policy
+    assert admitter.admit(SENDER, now=30.0) == admitting.Decisions.admit
+    assert admitter.admit(SENDER, now=30.0) == admitting.Decisions.reject
+
+    cdb.close(clear=True)
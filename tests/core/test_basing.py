@@ -3,9 +3,13 @@
 tests.db.dbing module
 
 """
+import json
 import lmdb
 import os
 
+import pytest
+from hio.base import doing
+from keri.core import coring
 from keri.db import subing
 from keri.vc import proving
 from sally.core import basing
@@ -30,7 +34,254 @@ def test_baser():
     assert isinstance(baser.recv, subing.SerderSuber)
     assert isinstance(baser.revk, subing.SerderSuber)
     assert isinstance(baser.ack, subing.SerderSuber)
+    assert isinstance(baser.seqs, subing.Suber)
+    assert isinstance(baser.ordr, subing.Suber)
+    assert isinstance(baser.evts, subing.Suber)
+    assert isinstance(baser.tries, subing.Suber)
+    assert isinstance(baser.quar, subing.Suber)
+    assert isinstance(baser.crsr, subing.Suber)
+    assert isinstance(baser.meta, subing.Suber)
+    assert isinstance(baser.pres, subing.Suber)
+    assert isinstance(baser.pidx, subing.Suber)
+    assert isinstance(baser.vrdt, subing.Suber)
+    assert isinstance(baser.qcnt, subing.Suber)
 
-    assert baser.env.stat()['entries'] == 7  # One for each DB above and then one for the version field, __version__
+    assert baser.env.stat()['entries'] == 18  # One for each DB above and then one for the version field, __version__
 
 
+def test_sequence():
+    """
+    Test sequence numbers and ordering of queued events
+    """
+    baser = basing.CueBaser(name="test_cb", temp=True)
+    key = "EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_"
+    other = "EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm"
+    dates = "1AAG2021-01-01T00c00c00d000000p00c00"
+    later = "1AAG2021-01-01T00c00c01d000000p00c00"
+
+    assert baser.head("hook0", key) is None
+    assert baser.sequence("hook0", key, key, dates) == 1
+    assert baser.sequence("hook0", key, key, later) == 2
+    assert baser.sequence("hook0", other, other, dates) == 1
+    assert baser.sequence("audit", key, key, later) == 1
+
+    assert baser.head("hook0", key) == (1, key, dates, None)
+    baser.dequeue("hook0", key, 1)
+    assert baser.head("hook0", key) == (2, key, later, None)
+    baser.dequeue("hook0", key, 2)
+    assert baser.head("hook0", key) is None
+    assert baser.head("hook0", other) == (1, other, dates, None)
+
+    # numbers keep increasing once the queue of a key is empty
+    assert baser.sequence("hook0", key, key, dates) == 3
+    for sn in range(4, 20):
+        baser.sequence("hook0", key, key, dates)
+    assert baser.head("hook0", key) == (3, key, dates, None)  # fixed width keys sort numerically
+
+    # the number of the event in the event log is kept with its sequence number
+    assert baser.sequence("audit", other, other, dates, event=26) == 1
+    assert baser.head("audit", other) == (1, other, dates, 26)
+
+    baser.close(clear=True)
+
+
+
+
+def test_subscriber_counts(tmp_path):
+    """
+    Test counting the events in the delivery queues of each subscriber
+    """
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    creder = proving.credential(schema="ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY",
+                                issuer="EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl",
+                                data=dict(LEI="254900OPPU84GM83MG36"))
+    dates = "1AAG2021-01-01T00c00c00d000000p00c00"
+
+    baser.enqueue(baser.recv, keys=("hook0", creder.said, dates), val=creder)
+    baser.enqueue(baser.recv, keys=("hook0", creder.said, dates), val=creder)  # already queued
+    baser.enqueue(baser.revk, keys=("hook0", creder.said, dates), val=creder)
+    baser.enqueue(baser.recv, keys=("audit", creder.said, dates), val=creder)
+    assert baser.getSubscriberCounts("hook0") == dict(recv=1, revk=1, ack=0)
+    assert baser.getSubscriberCounts("audit") == dict(recv=1, revk=0, ack=0)
+
+    assert baser.unqueue(baser.recv, keys=("hook0", creder.said, dates))
+    assert not baser.unqueue(baser.recv, keys=("hook0", creder.said, dates))
+    baser.enqueue(baser.ack, keys=("hook0", creder.said), val=creder)
+    assert baser.getSubscriberCounts("hook0") == dict(recv=0, revk=1, ack=1)
+
+    # counters are rebuilt on opening a database written before the queues were counted
+    baser.qcnt.trim()
+    baser.close()
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    assert baser.getSubscriberCounts("hook0") == dict(recv=0, revk=1, ack=1)
+    assert baser.getSubscriberCounts("audit") == dict(recv=1, revk=0, ack=0)
+
+    baser.close(clear=True)
+
+
+def test_rekey_queues(tmp_path):
+    """
+    Test moving the delivery queues of a database written before subscribers to the default subscriber
+    """
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    creder = proving.credential(schema="ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY",
+                                issuer="EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl",
+                                data=dict(LEI="254900OPPU84GM83MG36"))
+    dates = "1AAG2021-01-01T00c00c00d000000p00c00"
+
+    # the previous release keyed recv and revk by (said, dater) and ack by said, without counters
+    baser.recv.pin(keys=(creder.said, dates), val=creder)
+    baser.revk.pin(keys=(creder.said, dates), val=creder)
+    baser.ack.pin(keys=(creder.said,), val=creder)
+    baser.close()
+
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    assert [keys for keys, _ in baser.recv.getItemIter()] == [("hook0", creder.said, dates)]
+    assert [keys for keys, _ in baser.revk.getItemIter()] == [("hook0", creder.said, dates)]
+    assert [keys for keys, _ in baser.ack.getItemIter()] == [("hook0", creder.said)]
+    assert baser.ack.get(keys=("hook0", creder.said)).said == creder.said
+    assert baser.getSubscriberCounts("hook0") == dict(recv=1, revk=1, ack=1)
+
+    assert baser.rekey() == 0
+    baser.close(clear=True)
+
+
+def test_event_log(tmp_path):
+    """
+    Test appending to and iterating over the event log
+    """
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    assert baser.lastEvent == 0
+    assert list(baser.getEventIter()) == []
+
+    for said in ("said0", "said1", "said2"):
+        baser.appendEvent(dict(action="iss", data=dict(credential=said)))
+    assert baser.appendEvent(dict(action="rev", data=dict(credential="said0"))) == 4
+
+    events = list(baser.getEventIter())
+    assert [sn for sn, _ in events] == [1, 2, 3, 4]
+    assert events[3][1] == '{"action": "rev", "data": {"credential": "said0"}}'
+    assert [sn for sn, _ in baser.getEventIter(sn=3)] == [3, 4]
+    assert list(baser.getEventIter(sn=5)) == []
+
+    # sequence numbers continue after reopening
+    baser.close()
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    assert baser.lastEvent == 4
+    assert baser.appendEvent(dict(action="iss")) == 5
+
+    baser.close(clear=True)
+
+
+def test_quarantine():
+    """
+    Test counting failed notice processing attempts and quarantining notices
+    """
+    baser = basing.CueBaser(name="test_cb", temp=True)
+    rid = "EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm"
+
+    assert baser.failed(rid) == 1
+    assert baser.failed(rid) == 2
+    baser.quarantine(rid, dict(a=dict(r="/exn/ipex/grant")), error="KeyError: 'e'", attempts=2)
+    assert baser.tries.get(keys=(rid,)) is None
+
+    quarantined = json.loads(baser.quar.get(keys=(rid,)))
+    assert quarantined["notice"] == dict(a=dict(r="/exn/ipex/grant"))
+    assert quarantined["error"] == "KeyError: 'e'"
+    assert quarantined["attempts"] == 2
+    assert baser.getCounts()["quarantine"] == 1
+
+    baser.close(clear=True)
+
+
+def test_get_item_iter_after():
+    """
+    Test resuming iteration over a sub database after a key
+    """
+    baser = basing.CueBaser(name="test_cb", temp=True)
+    for rid in ("a", "b", "c"):
+        baser.quar.pin(keys=(rid, "x"), val=rid)
+
+    assert [keys for keys, _ in basing.getItemIterAfter(baser.quar)] == [("a", "x"), ("b", "x"), ("c", "x")]
+    assert list(basing.getItemIterAfter(baser.quar, after="a.x")) == [(("b", "x"), b"b"), (("c", "x"), b"c")]
+    assert [keys for keys, _ in basing.getItemIterAfter(baser.quar, after="b")] == [("b", "x"), ("c", "x")]
+    assert list(basing.getItemIterAfter(baser.quar, after="c.x")) == []
+
+    with baser.batch():  # joins the batch transaction
+        baser.quar.rem(keys=("a", "x"))
+        assert [keys for keys, _ in basing.getItemIterAfter(baser.quar)] == [("b", "x"), ("c", "x")]
+
+    baser.close(clear=True)
+
+
+def test_batch():
+    """
+    Test committing the writes of a batch together
+    """
+    baser = basing.CueBaser(name="test_cb", temp=True)
+    said = "EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_"
+    prefixer = coring.Prefixer(qb64="EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl")
+
+    with baser.batch() as txn:
+        assert baser.txn is txn
+        baser.snd.pin(keys=(said,), val=prefixer)
+        baser.iss.pin(keys=(said,), val=coring.Dater())
+        assert baser.snd.get(keys=(said,)).qb64 == prefixer.qb64  # reads see the writes of the batch
+        with baser.batch():  # joins the outer batch
+            baser.appendEvent(dict(action="iss"))
+        assert baser.depth(baser.iss) == 1
+        assert [sn for sn, _ in baser.getEventIter()] == [1]
+    assert baser.txn is None
+    assert baser.snd.get(keys=(said,)).qb64 == prefixer.qb64
+    assert baser.lastEvent == 1
+
+    # a batch that raises is rolled back as a whole
+    with pytest.raises(ValueError):
+        with baser.batch():
+            baser.iss.rem(keys=(said,))
+            baser.appendEvent(dict(action="iss"))
+            raise ValueError("failed pass")
+    assert baser.iss.get(keys=(said,)) is not None
+    assert baser.lastEvent == 1
+    assert baser.appendEvent(dict(action="iss")) == 2
+
+    # a savepoint that raises only undoes its own writes, the rest of the batch commits
+    with baser.batch():
+        baser.iss.rem(keys=(said,))
+        with pytest.raises(KeyError):
+            with baser.savepoint():
+                baser.snd.rem(keys=(said,))
+                baser.appendEvent(dict(action="iss"))
+                raise KeyError("regk")
+        assert baser.snd.get(keys=(said,)) is not None
+        assert baser.lastEvent == 2
+        with baser.savepoint():
+            baser.appendEvent(dict(action="rev"))
+    assert baser.iss.get(keys=(said,)) is None
+    assert baser.snd.get(keys=(said,)) is not None
+    assert [sn for sn, _ in baser.getEventIter()] == [1, 2, 3]
+
+    baser.close(clear=True)
+
+
+def test_durability(tmp_path):
+    """
+    Test durability tiers and checkpoints
+    """
+    with pytest.raises(ValueError):
+        basing.CueBaser(name="test_cb", temp=True, durability="sometimes")
+
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True,
+                            durability=basing.Durability.checkpoint)
+    assert isinstance(baser.env, lmdb.Environment)
+    assert baser.env.flags()["sync"] is False
+    baser.appendEvent(dict(action="iss"))
+
+    doist = doing.Doist(tock=0.03125, limit=0.1, doers=[basing.CheckpointDoer(cdb=baser, interval=0.03125)])
+    doist.do()
+    baser.close()
+
+    baser = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    assert baser.env.flags()["sync"] is True
+    assert baser.lastEvent == 1
+    baser.close(clear=True)
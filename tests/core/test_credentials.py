@@ -0,0 +1,136 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.credentials module
+
+Testing revocation cue processing and credential status lookups
+"""
+import json
+
+import falcon
+from falcon import testing
+from hio.help import decking
+from keri.vc import proving
+from keri.vdr import eventing as veventing, viring
+
+from sally.core import basing
+from sally.core.credentials import CredentialStatusEnd, StatusCache, TeveryCuery
+from sally.core.scheming import LE_SCHEMA
+
+
+def test_tevery_cuery():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    reger = viring.Reger(name="test_reger", temp=True)
+    issuer = "EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl"
+    regk = "EB-u4VAF7A7_GR8PXJoAVHv5X9vjtXew8Yo6Z3w9mQUQ"
+
+    saids = []
+    for i in range(5):
+        creder = proving.credential(schema=LE_SCHEMA, issuer=issuer, data=dict(LEI=f"25490000000000000{i:03d}"),
+                                    status=regk)
+        reger.creds.pin(keys=(creder.said,), val=creder)
+        saids.append(creder.said)
+
+    unknown = "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"
+    cues = decking.Deck()
+    for said in saids[:2] + [unknown] + saids[2:]:
+        serder = veventing.revoke(vcdig=said, regk=regk, dig=said)
+        cues.append(dict(kin="revoked", serder=serder))
+    cues.append(dict(kin="saved", creder=creder))
+
+    tenant = basing.CueBaser(name="test_tenant", temp=True)
+    tenant.recordVerdict(saids[0], valid=True)
+    tenant.recordVerdict(saids[1], valid=True)
+    cdb.recordVerdict(saids[1], valid=True)
+    tc = TeveryCuery(cdb=cdb, reger=reger, cues=cues, batch=4, tenants=[tenant])
+    assert tc.processCues() == 4  # the unknown credential is skipped, saids[1] is recorded twice
+    assert len(cues) == 3
+    assert tc.processCues() == 2
+    assert len(cues) == 0
+
+    for said in saids[1:]:
+        assert cdb.snd.get(keys=(said,)).qb64 == issuer
+        assert cdb.rev.get(keys=(said,)) is not None
+    assert cdb.rev.get(keys=(unknown,)) is None
+
+    # the primary records every revocation, verdict or not, unless only tenants verified the credential
+    assert cdb.rev.get(keys=(saids[0],)) is None
+    assert cdb.snd.get(keys=(saids[0],)) is None
+    assert tenant.rev.get(keys=(saids[0],)) is not None
+    assert tenant.snd.get(keys=(saids[0],)).qb64 == issuer
+    assert tenant.rev.get(keys=(saids[1],)) is not None
+    assert tenant.rev.get(keys=(saids[2],)) is None
+    tenant.close(clear=True)
+
+    reger.close(clear=True)
+    cdb.close(clear=True)
+
+
+class Tever:
+    """ TEL of a registry that reports every credential with the state of its last event """
+
+    class State:
+        def __init__(self, et, s):
+            self.et = et
+            self.s = s
+            self.d = "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"
+            self.dt = "2021-01-01T00:00:00.000000+00:00"
+
+    def __init__(self):
+        self.et = "iss"
+        self.resolved = 0
+
+    def vcState(self, vci):
+        self.resolved += 1
+        return self.State(et=self.et, s="0" if self.et == "iss" else "1")
+
+
+def test_credential_status():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    reger = viring.Reger(name="test_reger", temp=True)
+    issuer = "EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl"
+    regk = "EB-u4VAF7A7_GR8PXJoAVHv5X9vjtXew8Yo6Z3w9mQUQ"
+
+    creder = proving.credential(schema=LE_SCHEMA, issuer=issuer, data=dict(LEI="254900000000000000"), status=regk)
+    reger.creds.pin(keys=(creder.said,), val=creder)
+    tever = Tever()
+    reger.tevers[regk] = tever
+
+    cache = StatusCache(reger=reger, size=1)
+    assert cache.state(creder.said)["et"] == "iss"
+    assert cache.state(creder.said)["et"] == "iss"
+    assert tever.resolved == 1
+    assert cache.state("EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH") is None
+
+    app = falcon.App()
+    app.add_route("/credentials/{said}/status", CredentialStatusEnd(cdb=cdb, cache=cache))
+    client = testing.TestClient(app)
+
+    rep = client.simulate_get("/credentials/EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH/status")
+    assert rep.status_code == 404
+
+    cdb.recordVerdict(creder.said, valid=True)
+    rep = client.simulate_get(f"/credentials/{creder.said}/status")
+    assert rep.status_code == 200
+    assert rep.json["verdict"]["valid"] is True
+    assert rep.json["status"]["et"] == "iss"
+    assert rep.json["revoked"] is False
+    etag = rep.headers["ETag"]
+
+    rep = client.simulate_get(f"/credentials/{creder.said}/status", headers={"If-None-Match": etag})
+    assert rep.status_code == 304
+    assert tever.resolved == 1
+
+    # the revocation cue invalidates the cached state so the next lookup sees the revocation
+    tever.et = "rev"
+    cues = decking.Deck([dict(kin="revoked", serder=veventing.revoke(vcdig=creder.said, regk=regk, dig=creder.said))])
+    TeveryCuery(cdb=cdb, reger=reger, cues=cues, cache=cache).processCues()
+
+    rep = client.simulate_get(f"/credentials/{creder.said}/status", headers={"If-None-Match": etag})
+    assert rep.status_code == 200
+    assert rep.json["revoked"] is True
+    assert rep.headers["ETag"] != etag
+    assert json.loads(cdb.vrdt.get(keys=(creder.said,)))["valid"] is True
+
+    reger.close(clear=True)
+    cdb.close(clear=True)
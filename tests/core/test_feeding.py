@@ -0,0 +1,58 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.feeding module
+
+Testing the Server-Sent Events feed of the event log
+"""
+import falcon
+import pytest
+from falcon import testing
+
+from sally.core import basing, feeding
+
+
+def test_event_iterable():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    for said in ("said0", "said1", "said2"):
+        cdb.appendEvent(dict(action="iss", data=dict(credential=said)))
+
+    events = iter(feeding.EventIterable(cdb=cdb, sn=2, retry=1000, batch=1))
+    assert next(events) == b"retry: 1000\n\n"
+    assert next(events) == (b'id: 2\nevent: iss\ndata: {"action": "iss", "data": {"credential": "said1"}}\n\n')
+    assert next(events).startswith(b"id: 3\nevent: iss\n")
+    assert next(events) == b""  # caught up
+
+    cdb.appendEvent(dict(action="rev", data=dict(credential="said0")))
+    assert next(events).startswith(b"id: 4\nevent: rev\n")
+
+    # stream ends once idle for timeout seconds
+    events = iter(feeding.EventIterable(cdb=cdb, sn=5, timeout=0.0))
+    assert next(events) == b"retry: 5000\n\n"
+    with pytest.raises(StopIteration):
+        next(events)
+
+    cdb.close(clear=True)
+
+
+def test_events_end():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    for said in ("said0", "said1"):
+        cdb.appendEvent(dict(action="iss", data=dict(credential=said)))
+
+    end = feeding.EventsEnd(cdb=cdb, timeout=0.0)
+    app = falcon.App()
+    app.add_route("/events", end)
+    client = testing.TestClient(app)
+
+    result = client.simulate_get("/events", headers={"Last-Event-ID": "1"})
+    assert result.status == falcon.HTTP_200
+    assert result.headers["Content-Type"] == "text/event-stream"
+    assert result.headers["Cache-Control"] == "no-cache"
+    assert result.text.startswith("retry: 5000\n\nid: 2\nevent: iss\n")
+    assert "id: 1\n" not in result.text
+
+    result = client.simulate_get("/events", headers={"Last-Event-ID": "one"})
+    assert result.status == falcon.HTTP_400
+
+    cdb.close(clear=True)
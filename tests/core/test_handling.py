@@ -5,9 +5,11 @@ sally.core.handling module
 
 Handling support
 """
+import json
 import time
 
 import falcon
+import pytest
 from hio.base import doing, tyming
 from hio.core import http
 from hio.help import decking
@@ -18,7 +20,8 @@ from keri.peer import exchanging
 from keri.vc import protocoling
 from keri.vdr import eventing as veventing, viring
 from keri.vdr import verifying
-from sally.core import handling, basing, httping
+from sally.core import admitting, handling, basing, httping, scheming, sinking
+from sally.core.scheming import QVI_SCHEMA
 
 import issuing
 
@@ -46,7 +49,7 @@ def test_presentation_handler(seeder, mockHelpingNowUTC):
         vry = verifying.Verifier(hby=hby, reger=tvy.reger, expiry=10000000)
         parser = parsing.Parser(kvy=kvy, tvy=tvy, vry=vry, exc=exc)
 
-        doers = handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=parser)
+        doers = handling.loadHandlers(cdb=cdb, hby=hby, notifier=notifier, parser=parser, reger=reger)
 
         msgs = bytearray()
         for msg in issr.qviHab.db.clonePreIter(pre=issr.qviHab.pre):
@@ -80,6 +83,134 @@ def test_presentation_handler(seeder, mockHelpingNowUTC):
         assert dater is not None
         assert dater.datetime == helping.fromIso8601("2021-01-01T00:00:00.000000+00:00")
 
+        # presenting the same credential again skips parsing the embeds already accepted, the issuance and
+        # credential are still escrowed waiting for the registry inception
+        handler = doers[0]
+        exn, _ = exchanging.cloneMessage(hby, said=grant.said)
+        embeds = exn.ked['e']
+        assert handler.known("anc", embeds["anc"])
+        assert not handler.known("iss", embeds["iss"])
+        assert not handler.known("acdc", embeds["acdc"])
+
+        parsed = []
+        parser.parseOne = lambda ims: parsed.append(bytes(ims))
+        handler.processGrant(grant.said)
+        assert len(parsed) == 2
+        assert parsed[0].startswith(coring.Sadder(ked=embeds["iss"]).raw)
+        assert parsed[1].startswith(coring.Sadder(ked=embeds["acdc"]).raw)
+        assert cdb.iss.get(keys=(issr.lesaid,)) is not None
+
+        # grants addressed to a hosted tenant are escrowed in the database of the tenant
+        tenant = basing.CueBaser(name="test_tenant", temp=True)
+        handler.tenants = {issr.leeHab.pre: tenant}
+        cdb.iss.rem(keys=(issr.lesaid,))
+        handler.processGrant(grant.said)
+        assert tenant.iss.get(keys=(issr.lesaid,)) is not None
+        assert cdb.iss.get(keys=(issr.lesaid,)) is None
+        tenant.close(clear=True)
+
+        # grants of credentials with unsupported schemas are rejected before parsing
+        assert handler.screen(grant.said) is None  # no screener
+        handler.screener = scheming.Screener()
+        assert handler.screen(grant.said) is None
+        handler.screener = scheming.Screener(schemas={QVI_SCHEMA: dict(name="QVI", kind="qvi")})
+        assert handler.screen(grant.said) == "schema"
+
+
+def test_poison_notice_quarantine():
+    salt = signing.Salter(raw=b'abcdef0123456789').qb64
+    with habbing.openHby(name="test", base="test", salt=salt) as hby:
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        notifier = notifying.Notifier(hby=hby)
+        parser = parsing.Parser()
+        handler = handling.PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser,
+                                                    attempts=2)
+
+        # grant exn that was never received
+        said = "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"
+        notifier.add(attrs={"r": "/exn/ipex/grant", "d": said})
+        ((_, rid), notice), = notifier.noter.notes.getItemIter()
+
+        handler.processNotes()
+        assert cdb.tries.get(keys=(rid,)) == "1"
+        assert len(list(notifier.noter.notes.getItemIter())) == 1  # still queued for another attempt
+
+        handler.processNotes()
+        assert list(notifier.noter.notes.getItemIter()) == []
+        assert cdb.tries.get(keys=(rid,)) is None
+        quarantined = json.loads(cdb.quar.get(keys=(rid,)))
+        assert quarantined["notice"]["a"]["d"] == said
+        assert quarantined["attempts"] == 2
+        assert quarantined["error"] == f"ValidationError: grant {said} not found"
+        assert cdb.getCounts()["quarantine"] == 1
+
+        cdb.close(clear=True)
+
+
+def test_rate_limited_notice():
+    salt = signing.Salter(raw=b'abcdef0123456789').qb64
+    with habbing.openHby(name="test", base="test", salt=salt) as hby:
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        notifier = notifying.Notifier(hby=hby)
+        parser = parsing.Parser()
+        handler = handling.PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser)
+
+        said = "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"
+        notifier.add(attrs={"r": "/exn/ipex/grant", "d": said})
+        notifier.add(attrs={"r": "/exn/ipex/apply", "d": "0"})
+
+        def queued():
+            return [notice.attrs["d"] for _, notice in notifier.noter.notes.getItemIter()]
+
+        # a grant over the rate limit of its sender stays queued for a later pass, the notices behind it go ahead
+        handler.admit = lambda _: admitting.Decisions.limit
+        handler.processNotes()
+        assert queued() == [said]
+        assert cdb.tries.get(keys=(said,)) is None
+        handler.processNotes()
+        assert queued() == [said]
+
+        # and is only dropped under the reject policy
+        handler.admit = lambda _: admitting.Decisions.reject
+        handler.processNotes()
+        assert queued() == []
+
+        cdb.close(clear=True)
+
+
+def test_notice_budget():
+    salt = signing.Salter(raw=b'abcdef0123456789').qb64
+    with habbing.openHby(name="test", base="test", salt=salt) as hby:
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        notifier = notifying.Notifier(hby=hby)
+        parser = parsing.Parser()
+        handler = handling.PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser,
+                                                    attempts=5, budget=2)
+
+        for i in range(5):
+            notifier.add(attrs={"r": "/exn/ipex/apply", "d": f"{i}"})
+        notifier.add(attrs={"r": "/exn/ipex/grant", "d": "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"})
+
+        def queued():
+            return [notice.attrs["d"] for _, notice in notifier.noter.notes.getItemIter()]
+
+        handler.processNotes()
+        assert queued() == ["2", "3", "4", "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"]
+        assert cdb.crsr.get(keys=(handler.CursorNotes,)) is not None
+
+        # a new handler resumes from the persisted cursor
+        handler = handling.PresentationProofHandler(cdb=cdb, hby=hby, notifier=notifier, parser=parser,
+                                                    attempts=5, budget=2)
+        handler.processNotes()
+        assert queued() == ["4", "EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"]
+
+        # the failing grant is left for its next attempt and the cursor wraps around to the first notice
+        handler.processNotes()
+        assert queued() == ["EElymNmgs1u0mSaoCeOtSsNOROLuqOz103V3-4E-ClXH"]
+        assert cdb.crsr.get(keys=(handler.CursorNotes,)) is None
+
+        cdb.close(clear=True)
+
 
 def test_communicator(seeder, mockHelpingNowUTC):
     url = "http://localhost:5999/"
@@ -117,7 +248,7 @@ def test_communicator(seeder, mockHelpingNowUTC):
 
         prefixer = coring.Prefixer(qb64=creder.issuer)
         assert creder.said == issr.lesaid
-        assert creder.schema == handling.LE_SCHEMA
+        assert creder.schema == scheming.LE_SCHEMA
         assert prefixer.qb64 == issr.qviHab.pre
 
         # Replicate a presentation of the LE credential
@@ -137,10 +268,11 @@ def test_communicator(seeder, mockHelpingNowUTC):
         req = msgs.popleft()
         assert req.headers["SALLY-RESOURCE"] == creder.schema
         assert req.headers["SIGNATURE-INPUT"] == ('sig0=("sally-resource" "@method" "@path" '
-                                                  '"sally-timestamp");created=1609459200;keyid="ILWsN7_dmckaGB4kS-S50PB'
-                                                  'nUi1KzvFq5Tkg1DoIa6s=";alg="ed25519"')
+                                                  '"sally-timestamp" "sally-sequence");created=1609459200;keyid="ILWs'
+                                                  'N7_dmckaGB4kS-S50PBnUi1KzvFq5Tkg1DoIa6s=";alg="ed25519"')
         assert "SIGNATURE" in req.headers
         assert "SALLY-TIMESTAMP" in req.headers
+        assert req.headers["SALLY-SEQUENCE"] == "1"
         data = req.get_media()
         assert data == {'action': 'iss',
                         'actor': 'EOwXzTKWgsmCDVJwMS4VUJWX-m-oKx9d8VDyaRNY6mMZ',
@@ -166,7 +298,7 @@ def test_communicator(seeder, mockHelpingNowUTC):
 
         prefixer = coring.Prefixer(qb64=creder.issuer)
         assert creder.said == issr.oorsaid
-        assert creder.schema == handling.OOR_SCHEMA
+        assert creder.schema == scheming.OOR_SCHEMA
         assert prefixer.qb64 == issr.qviHab.pre
 
         # Replicate a presentation of the OOR credential
@@ -186,10 +318,11 @@ def test_communicator(seeder, mockHelpingNowUTC):
         req = msgs.popleft()
         assert req.headers["SALLY-RESOURCE"] == creder.schema
         assert req.headers["SIGNATURE-INPUT"] == ('sig0=("sally-resource" "@method" "@path" '
-                                                  '"sally-timestamp");created=1609459200;keyid="ILWsN7_dmckaGB4kS-S50PB'
-                                                  'nUi1KzvFq5Tkg1DoIa6s=";alg="ed25519"')
+                                                  '"sally-timestamp" "sally-sequence");created=1609459200;keyid="ILWs'
+                                                  'N7_dmckaGB4kS-S50PBnUi1KzvFq5Tkg1DoIa6s=";alg="ed25519"')
         assert "SIGNATURE" in req.headers
         assert "SALLY-TIMESTAMP" in req.headers
+        assert req.headers["SALLY-SEQUENCE"] == "1"
 
         data = req.get_media()
         assert data == {'action': 'iss',
@@ -208,6 +341,138 @@ def test_communicator(seeder, mockHelpingNowUTC):
                                  'type': 'OOR'}}
 
 
+def test_communicator_fanout(seeder, mockHelpingNowUTC, tmp_path):
+    url = "http://localhost:5999/"
+    salt = b'abcdef0123456789'
+    root = "EID5n0m83IVIra_VZhSpov4RG7D9gxBnZeNPTlJK40TM"
+
+    with habbing.openHab(name="test", base="test", salt=salt, temp=True) as (hby, hab):
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        reger = viring.Reger(temp=True)
+        kvy = eventing.Kevery(db=hby.db)
+        tvy = veventing.Tevery(db=hby.db, reger=reger)
+        vry = verifying.Verifier(hby=hby, reger=tvy.reger, expiry=10000000)
+        msgs = decking.Deck()
+        httpDoer = launch_mock_server(msgs=msgs)
+
+        spool = tmp_path / "analytics.jsonl"
+        audit = tmp_path / "audit.jsonl"
+        subscribers = sinking.openSubscribers(hab, hooks=[url], subscriptions=[
+            dict(name="analytics", url=f"file://{spool}", schemas=["LE"]),
+            dict(name="audit", url=f"file://{audit}", actions=["rev"]),
+        ])
+        comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=tvy.reger, auth=root, retry=0.25,
+                                      subscribers=subscribers)
+
+        seeder.load_schema(hby.db)
+
+        issr = issuing.CredentialIssuer()
+        issr.issue_legal_entity_vlei(seeder)
+
+        ims = issuing.share_credential(issr.leeHab, issr.leeRgy, issr.lesaid)
+        parsing.Parser().parse(ims=ims, kvy=kvy, tvy=tvy, vry=vry)
+
+        while not tvy.reger.saved.get(keys=(issr.lesaid,)):
+            kvy.processEscrows()
+            tvy.processEscrows()
+            vry.processEscrows()
+
+        creder = tvy.reger.creds.get(keys=(issr.lesaid,))
+        cdb.snd.pin(keys=(creder.said,), val=coring.Prefixer(qb64=creder.issuer))
+        cdb.iss.pin(keys=(creder.said,), val=coring.Dater())
+
+        built = []
+        payload = comms.payload
+        comms.payload = lambda action, creder: built.append(action) or payload(action, creder)
+
+        doist = doing.Doist(limit=5.0, tock=0.25)
+        doist.do(doers=[httpDoer, comms])
+
+        # the payload was built once when it was logged, each delivery reuses the logged event
+        assert built == ["iss"]
+
+        # the presentation was verified once and delivered to the web hook and the LE subscriber only
+        assert len(msgs) == 1
+        assert msgs.popleft().get_media()["data"]["credential"] == creder.said
+        events = [json.loads(line) for line in spool.read_text().splitlines()]
+        assert [event["said"] for event in events] == [creder.said]
+        assert [event["sequence"] for event in events] == [1]
+        assert cdb.seqs.get(keys=("analytics", creder.said)) == "1"
+        assert cdb.head("analytics", creder.said) is None
+        assert not audit.exists()
+
+        # logged once however many subscribers it was delivered to
+        assert [(sn, json.loads(raw)["said"]) for sn, raw in cdb.getEventIter()] == [(1, creder.said)]
+
+        # indexed once for the presentation history however many subscribers acknowledged it
+        lei = creder.attrib["LEI"]
+        assert [record["said"] for _, record in cdb.getPresentationIter(field="lei", value=lei)] == [creder.said]
+        assert [record["said"] for _, record in cdb.getPresentationIter()] == [creder.said]
+
+        assert cdb.getSubscriberCounts("hook0") == dict(recv=0, revk=0, ack=0)
+        assert cdb.getSubscriberCounts("analytics") == dict(recv=0, revk=0, ack=0)
+        assert cdb.iss.get(keys=(creder.said,)) is None
+
+
+def test_communicator_interval():
+    salt = b'abcdef0123456789'
+    root = "EID5n0m83IVIra_VZhSpov4RG7D9gxBnZeNPTlJK40TM"
+
+    with habbing.openHab(name="test", base="test", salt=salt, temp=True) as (hby, hab):
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        reger = viring.Reger(temp=True)
+
+        # passes run every interval, apart from the retry delay of failing subscribers
+        comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, hook="http://localhost:5999/",
+                                      auth=root, retry=10, interval=1.0)
+        assert comms.interval == 1.0
+
+        # a latency target the passes cannot meet is refused
+        with pytest.raises(ValueError):
+            handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, hook="http://localhost:5999/",
+                                  auth=root, interval=10.0)
+        lanes = dict(rev=dict(weight=4, target=10.0), iss=dict(weight=1))
+        with pytest.raises(ValueError):
+            handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, hook="http://localhost:5999/",
+                                  auth=root, lanes=lanes, interval=10.0)
+
+        cdb.close(clear=True)
+
+
+def test_escrow_item_isolation():
+    salt = b'abcdef0123456789'
+    root = "EID5n0m83IVIra_VZhSpov4RG7D9gxBnZeNPTlJK40TM"
+    bad = "EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_"
+    stale = "EIbjVgfyrIj_jVjpgZXu2D-FFwWIc-pCFWnNd3F_vrD2"
+
+    with habbing.openHab(name="test", base="test", salt=salt, temp=True) as (hby, hab):
+        cdb = basing.CueBaser(name="test_cb", temp=True)
+        reger = viring.Reger(temp=True)
+        comms = handling.Communicator(hby=hby, hab=hab, cdb=cdb, reger=reger, hook="http://localhost:5999/",
+                                      auth=root)
+
+        # a presentation that keeps raising, such as for an unknown registry, only fails itself
+        process = comms.processPresentation
+
+        def processPresentation(said, dater):
+            if said == bad:
+                cdb.recordVerdict(said, valid=True)
+                raise KeyError("regk")
+            return process(said, dater)
+
+        comms.processPresentation = processPresentation
+        cdb.iss.pin(keys=(bad,), val=coring.Dater())
+        cdb.iss.pin(keys=(stale,), val=coring.Dater(dts="2021-01-01T00:00:00.000000+00:00"))
+
+        comms.processEscrows()
+        assert cdb.iss.get(keys=(bad,)) is not None  # retried on the next pass
+        assert cdb.vrdt.get(keys=(bad,)) is None  # its writes are undone
+        assert cdb.iss.get(keys=(stale,)) is None  # the timed out presentation is still removed
+
+        cdb.close(clear=True)
+        reger.close(clear=True)
+
+
 def launch_mock_server(port=5999, msgs=None):
     app = falcon.App(
         middleware=falcon.CORSMiddleware(
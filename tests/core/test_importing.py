@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.importing module
+
+Testing bulk CESR import
+"""
+import pytest
+from keri.app import habbing
+from keri.core import signing
+from keri.vdr import viring
+
+from sally.core import importing
+
+import issuing
+
+
+def test_importer(seeder, mockHelpingNowUTC, tmp_path):
+    salt = signing.Salter(raw=b'abcdef0123456789').qb64
+    with habbing.openHby(name="test", base="test", salt=salt) as hby:
+        seeder.load_schema(hby.db)
+        issr = issuing.CredentialIssuer()
+        issr.issue_legal_entity_vlei(seeder)
+        grant, atc = issr.grant_legal_entity_vlei()
+
+        kel = bytearray()
+        largest = count = 0
+        for msg in issr.qviHab.db.clonePreIter(pre=issr.qviHab.pre):
+            kel.extend(msg)
+            largest = max(largest, len(msg))
+            count += 1
+
+        # whole messages are framed from their version string and attachments
+        stream = bytes(grant.raw + atc + kel)
+        end = importing.frame(stream, eof=True)
+        assert end == len(grant.raw + atc)
+        assert importing.frame(stream[:end]) is None  # the attachments may continue in the bytes still to come
+        assert importing.frame(stream[:len(grant.raw) - 10], eof=True) is None
+        assert importing.frame(stream, start=end) == end + len(next(issr.qviHab.db.clonePreIter(pre=issr.qviHab.pre)))
+        with pytest.raises(ValueError):
+            importing.frame(b"-AAB" + stream, eof=True)
+
+        archive = tmp_path / "archive"
+        (archive / "kels").mkdir(parents=True)
+        (archive / "kels" / "qvi.cesr").write_bytes(bytes(kel))
+        (archive / "grants.cesr").write_bytes(grant.raw + atc)
+        (archive / "empty.cesr").write_bytes(b"")
+        assert importing.Importer.paths(str(archive)) == [str(archive / "empty.cesr"), str(archive / "grants.cesr"),
+                                                          str(archive / "kels" / "qvi.cesr")]
+        with pytest.raises(ValueError):
+            importing.Importer.paths(str(tmp_path / "missing"))
+
+        reger = viring.Reger(temp=True)
+        reports = []
+        # a window smaller than the KEL so it is parsed over several refills
+        importer = importing.Importer(hby=hby, reger=reger, chunk=largest + 1, report=reports.append)
+        assert len(kel) > 2 * importer.chunk
+        progress = importer.importAll(str(archive / "kels"))
+        assert progress["files"] == 1
+        assert progress["bytes"] == len(kel)
+        assert progress["messages"] == count
+        assert progress["truncated"] == 0
+        assert issr.qviHab.pre in hby.kevers
+        assert reports[-1] is progress
+
+        # the grant is parsed before the KEL of its sender and is accepted from the escrow once all files are parsed
+        progress = importer.importAll(str(archive))
+        assert progress["files"] == 3  # counted for this import only
+        assert progress["grants"] == 1
+
+        # a stream cut off in the middle of a message is dropped
+        (tmp_path / "cut.cesr").write_bytes(grant.raw[:-10])
+        importer.importFile(str(tmp_path / "cut.cesr"))
+        assert importer.progress["truncated"] == 1
+
+        reger.close(clear=True)
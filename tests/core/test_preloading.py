@@ -0,0 +1,60 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.preloading module
+
+Testing OOBI preload and the readiness gate
+"""
+import falcon
+from falcon import testing
+from keri.app import habbing
+from keri.app.oobiing import Result
+from keri.db import basing as kbasing
+
+from sally.core import monitoring, preloading
+from sally.core.scheming import LE_SCHEMA, QVI_SCHEMA
+
+
+def test_preloader(seeder):
+    with habbing.openHab(name="test", base="test", temp=True) as (hby, hab):
+        seeder.load_schema(hby.db)
+        unknown = "EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl"
+        urls = [f"http://127.0.0.1:7723/oobi/{QVI_SCHEMA}",  # schema in the keystore
+                f"http://127.0.0.1:5642/oobi/{hab.pre}/controller",  # KEL in the keystore
+                f"http://127.0.0.1:5642/oobi/{unknown}/witness"]
+        for url in urls:
+            hby.db.oobis.pin(keys=(url,), val=kbasing.OobiRecord(date="2021-01-01T00:00:00.000000+00:00"))
+
+        metrics = monitoring.Metrics()
+        preloader = preloading.Preloader(hby=hby, metrics=metrics)
+        assert preloader.results["cached"] == 2
+        assert preloader.pending == {urls[2]}
+        assert [url for (url,), _ in hby.db.oobis.getItemIter()] == [urls[2]]
+        assert hby.db.roobi.get(keys=(urls[0],)).state == Result.resolved
+
+        assert preloader.recur(0.0) is False
+        hby.db.roobi.pin(keys=(urls[2],), val=kbasing.OobiRecord(date="2021-01-01T00:00:00.000000+00:00",
+                                                                 state=Result.failed))
+        assert preloader.recur(0.25) is True
+        assert metrics.get("sally_oobi_preload", result="failed") == 1
+        assert metrics.get("sally_oobi_preload", result="cached") == 2
+        assert metrics.get("sally_oobi_preload_seconds") >= 0.0
+
+        schema = "EIbjVgfyrIj_jVjpgZXu2D-FFwWIc-pCFWnNd3F_vrD2"  # never loaded
+        readiness = preloading.Readiness(hby=hby, schemas=[QVI_SCHEMA, LE_SCHEMA, schema], auths=["test", unknown],
+                                         metrics=metrics)
+        app = falcon.App()
+        app.add_route("/ready", preloading.ReadyEnd(readiness=readiness))
+        client = testing.TestClient(app)
+
+        rep = client.simulate_get("/ready")
+        assert rep.status_code == 503
+        assert rep.json == dict(ready=False, missing=dict(schemas=[schema], auths=[unknown]))
+        assert metrics.get("sally_ready") == 0
+
+        readiness.schemas = [QVI_SCHEMA, LE_SCHEMA]
+        readiness.auths = ["test", hab.pre]
+        rep = client.simulate_get("/ready")
+        assert rep.status_code == 200
+        assert rep.json == dict(ready=True, missing={})
+        assert metrics.get("sally_ready") == 1
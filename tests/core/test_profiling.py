@@ -0,0 +1,61 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.profiling module
+
+Testing runtime memory profiling
+"""
+import falcon
+from falcon import testing
+
+from sally.core import profiling
+
+
+def test_memory_profiler():
+    clients = dict()
+    profiler = profiling.MemoryProfiler(sizes={"clients": lambda: len(clients), "broken": lambda: 1 / 0})
+    app = falcon.App()
+    app.add_route("/admin/memory", profiling.MemoryEnd(profiler=profiler))
+    client = testing.TestClient(app)
+
+    rep = client.simulate_get("/admin/memory")
+    assert rep.status_code == 200
+    assert rep.json == dict(tracing=False, sizes=dict(clients=0, broken=None))
+
+    assert client.simulate_post("/admin/memory", json=dict(action="restart")).status_code == 400
+    assert client.simulate_post("/admin/memory", json=dict(action="start", frames=0)).status_code == 400
+    assert client.simulate_post("/admin/memory", json=dict(action="start", frames=65536)).status_code == 400
+    rep = client.simulate_post("/admin/memory", json=dict(action="start", frames=5))
+    assert rep.status_code == 200
+    assert rep.json == dict(tracing=True)
+
+    try:
+        rep = client.simulate_get("/admin/memory", params=dict(top=5, diff="true"))
+        assert rep.json["tracing"] is True
+        assert rep.json["current"] > 0
+        assert rep.json["peak"] >= rep.json["current"]
+        assert len(rep.json["top"]) <= 5
+        assert rep.json["diff"] is None  # no previous report
+
+        leak = [bytearray(1024) for _ in range(1000)]
+        clients.update({i: leak[i] for i in range(10)})
+        rep = client.simulate_get("/admin/memory", params=dict(top=5, diff="true"))
+        assert rep.json["sizes"]["clients"] == 10
+        grown = rep.json["diff"][0]
+        assert grown["site"].endswith(f"test_profiling.py:{leak_line()}")
+        assert grown["sizeDiff"] >= 1000 * 1024
+
+        assert client.simulate_get("/admin/memory", params=dict(key="traceback")).status_code == 400
+        assert client.simulate_get("/admin/memory", params=dict(top=0)).status_code == 400
+    finally:
+        rep = client.simulate_post("/admin/memory", json=dict(action="stop"))
+    assert rep.json == dict(tracing=False)
+    assert not profiler.tracing
+
+
+def leak_line():
+    """ Returns the line number of the allocations the test leaks """
+    with open(__file__) as f:
+        for number, line in enumerate(f, start=1):
+            if line.strip().startswith("leak = "):
+                return number
@@ -0,0 +1,91 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.querying module
+
+Testing the presentation history query endpoint
+"""
+import falcon
+from falcon import testing
+
+from sally.core import basing, querying
+from sally.core.scheming import LE_SCHEMA, QVI_SCHEMA
+
+
+def record(i, lei, holder, schema=LE_SCHEMA):
+    return dict(said=f"said{i}", schema=schema, issuer="issuer0", holder=holder, lei=lei,
+                dt=f"2024-01-0{i + 1}T00:00:00.000000+00:00")
+
+
+def test_presentation_indexes():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    cdb.indexPresentation(record(0, "LEI0", "holder0"))
+    cdb.indexPresentation(record(1, "LEI1", "holder1"))
+    cdb.indexPresentation(record(2, "LEI0", "holder2", schema=QVI_SCHEMA))
+    cdb.indexPresentation(record(2, "LEI0", "holder2", schema=QVI_SCHEMA))  # delivered to another subscriber
+    assert cdb.depth(cdb.pres) == 3
+    assert cdb.depth(cdb.pidx) == 12
+
+    assert [r["said"] for _, r in cdb.getPresentationIter()] == ["said0", "said1", "said2"]
+    assert [r["said"] for _, r in cdb.getPresentationIter(field="lei", value="LEI0")] == ["said0", "said2"]
+    assert [r["said"] for _, r in cdb.getPresentationIter(field="lei", value="LEI")] == []
+    assert [r["said"] for _, r in cdb.getPresentationIter(field="schema", value=LE_SCHEMA,
+                                                          since="2024-01-02T00:00:00.000000+00:00")] == ["said1"]
+    assert [r["said"] for _, r in cdb.getPresentationIter(until="2024-01-02T00:00:00.000000+00:00")] == [
+        "said0", "said1"]
+
+    key, _ = next(cdb.getPresentationIter(field="lei", value="LEI0"))
+    assert [r["said"] for _, r in cdb.getPresentationIter(field="lei", value="LEI0", after=key)] == ["said2"]
+
+    # several filters intersect their indexes
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(lei="LEI0", schema=LE_SCHEMA))] == [
+        "said0"]
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(issuer="issuer0", lei="LEI0"))] == [
+        "said0", "said2"]
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(lei="LEI1", holder="holder0"))] == []
+    key, _ = next(cdb.getPresentationMatchIter(filters=dict(issuer="issuer0", lei="LEI0")))
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(issuer="issuer0", lei="LEI0"),
+                                                               after=key)] == ["said2"]
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(issuer="issuer0", lei="LEI0"),
+                                                               until="2024-01-02T00:00:00.000000+00:00")] == ["said0"]
+    assert [r["said"] for _, r in cdb.getPresentationMatchIter(filters=dict(issuer="issuer0", schema=LE_SCHEMA),
+                                                               since="2024-01-02T00:00:00.000000+00:00")] == ["said1"]
+
+    cdb.close(clear=True)
+
+
+def test_presentations_end():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    for i in range(5):
+        cdb.indexPresentation(record(i, "LEI0" if i % 2 == 0 else "LEI1", f"holder{i}"))
+
+    app = falcon.App()
+    app.add_route("/presentations", querying.PresentationsEnd(cdb=cdb))
+    client = testing.TestClient(app)
+
+    result = client.simulate_get("/presentations", params=dict(lei="LEI0", limit="2"))
+    assert result.status == falcon.HTTP_200
+    assert [r["said"] for r in result.json["presentations"]] == ["said0", "said2"]
+    assert result.json["next"] is not None
+
+    result = client.simulate_get("/presentations", params=dict(lei="LEI0", limit="2", cursor=result.json["next"]))
+    assert [r["said"] for r in result.json["presentations"]] == ["said4"]
+    assert result.json["next"] is None
+
+    result = client.simulate_get("/presentations", params=dict(lei="LEI1", holder="holder3"))
+    assert [r["said"] for r in result.json["presentations"]] == ["said3"]
+
+    result = client.simulate_get("/presentations", params=dict(issuer="issuer0", lei="LEI0", limit="2"))
+    assert [r["said"] for r in result.json["presentations"]] == ["said0", "said2"]
+    result = client.simulate_get("/presentations", params=dict(issuer="issuer0", lei="LEI0", limit="2",
+                                                               cursor=result.json["next"]))
+    assert [r["said"] for r in result.json["presentations"]] == ["said4"]
+    assert result.json["next"] is None
+
+    result = client.simulate_get("/presentations", params=dict(since="2024-01-04", until="2024-01-05T00:00:00Z"))
+    assert [r["said"] for r in result.json["presentations"]] == ["said3", "said4"]
+
+    assert client.simulate_get("/presentations", params=dict(since="yesterday")).status == falcon.HTTP_400
+    assert client.simulate_get("/presentations", params=dict(limit="0")).status == falcon.HTTP_400
+
+    cdb.close(clear=True)
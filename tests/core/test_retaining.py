@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.retaining module
+
+Testing retention of the escrow database
+"""
+import datetime
+import json
+
+import pytest
+from keri.core import coring
+from keri.help import helping
+
+from sally.core import basing, monitoring, retaining
+
+
+def test_retainer():
+    cdb = basing.CueBaser(name="test_cb", temp=True)
+    metrics = monitoring.Metrics()
+    now = helping.nowUTC()
+    old = helping.toIso8601(now - datetime.timedelta(days=2))
+
+    for i in range(5):
+        cdb.appendEvent(dict(action="iss", timestamp=old if i < 3 else helping.toIso8601(now)))
+    for rid in ("rid0", "rid1", "rid2"):
+        cdb.quar.pin(keys=(rid,), val=json.dumps(dict(error="KeyError", dt=old if rid != "rid2" else
+                                                      helping.toIso8601(now))))
+    prefixer = coring.Prefixer(qb64="EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl")
+    for said in ("said0", "said1", "said2"):
+        cdb.snd.pin(keys=(said,), val=prefixer)
+    cdb.iss.pin(keys=("said1",), val=coring.Dater())  # still escrowed
+
+    retainer = retaining.Retainer(cdb=cdb, batch=2, metrics=metrics, policy=dict(
+        evts=dict(age=retaining.DAY, count=None),
+        quar=dict(age=retaining.DAY),
+        snd=dict()))
+
+    assert retainer.prune(now=now) == dict(evts=2, quar=2, snd=1)
+    assert [sn for sn, _ in cdb.getEventIter()] == [3, 4, 5]
+    assert cdb.crsr.get(keys=(retainer.CursorQuarantine,)) == "rid1"
+
+    assert retainer.prune(now=now) == dict(evts=1, quar=0, snd=1)
+    assert [sn for sn, _ in cdb.getEventIter()] == [4, 5]
+    assert [rid for (rid,), _ in cdb.quar.getItemIter()] == ["rid2"]
+    assert [said for (said,), _ in cdb.snd.getItemIter()] == ["said1"]
+    assert cdb.crsr.get(keys=(retainer.CursorQuarantine,)) is None  # wrapped around
+
+    # keep only the last event
+    retainer.policy = dict(evts=dict(age=None, count=1))
+    assert retainer.prune(now=now) == dict(evts=1)
+    assert [sn for sn, _ in cdb.getEventIter()] == [5]
+
+    assert metrics.get("sally_retention_removed_total", db="evts") == 4
+    assert metrics.get("sally_db_bytes") > 0
+    assert metrics.get("sally_db_free_bytes") is not None
+
+    with pytest.raises(ValueError):
+        retaining.Retainer(cdb=cdb, policy=dict(recv=dict(age=1)))
+
+    cdb.close(clear=True)
+
+
+def test_compaction(tmp_path):
+    cdb = basing.CueBaser(name="test_cb", headDirPath=str(tmp_path), reopen=True)
+    for i in range(2000):
+        cdb.appendEvent(dict(action="iss", data="x" * 200))
+    for sn in range(1, 2000):
+        cdb.evts.rem(keys=(f"{sn:032x}",))
+
+    usage = cdb.usage()
+    assert usage["free"] > 0
+    reclaimed = cdb.compact()
+    assert reclaimed > 0
+    assert cdb.usage()["size"] < usage["size"]
+    assert [sn for sn, _ in cdb.getEventIter()] == [2000]
+    assert cdb.lastEvent == 2000
+
+    metrics = monitoring.Metrics()
+    retaining.Retainer(cdb=cdb, policy=dict(), metrics=metrics).prune()
+    assert metrics.get("sally_db_reclaimed_bytes") == reclaimed
+
+    cdb.close(clear=True)
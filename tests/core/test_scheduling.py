@@ -0,0 +1,84 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.scheduling module
+
+Testing delivery lane scheduling
+"""
+import pytest
+
+from sally.core import monitoring, scheduling
+
+
+def run(scheduler, queues, budget, now):
+    """ Returns the actions of the items scheduled while budget deliveries may be started """
+    started = []
+    for lane, item in scheduler.rounds({action: iter(items) for action, items in queues.items()},
+                                       ready=lambda: len(started) < budget, now=now):
+        started.append(lane.action)
+    return started
+
+
+def test_weighted_round_robin():
+    scheduler = scheduling.Scheduler(name="hook0", lanes=dict(
+        rev=dict(weight=2, target=None),
+        iss=dict(weight=1, target=None)))
+
+    started = run(scheduler, dict(rev=range(3), iss=range(3)), budget=10, now=0.0)
+    assert started == ["rev", "rev", "iss", "rev", "iss", "iss"]
+    assert scheduler.lane("rev").backlog is None
+    assert scheduler.lane("iss").backlog is None
+
+    # subscriber only allows 4 deliveries, the rest stays backlogged
+    started = run(scheduler, dict(rev=range(3), iss=range(3)), budget=4, now=1.0)
+    assert started == ["rev", "rev", "iss", "rev"]
+    assert scheduler.lane("rev").backlog is None  # nothing left
+    assert scheduler.lane("iss").backlog == 1.0
+
+    with pytest.raises(ValueError):
+        scheduling.Lane(action="iss", weight=0)
+
+
+def test_concurrency_budget():
+    scheduler = scheduling.Scheduler(name="hook0", lanes=dict(
+        rev=dict(weight=4, concurrency=1, target=None),
+        iss=dict(weight=1, target=None)))
+
+    scheduler.sent("rev", "said0", "dates0")
+    assert scheduler.lane("rev").full
+    started = run(scheduler, dict(rev=range(3), iss=range(2)), budget=10, now=0.0)
+    assert started == ["iss", "iss"]
+    assert scheduler.lane("rev").backlog == 0.0
+
+    scheduler.done("rev", "said0")
+    assert not scheduler.lane("rev").full
+
+
+def test_latency_target_and_starvation():
+    metrics = monitoring.Metrics()
+    scheduler = scheduling.Scheduler(name="hook0", starvation=30.0, metrics=metrics, lanes=dict(
+        rev=dict(weight=4, concurrency=1, target=5.0),
+        iss=dict(weight=1, target=None)))
+
+    scheduler.sent("rev", "said0", "dates0")
+    run(scheduler, dict(rev=range(3), iss=range(3)), budget=10, now=0.0)
+    assert scheduler.lane("rev").backlog == 0.0
+
+    # revocations behind their target pause issuances
+    assert scheduler.order(now=5.0) == [scheduler.lane("rev")]
+    assert run(scheduler, dict(rev=range(3), iss=range(3)), budget=10, now=5.0) == []
+
+    # until issuances starve
+    assert run(scheduler, dict(rev=range(3), iss=range(3)), budget=10, now=30.0) == ["iss"]
+    assert metrics.get("sally_lane_starved_total", subscriber="hook0", lane="iss") == 1
+
+    scheduler.done("rev", "said0", latency=6.0)
+    assert metrics.get("sally_lane_latency_seconds", subscriber="hook0", lane="rev") == 6.0
+    assert metrics.get("sally_lane_target_missed_total", subscriber="hook0", lane="rev") == 1
+    assert metrics.get("sally_lane_inflight", subscriber="hook0", lane="rev") == 0
+
+    # revocations catch up then issuances resume
+    assert run(scheduler, dict(rev=range(1), iss=range(2)), budget=10, now=31.0) == ["rev"]
+    assert scheduler.lane("rev").backlog is None
+    assert scheduler.order(now=32.0) == [scheduler.lane("rev"), scheduler.lane("iss")]
+    assert run(scheduler, dict(rev=range(0), iss=range(2)), budget=10, now=32.0) == ["iss", "iss"]
@@ -0,0 +1,72 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.scheming module
+
+Testing schema registry
+"""
+import json
+
+import pytest
+from keri import kering
+
+from sally.core import monitoring, scheming
+
+
+def test_schema_registry(tmp_path):
+    validators = dict(qvi=lambda creder: None, le=lambda creder: None, oor=lambda creder: None)
+    validators["oor-auth"] = lambda creder: None
+    payloads = dict(qvi=lambda creder: "qvi", le=lambda creder: "le", oor=lambda creder: "oor")
+
+    registry = scheming.SchemaRegistry()
+    registry.configure(scheming.DEFAULT_SCHEMAS, validators=validators, payloads=payloads)
+    assert len(registry) == 4
+
+    schemage = registry.lookup(scheming.LE_SCHEMA)
+    assert schemage.name == "LE"
+    assert schemage.kind == "le"
+    assert schemage.payload(None) == "le"
+    assert scheming.LE_SCHEMA in registry
+
+    # OOR Auth credentials are only accepted as links in the OOR chain
+    assert scheming.OOR_AUTH_SCHEMA not in registry
+    with pytest.raises(kering.ValidationError):
+        registry.lookup(scheming.OOR_AUTH_SCHEMA)
+    assert registry.lookup(scheming.OOR_AUTH_SCHEMA, link=True).kind == "oor-auth"
+
+    with pytest.raises(kering.ValidationError):
+        registry.lookup("EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC")
+    assert registry.name("EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC") == "EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC"
+
+    # test network schema configured from file to use the LE chain
+    path = tmp_path / "schemas.json"
+    path.write_text(json.dumps(dict(schemas={
+        "EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC": dict(name="Test LE", kind="le")
+    })))
+    registry.configure(scheming.loadSchemas(str(path)), validators=validators, payloads=payloads)
+    schemage = registry.lookup("EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC")
+    assert schemage.name == "Test LE"
+    assert schemage.kind == "le"
+
+    with pytest.raises(kering.ConfigurationError):
+        registry.configure({"EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC": dict(name="ECR", kind="ecr")},
+                           validators=validators, payloads=payloads)
+
+
+def test_screener():
+    metrics = monitoring.Metrics()
+    screener = scheming.Screener(metrics=metrics)
+    qsaid = "EMQWEcCnVRk1hatTNyK3sIykYSrrFvafX3bHQ9Gkk1kC"
+
+    assert screener.screen(dict(d="said0", s=scheming.QVI_SCHEMA)) is None
+    assert screener.screen(dict(d="said1", s=scheming.LE_SCHEMA, e=dict(qvi=dict(n=qsaid)))) is None
+
+    assert screener.screen(dict(d="said2", s=qsaid)) == "schema"
+    assert screener.screen(dict(d="said3", s=scheming.OOR_AUTH_SCHEMA, e=dict(le=dict(n=qsaid)))) == "schema"
+    assert screener.screen(dict(d="said4", s=scheming.LE_SCHEMA)) == "edge"
+    assert screener.screen(dict(d="said5", s=scheming.LE_SCHEMA, e=dict(auth=dict(n=qsaid)))) == "edge"
+    assert screener.screen(dict(d="said6", s=scheming.OOR_SCHEMA, e=dict(auth=dict(n=None)))) == "edge"
+    assert screener.screen(dict(d="said7", s=scheming.OOR_SCHEMA, e=qsaid)) == "edge"
+
+    assert metrics.get("sally_prefilter_rejected_total", reason="schema") == 2
+    assert metrics.get("sally_prefilter_rejected_total", reason="edge") == 4
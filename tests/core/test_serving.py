@@ -5,8 +5,10 @@ sally.core.serving module
 
 Handling support
 """
+import json
 import os
 
+import pytest
 from hio.base import doing
 from hio.help import decking
 from keri.app import habbing
@@ -16,7 +18,7 @@ from keri.vdr import eventing as veventing, viring
 from keri.vdr import verifying
 
 import issuing
-from sally.core import basing, handling, credentials
+from sally.core import basing, credentials, monitoring, scheming, serving
 
 TEST_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -50,7 +52,7 @@ def test_tevery_cuery(seeder, mockHelpingNowUTC):
 
         prefixer = coring.Prefixer(qb64=creder.issuer)
         assert creder.said == issr.lesaid
-        assert creder.schema == handling.LE_SCHEMA
+        assert creder.schema == scheming.LE_SCHEMA
         assert prefixer.qb64 == qvi
 
         cues = decking.Deck()
@@ -71,3 +73,32 @@ def test_tevery_cuery(seeder, mockHelpingNowUTC):
         assert dater is not None
         assert dater.datetime == helping.nowUTC()  # mocked to return the same date
 
+
+
+def test_load_tenants(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps(dict(tenants=[
+        dict(alias="sally-eu", auth="EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl", hooks=["http://127.0.0.1:9924"]),
+        dict(alias="sally-us", auth="EB-u4VAF7A7_GR8PXJoAVHv5X9vjtXew8Yo6Z3w9mQUQ",
+             subscribers=[dict(name="compliance", url="http://127.0.0.1:9925", actions=["rev"])])])))
+    tenants = serving.loadTenants(str(path))
+    assert [tenant["alias"] for tenant in tenants] == ["sally-eu", "sally-us"]
+
+    auth = "EMl4RhuR_JxpiMd1N8DEJEhTxM3Ovvn9Xya8AN-tiUbl"
+    path.write_text(json.dumps(dict(tenants=[dict(alias="sally-eu", auth=auth)])))
+    with pytest.raises(ValueError):
+        serving.loadTenants(str(path))
+
+    path.write_text(json.dumps(dict(tenants=[dict(alias="sally-eu", hooks=["http://127.0.0.1:9924"])])))
+    with pytest.raises(ValueError):
+        serving.loadTenants(str(path))
+
+    # the metrics of each tenant are labeled with its alias in the shared registry
+    metrics = monitoring.Metrics()
+    labeled = metrics.labeled(tenant="sally-eu")
+    labeled.inc("sally_retention_removed_total", 2, db="evts")
+    labeled.set("sally_db_bytes", 4096)
+    assert labeled.get("sally_retention_removed_total", db="evts") == 2
+    assert metrics.get("sally_retention_removed_total", tenant="sally-eu", db="evts") == 2
+    assert metrics.get("sally_db_bytes") is None
+    assert 'sally_db_bytes{tenant="sally-eu"} 4096' in metrics.render()
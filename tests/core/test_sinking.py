@@ -0,0 +1,441 @@
+# -*- encoding: utf-8 -*-
+"""
+SALLY
+sally.core.sinking module
+
+Testing delivery sinks
+"""
+import json
+import os
+import socket
+import ssl
+import time
+
+import cbor2
+import falcon
+import msgpack
+import pytest
+from hio.base import doing
+from hio.core import http
+from keri.app import habbing
+from keri.core import coring
+
+from sally.core import monitoring, sinking
+
+SAID = "EL5nGzlXb8DEjFh4pOZMd7F10NYfX7inyci3iw9juY6_"
+OTHER = "EHZ05NsGCdWNujHTK3FqyuPmR8qz04Q3xg3Hnz1hkPmm"
+SCHEMA = "ENPXp1vQzRF6JwIuS-mp2U8Uf1MoADoP_GqQ62VsDZWY"
+ACTOR = "EOwXzTKWgsmCDVJwMS4VUJWX-m-oKx9d8VDyaRNY6mMZ"
+TLS_DIR = os.path.join(os.path.dirname(__file__), "tls")
+
+
+def test_open_sink(tmp_path):
+    sink = sinking.openSink(f"file://{tmp_path}/events.jsonl", hab=None)
+    assert isinstance(sink, sinking.SpoolSink)
+    assert sink.path == f"{tmp_path}/events.jsonl"
+
+    sink = sinking.openSink(f"unix://{tmp_path}/sally.sock", hab=None)
+    assert isinstance(sink, sinking.UnixSink)
+    assert sink.path == f"{tmp_path}/sally.sock"
+
+    sink = sinking.openSink("http://localhost:5999/", hab=None)
+    assert isinstance(sink, sinking.HttpSink)
+
+
+def test_spool_sink(tmp_path):
+    path = os.path.join(tmp_path, "events.jsonl")
+    sink = sinking.SpoolSink(path=path, batch=2, maxBytes=300)
+
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict(LEI="5493001KJTIIGC8Y1R17"))
+    assert sink.pending(SAID)
+    assert sink.status(SAID) is None  # not durable until synced
+
+    sink.send(OTHER, SCHEMA, "iss", ACTOR, dict(LEI="5493001KJTIIGC8Y1R17"))  # fills the batch and syncs
+    assert sink.status(SAID) == 200
+    assert sink.status(OTHER) == 200
+    assert not sink.pending(SAID)
+
+    # spool file was rotated after growing beyond maxBytes
+    assert not os.path.exists(path)
+    rotated = [name for name in os.listdir(tmp_path) if name.startswith("events.jsonl.")]
+    assert len(rotated) == 1
+    with open(os.path.join(tmp_path, rotated[0])) as f:
+        events = [json.loads(line) for line in f]
+    assert [event["said"] for event in events] == [SAID, OTHER]
+    assert events[0]["action"] == "iss"
+    assert events[0]["resource"] == SCHEMA
+    assert events[0]["data"] == dict(LEI="5493001KJTIIGC8Y1R17")
+
+    sink.send(SAID, SCHEMA, "rev", ACTOR, dict())
+    sink.flush()
+    assert sink.status(SAID) == 200
+    sink.close()
+    with open(path) as f:
+        assert json.loads(f.readline())["action"] == "rev"
+
+
+def test_spool_sink_failures(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "events.jsonl")
+    sink = sinking.SpoolSink(path=path, batch=10)
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict())
+    sink.flush()
+    assert sink.status(SAID) == 200
+    size = os.path.getsize(path)
+
+    class Full:
+        """ Spool file that runs out of space part way through a line """
+        def __init__(self, file):
+            self.file = file
+
+        def write(self, data):
+            self.file.write(bytes(data[:10]))
+            raise OSError(28, "No space left on device")
+
+        def __getattr__(self, name):
+            return getattr(self.file, name)
+
+    # a failed write leaves no partial line behind
+    file = sink.file
+    sink.file = Full(file)
+    sink.send(OTHER, SCHEMA, "iss", ACTOR, dict())
+    assert sink.status(OTHER) == 503
+    assert os.path.getsize(path) == size
+    sink.file = file
+
+    # a failed fsync removes the lines of the events it reports failed
+    def fsync(fd):
+        raise OSError(5, "Input/output error")
+
+    sink.send(OTHER, SCHEMA, "iss", ACTOR, dict())
+    monkeypatch.setattr(sinking.os, "fsync", fsync)
+    sink.flush()
+    monkeypatch.undo()
+    assert sink.status(OTHER) == 503
+    assert os.path.getsize(path) == size
+
+    sink.send(OTHER, SCHEMA, "rev", ACTOR, dict())
+    sink.close()
+    assert sink.status(OTHER) == 200
+    with open(path) as f:
+        assert [json.loads(line)["said"] for line in f] == [SAID, OTHER]
+
+
+def test_sink_protocol():
+    with pytest.raises(TypeError):
+        sinking.Sink()
+
+
+def test_unix_sink(tmp_path):
+    path = os.path.join(tmp_path, "sally.sock")
+    sink = sinking.UnixSink(path=path, timeout=1.0)
+
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict())  # no consumer listening yet
+    assert sink.status(SAID) == 503
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict(LEI="5493001KJTIIGC8Y1R17"))
+    sink.send(OTHER, SCHEMA, "rev", ACTOR, dict())
+    assert sink.status(SAID) == 200
+    assert sink.status(OTHER) == 200
+
+    conn, _ = server.accept()
+    conn.settimeout(1.0)
+    received = b''
+    while received.count(b'\n') < 2:
+        received += conn.recv(4096)
+    events = [json.loads(line) for line in received.splitlines()]
+    assert [event["said"] for event in events] == [SAID, OTHER]
+    assert events[1]["action"] == "rev"
+
+    sink.close()
+    conn.close()
+    server.close()
+
+
+def test_unix_sink_slow_consumer(tmp_path):
+    path = os.path.join(tmp_path, "sally.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    sink = sinking.UnixSink(path=path, timeout=1.0)
+
+    # a consumer not reading fills the socket, the rest of the line waits in the outbound buffer
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict(blob="x" * 4 * 1024 * 1024))
+    sink.send(OTHER, SCHEMA, "rev", ACTOR, dict())
+    assert sink.status(SAID) is None
+    assert sink.pending(SAID)
+    assert sink.pending(OTHER)
+
+    conn, _ = server.accept()
+    conn.settimeout(1.0)
+    received = b''
+    while received.count(b'\n') < 2:
+        received += conn.recv(65536)
+        sink.recur(tyme=0.0)
+    assert sink.status(SAID) == 200
+    assert sink.status(OTHER) == 200
+    assert [json.loads(line)["said"] for line in received.splitlines()] == [SAID, OTHER]
+
+    # a consumer that stops reading for the timeout fails the lines not completely written
+    sink.send(SAID, SCHEMA, "iss", ACTOR, dict(blob="x" * 4 * 1024 * 1024))
+    assert sink.status(SAID) is None
+    sink.drain(now=time.monotonic() + 2.0)
+    assert sink.status(SAID) == 503
+    assert not sink.pending(SAID)
+    assert sink.sock is None
+
+    sink.close()
+    conn.close()
+    server.close()
+
+
+def test_subscriber(tmp_path):
+    sink = sinking.SpoolSink(path=os.path.join(tmp_path, "events.jsonl"))
+    subscriber = sinking.Subscriber(name="analytics", sink=sink, schemas=["LE"], actions=["iss"], retry=1.0,
+                                    maxRetry=3.0)
+    assert subscriber.accepts(SCHEMA, "iss", "LE")
+    assert not subscriber.accepts(SCHEMA, "rev", "LE")
+    assert not subscriber.accepts("EBNaNu-M9P5cgrnfl2Fvymy4E_jvxxyjb70PRtiANlJy", "iss", "OOR")
+
+    metrics = monitoring.Metrics()
+    subscriber = sinking.Subscriber(name="compliance", sink=sink, retry=1.0, maxRetry=3.0, threshold=2,
+                                    concurrency=4, metrics=metrics)
+    assert subscriber.accepts(SCHEMA, "rev", "LE")
+    assert subscriber.state == sinking.Breakers.closed
+    assert metrics.get("sally_breaker_state", subscriber="compliance") == 0
+
+    for _ in range(4):
+        assert subscriber.ready(now=0.0)
+        subscriber.sent()
+    assert not subscriber.ready(now=0.0)  # concurrency reached
+
+    subscriber.failed(now=0.0)
+    assert subscriber.state == sinking.Breakers.closed
+    subscriber.failed(now=0.0)  # threshold reached
+    assert subscriber.state == sinking.Breakers.open
+    assert subscriber.delay == 1.0
+    assert metrics.get("sally_breaker_state", subscriber="compliance") == 2
+    subscriber.failed(now=0.5)  # requests started before the breaker opened do not extend the delay
+    subscriber.failed(now=0.5)
+    assert subscriber.delay == 1.0
+    assert subscriber.inflight == 0
+    assert not subscriber.ready(now=0.5)
+
+    # single probe once the delay passed
+    assert subscriber.ready(now=1.0)
+    assert subscriber.state == sinking.Breakers.half
+    subscriber.sent()
+    assert not subscriber.ready(now=1.0)
+    subscriber.failed(now=1.0)
+    assert subscriber.state == sinking.Breakers.open
+    assert subscriber.delay == 2.0
+    assert not subscriber.ready(now=2.5)
+    assert subscriber.ready(now=3.0)
+    subscriber.sent()
+    subscriber.failed(now=3.0)
+    assert subscriber.delay == 3.0  # capped at maxRetry
+
+    # recovery ramps the deliveries in flight back up
+    assert subscriber.ready(now=6.0)
+    subscriber.sent()
+    subscriber.succeeded()
+    assert subscriber.state == sinking.Breakers.closed
+    assert subscriber.limit == 1
+    assert subscriber.delay == 0.0
+    subscriber.sent()
+    assert not subscriber.ready(now=6.0)
+    subscriber.succeeded()
+    assert subscriber.limit == 2
+    subscriber.sent()
+    subscriber.succeeded()
+    assert subscriber.limit == 4
+    subscriber.sent()
+    subscriber.succeeded()
+    assert subscriber.limit == 4
+
+    assert subscriber.health() == dict(state="closed", failures=0, inflight=0, limit=4, delay=0.0)
+    assert metrics.get("sally_breaker_transitions_total", subscriber="compliance", state="open") == 3
+    assert metrics.get("sally_breaker_transitions_total", subscriber="compliance", state="half-open") == 3
+    assert metrics.get("sally_breaker_transitions_total", subscriber="compliance", state="closed") == 1
+
+    subscribers = sinking.openSubscribers(hab=None, hooks=[f"file://{tmp_path}/a.jsonl"], subscriptions=[
+        dict(name="analytics", url=f"file://{tmp_path}/b.jsonl", schemas=["LE"])
+    ])
+    assert [subscriber.name for subscriber in subscribers] == ["hook0", "analytics"]
+    assert subscribers[1].schemas == {"LE"}
+    assert subscribers[1].actions is None
+
+    with pytest.raises(ValueError):
+        sinking.Subscriber(name="compliance.eu", sink=sink)
+
+    with pytest.raises(ValueError):
+        sinking.openSubscribers(hab=None, subscriptions=[
+            dict(name="analytics", url=f"file://{tmp_path}/a.jsonl"),
+            dict(name="analytics", url=f"file://{tmp_path}/b.jsonl")
+        ])
+
+
+def test_http_sink_timeouts():
+    with habbing.openHab(name="test", base="test", salt=b'abcdef0123456789', temp=True) as (hby, hab):
+        # a web hook that accepts connections but never answers
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(("127.0.0.1", 5998))
+        server.listen(8)
+
+        sink = sinking.HttpSink(hab=hab, url="http://127.0.0.1:5998/", connectTimeout=1.0, readTimeout=2.0,
+                                maxClients=2)
+        doist = doing.Doist(limit=3.0, tock=0.25, doers=[sink])
+        doist.enter()
+
+        sink.send(SAID, SCHEMA, "iss", ACTOR, dict())
+        sink.send(OTHER, SCHEMA, "iss", ACTOR, dict())
+        assert sink.full
+        assert len(sink.doers) == 2
+
+        sink.send(SCHEMA, SCHEMA, "iss", ACTOR, dict())  # over the cap
+        assert sink.status(SCHEMA) == 503
+
+        while doist.tyme < 1.5:
+            doist.recur()
+        assert sink.status(SAID) is None  # connected and still waiting for the response
+
+        while doist.tyme < 2.5:
+            doist.recur()
+        # stalled requests were reaped and reported as timed out
+        assert sink.status(SAID) == 504
+        assert sink.status(OTHER) == 504
+        assert not sink.pending(SAID)
+        assert sink.clients == {}
+        assert sink.doers == []
+        assert not sink.full
+
+        doist.exit()
+        server.close()
+
+
+class CountingListener:
+    """ Web hook stand in that records the requests it answers """
+
+    def __init__(self):
+        self.saids = []
+
+    def on_post(self, req, rep):
+        self.saids.append(req.get_header("Sally-Sequence"))
+        rep.status = falcon.HTTP_200
+
+
+def test_https_sink_reuses_connections():
+    certpath = os.path.join(TLS_DIR, "cert.pem")
+    keypath = os.path.join(TLS_DIR, "key.pem")
+
+    with habbing.openHab(name="test", base="test", salt=b'abcdef0123456789', temp=True) as (hby, hab):
+        app = falcon.App()
+        listener = CountingListener()
+        app.add_route("/", listener)
+        server = http.Server(port=5997, app=app, scheme="https", keypath=keypath, certpath=certpath,
+                             certify=ssl.CERT_NONE)
+        sink = sinking.openSink("https://localhost:5997/", hab=hab, cafile=certpath, maxClients=2)
+        assert isinstance(sink, sinking.HttpSink)
+
+        doist = doing.Doist(limit=10.0, tock=0.03125, doers=[http.ServerDoer(server=server), sink])
+        doist.enter()
+
+        def deliver(said, sequence):
+            sink.send(said, SCHEMA, "iss", ACTOR, dict(), sequence=sequence)
+            while (status := sink.status(said)) is None and doist.tyme < doist.limit:
+                doist.recur()
+                time.sleep(doist.tock)
+            return status
+
+        # sequential deliveries share a single keep-alive connection and handshake
+        for sequence in range(1, 6):
+            assert deliver(SAID, sequence) == 200
+        assert listener.saids == ["1", "2", "3", "4", "5"]
+        assert sink.tls.handshakes == 1
+        assert len(sink.idle) == 1
+        assert len(sink.doers) == 1
+
+        # a new connection resumes the TLS session instead of a full handshake
+        sink.close()
+        assert sink.doers == []
+        for sequence in range(6, 8):
+            assert deliver(OTHER, sequence) == 200
+        assert sink.tls.handshakes == 2
+        assert sink.tls.resumed == 1
+
+        sink.close()
+        doist.exit()
+        server.close()
+
+
+def test_encode():
+    body = dict(action="iss", actor=ACTOR, data=dict(schema=SCHEMA, credential=SAID, LEI="5493001KJTIIGC8Y1R17"))
+    assert json.loads(sinking.encode(body, sinking.Encodings.json)) == body
+
+    raw = sinking.encode(body, sinking.Encodings.cbor)
+    decoded = cbor2.loads(raw)
+    assert decoded["actor"] == coring.Matter(qb64=ACTOR).qb2
+    assert coring.Matter(qb2=decoded["data"]["credential"]).qb64 == SAID
+    assert decoded["data"]["LEI"] == "5493001KJTIIGC8Y1R17"
+    assert len(raw) < len(sinking.encode(body, sinking.Encodings.json))
+
+    decoded = msgpack.loads(sinking.encode(body, sinking.Encodings.msgpack))
+    assert coring.Matter(qb2=decoded["data"]["schema"]).qb64 == SCHEMA
+
+
+class EncodingListener:
+    """ Web hook stand in that only accepts JSON and CBOR bodies """
+
+    def __init__(self):
+        self.bodies = []
+
+    def on_post(self, req, rep):
+        if req.content_type == "application/cbor":
+            self.bodies.append(cbor2.loads(req.bounded_stream.read()))
+        elif req.content_type == "application/json":
+            self.bodies.append(json.loads(req.bounded_stream.read()))
+        else:
+            rep.status = falcon.HTTP_415
+            return
+        rep.status = falcon.HTTP_200
+
+
+def test_http_sink_encoding():
+    with habbing.openHab(name="test", base="test", salt=b'abcdef0123456789', temp=True) as (hby, hab):
+        app = falcon.App()
+        listener = EncodingListener()
+        app.add_route("/", listener)
+        server = http.Server(port=5995, app=app)
+
+        with pytest.raises(ValueError):
+            sinking.HttpSink(hab=hab, url="http://localhost:5995/", encoding="xml")
+
+        cbor = sinking.HttpSink(hab=hab, url="http://localhost:5995/", encoding=sinking.Encodings.cbor)
+        packed = sinking.HttpSink(hab=hab, url="http://localhost:5995/", encoding=sinking.Encodings.msgpack)
+        doist = doing.Doist(limit=5.0, tock=0.03125, doers=[http.ServerDoer(server=server), cbor, packed])
+        doist.enter()
+
+        def deliver(sink, said):
+            sink.send(said, SCHEMA, "iss", ACTOR, dict(credential=said))
+            while (status := sink.status(said)) is None and doist.tyme < doist.limit:
+                doist.recur()
+                time.sleep(doist.tock)
+            return status
+
+        assert deliver(cbor, SAID) == 200
+        assert listener.bodies.pop()["data"]["credential"] == coring.Matter(qb64=SAID).qb2
+
+        # web hook does not accept msgpack so the sink falls back to json
+        assert deliver(packed, SAID) == 415
+        assert packed.encoding == sinking.Encodings.json
+        assert deliver(packed, OTHER) == 200
+        assert listener.bodies.pop()["data"]["credential"] == OTHER
+
+        cbor.close()
+        packed.close()
+        doist.exit()
+        server.close()